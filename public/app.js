@@ -1,18 +1,23 @@
 const ACCESS_PASSWORD = "family";
 const AUTH_STORAGE_KEY = "home_todo_access";
 
-const basePath = (document.body?.dataset?.basePath || "").replace(/\/$/, "");
+const householdPrefix = (window.location.pathname.match(/^(?:\/[^/]+)?\/h\/[A-Za-z0-9_-]+/) || [""])[0];
+const basePath = (document.body?.dataset?.basePath || householdPrefix).replace(/\/$/, "");
 const apiUrl = (path) => `${basePath}${path}`;
 const apiFetch = (path, options) => fetch(apiUrl(path), options);
 
 const state = {
   members: [],
   tasks: [],
+  coldTasks: [],
   reminders: []
 };
 
 let eventSource = null;
 let sseRetryTimer = null;
+let stateVersion = 0;
+let lastEventId = "";
+let resyncing = false;
 let calendarDate = new Date();
 let wechatEnabled = false;
 const chartTooltip = document.createElement("div");
@@ -73,6 +78,8 @@ const elements = {
   remind24h: document.getElementById("remind24h"),
   remind2h: document.getElementById("remind2h"),
   remindOverdue: document.getElementById("remindOverdue"),
+  quietStart: document.getElementById("quietStart"),
+  quietEnd: document.getElementById("quietEnd"),
   modalOverlay: document.getElementById("modalOverlay"),
   modalTitle: document.getElementById("modalTitle"),
   modalBody: document.getElementById("modalBody"),
@@ -361,6 +368,10 @@ const formatRepeat = (repeat) => {
 
 const getVisibleTasks = () => state.tasks.filter((t) => !t.deletedAt && !t.archivedAt);
 
+const isColdTask = (task) => Boolean(task.archivedAt || task.deletedAt);
+
+const isColdFilter = (filter) => filter === "trash" || filter === "archived";
+
 const getWeekStart = (date) => {
   const d = new Date(date);
   d.setHours(0, 0, 0, 0);
@@ -521,6 +532,8 @@ const updateReminderSettingsUI = () => {
   elements.remind24h.checked = Boolean(member.reminderPrefs?.remind24h);
   elements.remind2h.checked = Boolean(member.reminderPrefs?.remind2h);
   elements.remindOverdue.checked = Boolean(member.reminderPrefs?.overdue);
+  elements.quietStart.value = member.reminderPrefs?.quietHours?.start || "";
+  elements.quietEnd.value = member.reminderPrefs?.quietHours?.end || "";
 };
 
 const renderCompletion = () => {
@@ -945,7 +958,7 @@ const renderTasks = () => {
   const ownerFilter = elements.ownerFilter.value;
   const dueFilter = elements.dueDateFilter.value;
   const currentId = ensureValidCurrentUser();
-  let tasks = state.tasks;
+  let tasks = isColdFilter(filter) ? state.coldTasks : state.tasks;
   if (filter === "trash") {
     tasks = tasks.filter((t) => t.deletedAt);
   } else if (filter === "archived") {
@@ -1208,14 +1221,46 @@ const connectSSE = (memberId) => {
   if (!memberId) {
     return;
   }
-  eventSource = new EventSource(apiUrl(`/events?memberId=${memberId}`));
-  eventSource.addEventListener("state_update", (event) => {
-    const data = JSON.parse(event.data);
-    state.members = data.members || [];
-    state.tasks = data.tasks || [];
-    renderAll();
+  const resume = lastEventId ? `&lastEventId=${encodeURIComponent(lastEventId)}` : "";
+  eventSource = new EventSource(apiUrl(`/events?memberId=${memberId}${resume}`));
+  const listen = (name, handler) => {
+    eventSource.addEventListener(name, (event) => {
+      if (event.lastEventId) {
+        lastEventId = event.lastEventId;
+      }
+      handler(event);
+    });
+  };
+  listen("state_update", (event) => {
+    applySnapshot(JSON.parse(event.data));
+  });
+  listen("task_created", (event) => {
+    applyChange(JSON.parse(event.data), (data) => upsertTask(data.task));
+  });
+  listen("task_patched", (event) => {
+    applyChange(JSON.parse(event.data), (data) => upsertTask(data.task));
+  });
+  listen("task_deleted", (event) => {
+    applyChange(JSON.parse(event.data), (data) => {
+      state.tasks = state.tasks.filter((item) => item.id !== data.taskId);
+      state.coldTasks = state.coldTasks.filter((item) => item.id !== data.taskId);
+    });
+  });
+  listen("batch", (event) => {
+    applyChange(JSON.parse(event.data), (data) => {
+      (data.tasks || []).forEach(upsertTask);
+      const deleted = new Set(data.deletedTaskIds || []);
+      state.tasks = state.tasks.filter((item) => !deleted.has(item.id));
+      state.coldTasks = state.coldTasks.filter((item) => !deleted.has(item.id));
+    });
+  });
+  listen("member_created", (event) => {
+    applyChange(JSON.parse(event.data), (data) => upsertMember(data.member));
   });
-  eventSource.addEventListener("reminder", (event) => {
+  listen("member_updated", (event) => {
+    applyChange(JSON.parse(event.data), (data) => upsertMember(data.member));
+  });
+  listen("reminder", (event) => {
     const payload = JSON.parse(event.data);
     state.reminders.unshift({
       taskId: payload.taskId,
@@ -1224,7 +1269,17 @@ const connectSSE = (memberId) => {
     });
     renderReminders();
   });
-  eventSource.addEventListener("mention", (event) => {
+  listen("reminder_digest", (event) => {
+    const payload = JSON.parse(event.data);
+    const known = new Set(state.reminders.map((item) => item.id));
+    (payload.reminders || []).forEach((reminder) => {
+      if (!known.has(reminder.id)) {
+        state.reminders.unshift({ taskId: reminder.taskId, type: reminder.type, id: reminder.id });
+      }
+    });
+    renderReminders();
+  });
+  listen("mention", (event) => {
     const payload = JSON.parse(event.data);
     state.reminders.unshift({
       taskId: payload.taskId,
@@ -1236,6 +1291,9 @@ const connectSSE = (memberId) => {
     });
     renderReminders();
   });
+  listen("resync", () => {
+    refreshState();
+  });
   eventSource.onerror = () => {
     if (eventSource) {
       eventSource.close();
@@ -1255,11 +1313,32 @@ const closeSSE = () => {
   }
 };
 
+const applySnapshot = (data) => {
+  state.members = data.members || [];
+  state.tasks = data.tasks || [];
+  stateVersion = data.version || 0;
+  renderAll();
+};
+
+const applyChange = (data, apply) => {
+  if (resyncing || data.version <= stateVersion) {
+    return;
+  }
+  if (data.version !== stateVersion + 1) {
+    refreshState();
+    return;
+  }
+  apply(data);
+  stateVersion = data.version;
+  renderAll();
+};
+
 const loadState = async () => {
   const res = await apiFetch("/api/state");
   const data = await res.json();
   state.members = data.members || [];
   state.tasks = data.tasks || [];
+  stateVersion = data.version || 0;
   if (!getCurrentUserId() && state.members.length) {
     setCurrentUserId(state.members[0].id);
   }
@@ -1367,14 +1446,16 @@ const openTaskCreateModal = () => {
 };
 
 const refreshState = async () => {
-  const res = await apiFetch("/api/state");
-  if (!res.ok) {
-    return;
+  resyncing = true;
+  try {
+    const res = await apiFetch("/api/state");
+    if (!res.ok) {
+      return;
+    }
+    applySnapshot(await res.json());
+  } finally {
+    resyncing = false;
   }
-  const data = await res.json();
-  state.members = data.members || [];
-  state.tasks = data.tasks || [];
-  renderAll();
 };
 
 const createTask = async ({ content, owners, dueAt, repeat, requireConfirm }) => {
@@ -1391,16 +1472,57 @@ const createTask = async ({ content, owners, dueAt, repeat, requireConfirm }) =>
     return;
   }
   const task = await res.json();
-  state.tasks.unshift(task);
+  upsertTask(task);
   renderAll();
 };
 
-const applyTaskUpdate = (task) => {
-  const index = state.tasks.findIndex((item) => item.id === task.id);
+const upsertTask = (task) => {
+  const [target, other] = isColdTask(task) ? ["coldTasks", "tasks"] : ["tasks", "coldTasks"];
+  state[other] = state[other].filter((item) => item.id !== task.id);
+  const index = state[target].findIndex((item) => item.id === task.id);
+  if (index >= 0) {
+    state[target][index] = task;
+  } else {
+    state[target].unshift(task);
+  }
+};
+
+const loadColdTasks = async (filter) => {
+  const path = filter === "trash" ? "/api/recycle-bin" : "/api/history";
+  const tasks = [];
+  let cursor = "";
+  do {
+    const res = await apiFetch(`${path}?limit=200${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ""}`);
+    if (!res.ok) {
+      return;
+    }
+    const data = await res.json();
+    tasks.push(...(data.tasks || []));
+    cursor = data.nextCursor;
+  } while (cursor);
+  state.coldTasks = tasks;
+};
+
+const upsertMember = (member) => {
+  const index = state.members.findIndex((item) => item.id === member.id);
   if (index >= 0) {
-    state.tasks[index] = task;
+    state.members[index] = member;
   } else {
-    state.tasks.unshift(task);
+    state.members.push(member);
+  }
+};
+
+const applyTaskUpdate = (payload) => {
+  if (!payload) {
+    return;
+  }
+  if (payload.task) {
+    upsertTask(payload.task);
+    if (payload.spawned) {
+      upsertTask(payload.spawned);
+    }
+  } else if (payload.id) {
+    upsertTask(payload);
   }
   renderAll();
 };
@@ -1515,7 +1637,14 @@ const updateReminderSettings = async () => {
     enabled: elements.remindEnabled.checked,
     remind24h: elements.remind24h.checked,
     remind2h: elements.remind2h.checked,
-    overdue: elements.remindOverdue.checked
+    overdue: elements.remindOverdue.checked,
+    quietHours: elements.quietStart.value && elements.quietEnd.value
+      ? {
+          start: elements.quietStart.value,
+          end: elements.quietEnd.value,
+          timeZone: Intl.DateTimeFormat().resolvedOptions().timeZone
+        }
+      : null
   };
   await apiFetch(`/api/members/${memberId}`, {
     method: "PATCH",
@@ -1549,7 +1678,13 @@ const bindWeChat = () => {
 elements.addMemberBtn.addEventListener("click", addMember);
 elements.bindWeChatBtn.addEventListener("click", bindWeChat);
 elements.openCreateTask.addEventListener("click", openTaskCreateModal);
-elements.statusFilter.addEventListener("change", renderTasks);
+elements.statusFilter.addEventListener("change", async () => {
+  const filter = elements.statusFilter.value;
+  if (isColdFilter(filter)) {
+    await loadColdTasks(filter);
+  }
+  renderTasks();
+});
 elements.ownerFilter.addEventListener("change", renderTasks);
 elements.dueDateFilter.addEventListener("change", renderTasks);
 elements.trendRange.addEventListener("change", renderDashboard);
@@ -1583,6 +1718,8 @@ elements.remindEnabled.addEventListener("change", updateReminderSettings);
 elements.remind24h.addEventListener("change", updateReminderSettings);
 elements.remind2h.addEventListener("change", updateReminderSettings);
 elements.remindOverdue.addEventListener("change", updateReminderSettings);
+elements.quietStart.addEventListener("change", updateReminderSettings);
+elements.quietEnd.addEventListener("change", updateReminderSettings);
 
 elements.taskList.addEventListener("click", (event) => {
   if (event.target.dataset.subtaskId) {
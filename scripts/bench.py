@@ -0,0 +1,412 @@
+"""Offline benchmarks for server.py.
+
+    python scripts/bench.py load  [--members 6 --tasks 2000 --sse 50 --duration 20 ...] [--output result.json]
+    python scripts/bench.py micro [--members 6 --tasks 2000 --repeat 5 ...] [--output result.json]
+    python scripts/bench.py compare baseline.json result.json
+
+`load` writes a synthetic household to a temp data.json, starts server.py on
+it (STORE / SERVER_MODE are passed through), holds --sse /events streams open
+and drives a mixed create / PATCH / GET /api/state workload from --workers
+keep-alive connections. `micro` times store and hot-path functions
+in-process. Both print and optionally save JSON; `compare` shows the ratio
+of every metric between two saved runs.
+"""
+
+import argparse
+import copy
+import gc
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from uuid import uuid4
+
+ROOT = Path(__file__).resolve().parent.parent
+NAMES = ["爸爸", "妈妈", "爷爷", "奶奶", "外公", "外婆", "哥哥", "姐姐", "弟弟", "妹妹", "小明", "小红"]
+STATES = ["已指派", "已接受", "进行中", "待确认", "已完成"]
+
+
+def generate_household(members: int, tasks: int, comments: int, subtasks: int, seed: int) -> dict:
+    """A data.json-shaped state; comments mention other members so extract_mentions has work to do."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    roster = [
+        {"id": str(uuid4()), "name": NAMES[i % len(NAMES)] + (str(i // len(NAMES)) if i >= len(NAMES) else ""), "reminderPrefs": {"enabled": True}}
+        for i in range(members)
+    ]
+
+    def iso(delta_hours: float) -> str:
+        return (now + timedelta(hours=delta_hours)).isoformat()
+
+    items = []
+    for i in range(tasks):
+        creator = rng.choice(roster)
+        owners = [m["id"] for m in rng.sample(roster, k=min(len(roster), rng.randint(1, 2)))]
+        created = iso(-rng.uniform(0, 24 * 90))
+        repeat = rng.choice(["none", "none", "none", "daily", "weekly", "monthly"])
+        task = {
+            "id": str(uuid4()),
+            "content": f"任务 {i} @{rng.choice(roster)['name']}",
+            "owners": owners,
+            "dueAt": iso(rng.uniform(-48, 24 * 30)) if rng.random() < 0.8 else None,
+            "repeat": {"type": repeat},
+            "seriesId": str(uuid4()) if repeat != "none" else None,
+            "occurrence": 1,
+            "requireConfirm": rng.random() < 0.3,
+            "createdBy": creator["id"],
+            "state": rng.choice(STATES),
+            "subtasks": [
+                {"id": str(uuid4()), "content": f"子任务 {j}", "done": rng.random() < 0.5, "createdAt": created, "doneAt": None}
+                for j in range(subtasks)
+            ],
+            "comments": [],
+            "archivedAt": None,
+            "deletedAt": None,
+            "createdAt": created,
+            "updatedAt": created,
+            "reminders": {"remind24hSent": False, "remind2hSent": False, "lastOverdueAt": None, "snoozeUntil": None},
+        }
+        if task["repeat"]["type"] != "none" and not task["dueAt"]:
+            task["dueAt"] = iso(24)
+        for _ in range(comments):
+            target = rng.choice(roster)
+            task["comments"].append(
+                {
+                    "id": str(uuid4()),
+                    "authorId": creator["id"],
+                    "content": f"@{target['name']} 记得看一下",
+                    "mentions": [target["id"]],
+                    "createdAt": created,
+                }
+            )
+        items.append(task)
+    return {"members": roster, "tasks": items}
+
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 3)
+
+    return {"count": len(ordered), "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": pick(1.0)}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def hold_event_stream(port: int, member_id: str, counter: dict, lock: threading.Lock, stop: threading.Event) -> None:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request("GET", f"/events?memberId={member_id}")
+        response = conn.getresponse()
+        while not stop.is_set():
+            try:
+                line = response.fp.readline()
+            except socket.timeout:
+                continue
+            if not line:
+                return
+            if line.startswith(b"event:"):
+                with lock:
+                    counter["events"] += 1
+    except OSError:
+        with lock:
+            counter["errors"] += 1
+    finally:
+        conn.close()
+
+
+def run_load(args: argparse.Namespace) -> dict:
+    household = generate_household(args.members, args.tasks, args.comments, args.subtasks, args.seed)
+    workdir = Path(tempfile.mkdtemp(prefix="home-todo-bench-"))
+    data_file = workdir / "data.json"
+    data_file.write_text(json.dumps(household, ensure_ascii=False), "utf-8")
+    port = free_port()
+    env = {**os.environ, "DATA_FILE": str(data_file), "SQLITE_FILE": str(workdir / "data.sqlite"), "PORT": str(port)}
+    server = subprocess.Popen([sys.executable, str(ROOT / "server.py")], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline or server.poll() is not None:
+                    raise SystemExit("server did not start")
+                time.sleep(0.1)
+
+        member_ids = [m["id"] for m in household["members"]]
+        task_creators = [(t["id"], t["createdBy"]) for t in household["tasks"]]
+        stop = threading.Event()
+        sse_lock = threading.Lock()
+        sse_counter = {"events": 0, "errors": 0}
+        streams = [
+            threading.Thread(target=hold_event_stream, args=(port, member_ids[i % len(member_ids)], sse_counter, sse_lock, stop), daemon=True)
+            for i in range(args.sse)
+        ]
+        for stream in streams:
+            stream.start()
+            time.sleep(0.01)  # the threaded server listens with a small backlog
+        time.sleep(min(5.0, 0.5 + args.sse / 500))
+
+        weights = [("create", args.create_weight), ("patch", args.patch_weight), ("state", args.state_weight)]
+        latencies: dict = {name: [] for name, _ in weights}
+        errors: dict = {name: 0 for name, _ in weights}
+        results_lock = threading.Lock()
+        end_at = time.perf_counter() + args.duration
+
+        def worker(index: int) -> None:
+            rng = random.Random(args.seed + index)
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            names = [name for name, _ in weights]
+            op_weights = [weight for _, weight in weights]
+            while time.perf_counter() < end_at:
+                op = rng.choices(names, weights=op_weights)[0]
+                actor = rng.choice(member_ids)
+                if op == "create":
+                    method, path = "POST", "/api/tasks"
+                    body = {"content": f"bench {rng.random():.6f}", "createdBy": actor, "owners": [actor]}
+                elif op == "patch":
+                    task_id, creator = rng.choice(task_creators)
+                    method, path = "PATCH", f"/api/tasks/{task_id}"
+                    body = {"action": "comment", "actorId": creator, "content": f"@{rng.choice(household['members'])['name']} bench"}
+                else:
+                    method, path, body = "GET", "/api/state", None
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else None
+                started = time.perf_counter()
+                try:
+                    conn.request(method, path, body=payload, headers={"Content-Type": "application/json", "Accept-Encoding": "gzip"})
+                    response = conn.getresponse()
+                    response.read()
+                    ok = response.status < 500
+                except (OSError, http.client.HTTPException):
+                    ok = False
+                    conn.close()
+                    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                elapsed = time.perf_counter() - started
+                with results_lock:
+                    if ok:
+                        latencies[op].append(elapsed)
+                    else:
+                        errors[op] += 1
+            conn.close()
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(args.workers)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        wall = time.perf_counter() - started
+        time.sleep(0.5)
+        stop.set()
+
+        total = sum(len(v) for v in latencies.values())
+        return {
+            "throughput_rps": round(total / wall, 1),
+            "requests": total,
+            "errors": errors,
+            "wall_s": round(wall, 2),
+            "latency": {name: percentiles(samples) for name, samples in latencies.items()},
+            "latency_all": percentiles([x for samples in latencies.values() for x in samples]),
+            "sse": {"streams": args.sse, "events_received": sse_counter["events"], "stream_errors": sse_counter["errors"]},
+        }
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def time_call(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return {
+        "min_ms": round(min(samples) * 1000, 3),
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+    }
+
+
+def run_micro(args: argparse.Namespace) -> dict:
+    household = generate_household(args.members, args.tasks, args.comments, args.subtasks, args.seed)
+    workdir = Path(tempfile.mkdtemp(prefix="home-todo-bench-"))
+    data_file = workdir / "data.json"
+    data_file.write_text(json.dumps(household, ensure_ascii=False), "utf-8")
+    # server.py builds its store from the environment at import time.
+    os.environ["DATA_FILE"] = str(data_file)
+    os.environ["SQLITE_FILE"] = str(workdir / "data.sqlite")
+    sys.path.insert(0, str(ROOT))
+    import server
+
+    shard = server.households.default
+    results = {}
+
+    def load_fresh() -> None:
+        store = server.create_store()
+        store.load()
+        store.close()
+
+    results["store_load"] = time_call(load_fresh, args.repeat)
+    gc.collect()
+    tracemalloc.start()
+    shard.store.load()
+    gc.collect()
+    results["store_bytes_per_task"] = tracemalloc.get_traced_memory()[0] // max(1, len(household["tasks"]))
+    tracemalloc.stop()
+    results["store_save"] = time_call(shard.store.save, args.repeat)
+
+    def encode_snapshot() -> None:
+        with shard.store._lock:
+            shard.store._fragments = {}
+            shard.store._dirty = set(shard.store.tasks_by_id)
+            shard.store._publish()
+        shard.store.encoded_snapshot().text
+
+    results["snapshot_encode"] = time_call(encode_snapshot, args.repeat)
+
+    def publish_one() -> None:
+        with shard.store._lock:
+            shard.store.index_task(shard.store.state["tasks"][0])
+            shard.store._publish()
+        shard.store.encoded_snapshot().text
+
+    results["snapshot_publish_one"] = time_call(publish_one, args.repeat)
+
+    def commit_one() -> None:
+        with shard.store._lock:
+            shard.store.index_task(shard.store.state["tasks"][0])
+            shard.store._publish()
+
+    results["snapshot_commit_one"] = time_call(commit_one, args.repeat)
+
+    clients = [server.SSEClient(household["members"][i % args.members]["id"], server.ThreadEventQueue()) for i in range(args.sse)]
+    for client in clients:
+        shard.hub.add(client)
+    task = shard.store.state["tasks"][0]
+
+    def fan_out() -> None:
+        server.publish_change(shard, "task_patched", {"task": task})
+        for client in clients:
+            while client.q.pop() is not None:
+                pass
+
+    results[f"fan_out_{args.sse}_clients"] = time_call(fan_out, args.repeat)
+    for client in clients:
+        shard.hub.remove(client)
+
+    contents = [c["content"] for t in household["tasks"] for c in t["comments"]] or [t["content"] for t in household["tasks"]]
+    matcher = shard.mentions.matcher()
+    results[f"extract_mentions_x{len(contents)}"] = time_call(
+        lambda: [server.extract_mentions(content, matcher) for content in contents], args.repeat
+    )
+
+    tasks = shard.store.state["tasks"]
+    results["reminder_schedule_reset"] = time_call(lambda: shard.scheduler.reset(tasks), args.repeat)
+
+    # The old 60s scan: every live task through process_reminders, on copies so flags do not stick.
+    copies = [copy.deepcopy(tasks) for _ in range(args.repeat)]
+
+    def reminder_pass() -> None:
+        now = datetime.now(timezone.utc)
+        for item in copies.pop():
+            server.process_reminders(shard.store, item, now, [])
+
+    results["reminder_full_pass"] = time_call(reminder_pass, args.repeat)
+    shard.store.close()
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def flatten(prefix: str, value, out: dict) -> None:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+
+
+def compare(baseline_path: str, result_path: str) -> None:
+    baseline: dict = {}
+    result: dict = {}
+    flatten("", json.loads(Path(baseline_path).read_text("utf-8"))["results"], baseline)
+    flatten("", json.loads(Path(result_path).read_text("utf-8"))["results"], result)
+    width = max((len(key) for key in result), default=10)
+    for key in sorted(result):
+        if key in baseline and baseline[key]:
+            print(f"{key:<{width}}  {baseline[key]:>12}  {result[key]:>12}  x{result[key] / baseline[key]:.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="mode", required=True)
+    for mode in ("load", "micro"):
+        p = sub.add_parser(mode)
+        p.add_argument("--members", type=int, default=6)
+        p.add_argument("--tasks", type=int, default=2000)
+        p.add_argument("--comments", type=int, default=3, help="comments per task")
+        p.add_argument("--subtasks", type=int, default=3, help="subtasks per task")
+        p.add_argument("--sse", type=int, default=50, help="open /events streams (micro: fan-out clients)")
+        p.add_argument("--seed", type=int, default=1)
+        p.add_argument("--output", help="also write the JSON result here")
+        if mode == "load":
+            p.add_argument("--duration", type=float, default=20.0, help="seconds of mixed load")
+            p.add_argument("--workers", type=int, default=8, help="concurrent keep-alive connections")
+            p.add_argument("--create-weight", type=float, default=1.0)
+            p.add_argument("--patch-weight", type=float, default=3.0)
+            p.add_argument("--state-weight", type=float, default=6.0)
+        else:
+            p.add_argument("--repeat", type=int, default=5)
+    p = sub.add_parser("compare")
+    p.add_argument("baseline")
+    p.add_argument("result")
+    args = parser.parse_args()
+
+    if args.mode == "compare":
+        compare(args.baseline, args.result)
+        return
+    results = run_load(args) if args.mode == "load" else run_micro(args)
+    report = {
+        "mode": args.mode,
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "env": {key: os.environ.get(key, "") for key in ("STORE", "SERVER_MODE")},
+        "params": {key: value for key, value in vars(args).items() if key not in {"mode", "output"}},
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + "\n", "utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Convert between data.json and the binary data.snap used by STORE=binary.
+
+    python scripts/snapshot.py to-binary [--data data.json] [--snapshot data.snap] [--force]
+    python scripts/snapshot.py to-json   [--data data.json] [--snapshot data.snap]
+    python scripts/snapshot.py info      [--snapshot data.snap]
+
+Both directions load through the server's own stores, so journal records
+newer than the source snapshot are folded in. The journal and cold tier
+(data.json.journal / data.json.cold) are shared by both formats and stay
+where they are. `to-json` is the way back to STORE=json: data.json is not
+kept up to date while the binary store runs. Stop the server first.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import server  # noqa: E402
+
+
+def to_binary(data_file: Path, snapshot_file: Path, force: bool) -> None:
+    if snapshot_file.exists():
+        if not force:
+            sys.exit(f"{snapshot_file} already exists; pass --force to rebuild it from {data_file}")
+        snapshot_file.unlink()
+    if not data_file.exists():
+        sys.exit(f"{data_file} not found")
+    store = server.BinaryStore(data_file, snapshot_file)
+    store.load()
+    store.close()
+    print(f"wrote {snapshot_file}: {len(store.state['members'])} members, {len(store.state['tasks'])} tasks")
+
+
+def to_json(data_file: Path, snapshot_file: Path) -> None:
+    if not snapshot_file.exists():
+        sys.exit(f"{snapshot_file} not found")
+    store = server.BinaryStore(data_file, snapshot_file)
+    store.load()
+    with store._lock:
+        payload = json.dumps(
+            {
+                **store.state,
+                "reminderEvents": list(store.reminder_events.values()),
+                "taskEvents": list(store.task_events.values()),
+                "journalSeq": store.seq,
+            },
+            ensure_ascii=False,
+            default=server.plain,
+            indent=2,
+        )
+    store.close()
+    server.write_atomic(data_file, payload)
+    print(f"wrote {data_file}: {len(store.state['members'])} members, {len(store.state['tasks'])} tasks")
+
+
+def info(snapshot_file: Path) -> None:
+    state, seq = server.read_binary_snapshot(snapshot_file)
+    details = sum(1 for task in state["tasks"] if task._detail is not None)
+    print(
+        json.dumps(
+            {
+                "file": str(snapshot_file),
+                "version": server.SNAPSHOT_VERSION,
+                "bytes": snapshot_file.stat().st_size,
+                "journalSeq": seq,
+                "members": len(state["members"]),
+                "tasks": len(state["tasks"]),
+                "tasksWithDetail": details,
+            },
+            ensure_ascii=False,
+            indent=2,
+        )
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="mode", required=True)
+    for mode in ("to-binary", "to-json", "info"):
+        p = sub.add_parser(mode)
+        p.add_argument("--data", type=Path, default=server.DATA_FILE)
+        p.add_argument("--snapshot", type=Path, default=server.SNAPSHOT_FILE)
+        if mode == "to-binary":
+            p.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+    if args.mode == "to-binary":
+        to_binary(args.data.resolve(), args.snapshot.resolve(), args.force)
+    elif args.mode == "to-json":
+        to_json(args.data.resolve(), args.snapshot.resolve())
+    else:
+        info(args.snapshot.resolve())
+
+
+if __name__ == "__main__":
+    main()
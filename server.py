@@ -1,28 +1,137 @@
+import asyncio
+import base64
+import bisect
+import http.client
+import io
 import json
+import logging
+import mmap
 import os
-import queue
+import re
 import calendar
+import signal
+import socket
+import subprocess
+import copy
+import gzip
+import hashlib
+import heapq
+import queue
+import sqlite3
+import struct
+import sys
 import threading
 import time
-from dataclasses import dataclass
+import unicodedata
+from array import array
+from collections import deque
+from collections.abc import Mapping, MutableMapping
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
+from email.utils import formatdate, parsedate_to_datetime
 from http import HTTPStatus
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Deque, Dict, FrozenSet, Iterator, List, Optional, Set, Tuple, Union
 from urllib.parse import parse_qs, urlparse
 from uuid import uuid4
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 
+log = logging.getLogger("home-todo")
 
 ROOT = Path(__file__).resolve().parent
 PUBLIC_DIR = ROOT / "public"
-DATA_FILE = ROOT / "data.json"
+DATA_FILE = Path(os.environ["DATA_FILE"]).resolve() if os.environ.get("DATA_FILE") else ROOT / "data.json"
+SQLITE_FILE = Path(os.environ["SQLITE_FILE"]).resolve() if os.environ.get("SQLITE_FILE") else ROOT / "data.sqlite"
+SNAPSHOT_FILE = Path(os.environ["SNAPSHOT_FILE"]).resolve() if os.environ.get("SNAPSHOT_FILE") else DATA_FILE.with_suffix(".snap")
+HOUSEHOLDS_DIR = Path(os.environ["HOUSEHOLDS_DIR"]).resolve() if os.environ.get("HOUSEHOLDS_DIR") else ROOT / "households"
+HOUSEHOLD_IDLE_SECONDS = float(os.environ.get("HOUSEHOLD_IDLE_SECONDS") or 900)
+HOUSEHOLD_PATH_RE = re.compile(r"^/h/([A-Za-z0-9_-]{1,64})(/.*)?$")
+DEFAULT_HOUSEHOLD = "default"
+WORKERS = int(os.environ.get("WORKERS") or 1)
+WORKER_ID = os.environ.get("WORKER_ID")  # set by the supervisor in each worker process
+BROKER_SOCKET = Path(os.environ["BROKER_SOCKET"]).resolve() if os.environ.get("BROKER_SOCKET") else SQLITE_FILE.with_suffix(".sock")
+LEASE_SECONDS = float(os.environ.get("LEASE_SECONDS") or 15)
+SNAPSHOT_MAGIC = b"HTODOSNP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<8sIIQQ")  # magic, version, task count, journal seq, index offset
+SNAPSHOT_LENGTH = struct.Struct("<I")
+SNAPSHOT_INDEX = struct.Struct("<QI")  # detail offset, detail length
+JOURNAL_COMPACT_BYTES = int(os.environ.get("JOURNAL_COMPACT_BYTES", str(1024 * 1024)))
+STORE_RETRY_SECONDS = 1.0
+TASK_INDEX_FIELDS = ("owner", "createdBy", "seriesId", "state")
+TASK_SORT_FIELDS = ("dueAt", "updatedAt", "createdAt")
+TASK_CHUNK = 64  # task fragments per published chunk; a commit rebuilds only the chunks it touched
+MISSING_SORT_KEY = 2**62
+RECYCLE_RETENTION_DAYS = int(os.environ.get("RECYCLE_RETENTION_DAYS") or 30)
+RETENTION_SWEEP_SECONDS = 3600
+REMINDER_DIGEST_SECONDS = float(os.environ.get("REMINDER_DIGEST_SECONDS") or 120)
+REMINDER_EVENT_RETENTION_DAYS = int(os.environ.get("REMINDER_EVENT_RETENTION_DAYS") or 90)
+REMINDER_TYPES = ("remind24h", "remind2h", "overdue")
+TASK_EVENT_RETENTION_DAYS = int(os.environ.get("TASK_EVENT_RETENTION_DAYS") or 90)
+STATS_WINDOWS = {"day": 24, "week": 7 * 24, "month": 30 * 24}  # hours
+CLOCK_RE = re.compile(r"^([01]\d|2[0-3]):([0-5]\d)$")
+KEEP_ALIVE_TIMEOUT = 30
+SSE_QUEUE_LIMIT = 100
+SSE_TARGETED_LIMIT = 500
+SSE_REPLAY_EVENTS = int(os.environ.get("SSE_REPLAY_EVENTS") or 2000)
+SSE_RESYNC_MESSAGE = 'event: resync\ndata: {"reason": "overflow"}\n\n'
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".js": "application/javascript; charset=utf-8",
+    ".json": "application/json; charset=utf-8",
+}
+HASHED_ASSET_RE = re.compile(r"\.[0-9a-f]{8,}\.[a-z0-9]+$")
+SEARCH_SAVE_SECONDS = float(os.environ.get("SEARCH_SAVE_SECONDS") or 60)
+SEARCH_FIELD_WEIGHTS = (3, 2, 1)  # content, subtasks, comments
+SEARCH_RUN_RE = re.compile(r"([\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+)|[^\W_\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
 
 
 def now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+def epoch_ms(value: Optional[str]) -> Optional[int]:
+    parsed = parse_iso(value)
+    return None if parsed is None else to_epoch_ms(parsed)
+
+
+def to_epoch_ms(value: datetime) -> int:
+    return to_epoch_us(value) // 1000
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+HOUR_US = 3600 * 1_000_000
+
+
+def to_epoch_us(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def iso_to_us(value: Any) -> Optional[int]:
+    parsed = parse_iso(value) if isinstance(value, str) else None
+    return None if parsed is None else to_epoch_us(parsed)
+
+
+def us_to_datetime(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
+
+
+def us_to_iso(value: Optional[int]) -> Optional[str]:
+    return None if value is None else (EPOCH + timedelta(microseconds=value)).isoformat()
+
+
 def parse_iso(value: Optional[str]) -> Optional[datetime]:
     if not value:
         return None
@@ -34,24 +143,38 @@ def parse_iso(value: Optional[str]) -> Optional[datetime]:
         return None
 
 
-def json_response(handler: BaseHTTPRequestHandler, status: int, payload: Any) -> None:
-    raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-    handler.send_response(status)
-    handler.send_header("Content-Type", "application/json; charset=utf-8")
-    handler.send_header("Content-Length", str(len(raw)))
-    handler.end_headers()
-    handler.wfile.write(raw)
+@dataclass
+class Response:
+    status: int
+    body: bytes = b""
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+SSE_HEADERS = {
+    "Content-Type": "text/event-stream; charset=utf-8",
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+}
+
+
+def json_response(status: int, payload: Any) -> Response:
+    raw = json.dumps(payload, ensure_ascii=False, default=plain).encode("utf-8")
+    return Response(status, raw, {"Content-Type": "application/json; charset=utf-8"})
+
+
+def parse_json_body(raw: bytes) -> Dict[str, Any]:
+    try:
+        body = json.loads(raw.decode("utf-8"))
+    except Exception:
+        return {}
+    return body if isinstance(body, dict) else {}
 
 
 def read_json_body(handler: BaseHTTPRequestHandler) -> Dict[str, Any]:
     length = int(handler.headers.get("Content-Length") or 0)
     if length <= 0:
         return {}
-    raw = handler.rfile.read(length)
-    try:
-        return json.loads(raw.decode("utf-8"))
-    except Exception:
-        return {}
+    return parse_json_body(handler.rfile.read(length))
 
 
 def safe_path_join(base: Path, rel: str) -> Optional[Path]:
@@ -62,12 +185,510 @@ def safe_path_join(base: Path, rel: str) -> Optional[Path]:
     return candidate
 
 
-def create_member(name: str) -> Dict[str, Any]:
-    return {
+def intern_id(value: Any) -> Optional[str]:
+    return None if value is None else sys.intern(str(value))
+
+
+def intern_ids(values: Any) -> List[str]:
+    return [sys.intern(str(value)) for value in values or []]
+
+
+class Record(MutableMapping):
+    """A dict-compatible record kept in __slots__.
+
+    FIELDS maps each public JSON key to its slot, in serialization order, and
+    TIMES lists the keys held as epoch microseconds (read back as UTC
+    ISO-8601). CONVERT maps a key to the function that turns an incoming JSON
+    value into what its slot holds, and DEFAULTS gives the value assumed for
+    a missing key. Keys FIELDS does not know, e.g. written by the Node server,
+    are kept in ``extra``. Records compare by identity, not by content.
+    """
+
+    __slots__ = ("extra",)
+    FIELDS: Dict[str, str] = {}
+    TIMES: FrozenSet[str] = frozenset()
+    CONVERT: Dict[str, Callable[[Any], Any]] = {}
+    DEFAULTS: Dict[str, Any] = {}
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.CONVERT = {**{key: iso_to_us for key in cls.TIMES}, **cls.CONVERT}
+
+    def __init__(self, data: Any = None) -> None:
+        self.extra: Optional[Dict[str, Any]] = None
+        if type(data) is type(self):
+            self._copy(data)
+        else:
+            self._fill(data if isinstance(data, dict) else dict(data or ()))
+
+    def _copy(self, other: "Record") -> None:
+        for slot in self.FIELDS.values():
+            setattr(self, slot, getattr(other, slot))
+        self.extra = dict(other.extra) if other.extra else None
+
+    def _fill(self, data: Dict[str, Any]) -> None:
+        fields, converters, defaults = self.FIELDS, self.CONVERT, self.DEFAULTS
+        for key, slot in fields.items():
+            value = data.get(key, defaults.get(key))
+            convert = converters.get(key)
+            setattr(self, slot, value if convert is None else convert(value))
+        if not data.keys() <= fields.keys():
+            self.extra = {key: value for key, value in data.items() if key not in fields}
+
+    def _load(self, key: str, value: Any) -> Any:
+        return us_to_iso(value) if key in self.TIMES else value
+
+    def __getitem__(self, key: str) -> Any:
+        slot = self.FIELDS.get(key)
+        if slot is None:
+            if self.extra and key in self.extra:
+                return self.extra[key]
+            raise KeyError(key)
+        return self._load(key, getattr(self, slot))
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        slot = self.FIELDS.get(key)
+        if slot is None:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+        else:
+            convert = self.CONVERT.get(key)
+            setattr(self, slot, value if convert is None else convert(value))
+
+    def __delitem__(self, key: str) -> None:
+        if key in self.FIELDS:
+            setattr(self, self.FIELDS[key], None)
+        elif self.extra and key in self.extra:
+            del self.extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.FIELDS
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return len(self.FIELDS) + len(self.extra or ())
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.FIELDS or bool(self.extra and key in self.extra)
+
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    def get(self, key: str, default: Any = None) -> Any:
+        slot = self.FIELDS.get(key)
+        if slot is None:
+            return self.extra.get(key, default) if self.extra else default
+        return self._load(key, getattr(self, slot))
+
+    def clear(self) -> None:
+        self.extra = None
+        self._fill({})
+
+    def update(self, other: Any = (), **kwargs: Any) -> None:
+        if type(other) is type(self):
+            self._copy(other)
+        else:
+            fields, converters = self.FIELDS, self.CONVERT
+            for key, value in (other.items() if isinstance(other, (dict, Mapping)) else other):
+                slot = fields.get(key)
+                if slot is None:
+                    self[key] = value
+                    continue
+                convert = converters.get(key)
+                setattr(self, slot, value if convert is None else convert(value))
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {key: self._load(key, getattr(self, slot)) for key, slot in self.FIELDS.items()}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def to_row(self) -> List[Any]:
+        """Slot values in FIELDS order, then extra: how the binary snapshot stores a record."""
+        return [*(getattr(self, slot) for slot in self.FIELDS.values()), self.extra]
+
+    @classmethod
+    def from_row(cls, row: List[Any]) -> "Record":
+        record = cls.__new__(cls)
+        values = row[:-1]
+        # Rows written before a field was added end early; the missing slots read as None.
+        for index, slot in enumerate(cls.FIELDS.values()):
+            setattr(record, slot, values[index] if index < len(values) else None)
+        record.extra = row[-1]
+        return record
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "Record":
+        clone = type(self).__new__(type(self))
+        for slot in self.FIELDS.values():
+            setattr(clone, slot, copy.deepcopy(getattr(self, slot), memo))
+        clone.extra = copy.deepcopy(self.extra, memo)
+        return clone
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def plain(value: Any) -> Any:
+    """json.dumps default= hook: records serialize to the same JSON as the dicts they replace."""
+    if isinstance(value, Record):
+        return value.to_dict()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class Member(Record):
+    """A household member. wechatOpenId comes from the Node server's schema; it is
+    a field rather than an extra key so every store returns the same member JSON."""
+
+    __slots__ = ("id", "name", "reminder_prefs", "wechat_open_id")
+    FIELDS = {"id": "id", "name": "name", "reminderPrefs": "reminder_prefs", "wechatOpenId": "wechat_open_id"}
+    CONVERT = {"id": intern_id, "name": intern_id}
+
+
+class Reminders(Record):
+    __slots__ = ("remind24h_sent", "remind2h_sent", "last_overdue_at", "snooze_until")
+    FIELDS = {
+        "remind24hSent": "remind24h_sent",
+        "remind2hSent": "remind2h_sent",
+        "lastOverdueAt": "last_overdue_at",
+        "snoozeUntil": "snooze_until",
+    }
+    TIMES = frozenset({"lastOverdueAt", "snoozeUntil"})
+    DEFAULTS = {"remind24hSent": False, "remind2hSent": False}
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "remind24hSent": self.remind24h_sent,
+            "remind2hSent": self.remind2h_sent,
+            "lastOverdueAt": us_to_iso(self.last_overdue_at),
+            "snoozeUntil": us_to_iso(self.snooze_until),
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class ReminderEvent(Record):
+    """One reminder for one member: queued by the scheduler, then sent in a digest.
+
+    The reminder_events row of store/sqliteStore.js plus queuedAt; sentAt
+    stays empty while the event waits in the outbox.
+    """
+
+    __slots__ = ("id", "task_id", "member_id", "type", "queued_at", "sent_at")
+    FIELDS = {"id": "id", "taskId": "task_id", "memberId": "member_id", "type": "type", "queuedAt": "queued_at", "sentAt": "sent_at"}
+    TIMES = frozenset({"queuedAt", "sentAt"})
+    CONVERT = {"taskId": intern_id, "memberId": intern_id}
+
+
+class TaskEvent(Record):
+    """One change to a task: the task_events row of store/sqliteStore.js (id, taskId,
+    actorId, action, occurredAt) plus what the completion stats need of the task."""
+
+    __slots__ = ("id", "task_id", "actor_id", "action", "occurred_at", "state", "previous_state", "owners", "series_id", "due_at", "created_at")
+    FIELDS = {
+        "id": "id",
+        "taskId": "task_id",
+        "actorId": "actor_id",
+        "action": "action",
+        "occurredAt": "occurred_at",
+        "state": "state",
+        "previousState": "previous_state",
+        "owners": "owners",
+        "seriesId": "series_id",
+        "dueAt": "due_at",
+        "createdAt": "created_at",
+    }
+    TIMES = frozenset({"occurredAt", "dueAt", "createdAt"})
+    CONVERT = {"taskId": intern_id, "actorId": intern_id, "state": intern_id, "previousState": intern_id, "owners": intern_ids}
+    DETAIL = ("state", "previousState", "owners", "seriesId", "dueAt", "createdAt")  # kept in task_events.detail
+
+
+class Subtask(Record):
+    """Subtask and comment times stay ISO strings; nothing on the server compares them."""
+
+    __slots__ = ("id", "content", "done", "created_at", "done_at")
+    FIELDS = {"id": "id", "content": "content", "done": "done", "createdAt": "created_at", "doneAt": "done_at"}
+    DEFAULTS = {"done": False}
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "content": self.content,
+            "done": self.done,
+            "createdAt": self.created_at,
+            "doneAt": self.done_at,
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class Comment(Record):
+    __slots__ = ("id", "author_id", "content", "mentions", "created_at")
+    FIELDS = {"id": "id", "authorId": "author_id", "content": "content", "mentions": "mentions", "createdAt": "created_at"}
+    CONVERT = {"authorId": intern_id, "mentions": intern_ids}
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "authorId": self.author_id,
+            "content": self.content,
+            "mentions": self.mentions,
+            "createdAt": self.created_at,
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+def record_list(kind: type) -> Callable[[Any], Optional[List[Record]]]:
+    """CONVERT entry for a list of records; an empty list is stored as None."""
+
+    def convert(values: Any) -> Optional[List[Record]]:
+        return [value if isinstance(value, kind) else kind(value) for value in values] if values else None
+
+    return convert
+
+
+TASK_LISTS = {"subtasks": "_subtasks", "comments": "_comments"}
+
+
+class TaskDetail:
+    """The subtasks and comments of a task, still encoded in a memory-mapped snapshot."""
+
+    __slots__ = ("buffer", "offset", "length")
+
+    def __init__(self, buffer: mmap.mmap, offset: int, length: int) -> None:
+        self.buffer = buffer
+        self.offset = offset
+        self.length = length
+
+    def raw(self) -> bytes:
+        return self.buffer[self.offset : self.offset + self.length]
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "TaskDetail":
+        return self
+
+
+DETAIL_LOCK = threading.Lock()
+
+
+class Task(Record):
+    """A task: timestamps are epoch microseconds, state and ids are interned,
+    and empty subtask/comment lists are not allocated until something is added.
+
+    A task read from a binary snapshot keeps its subtasks and comments in
+    ``_detail`` until something first touches them.
+    """
+
+    __slots__ = (
+        "id", "content", "owners", "due_at", "repeat_type", "series_id", "occurrence", "require_confirm",
+        "created_by", "state", "_subtasks", "_comments", "archived_at", "deleted_at", "created_at", "updated_at",
+        "reminders", "_detail",
+    )
+    FIELDS = {
+        "id": "id",
+        "content": "content",
+        "owners": "owners",
+        "dueAt": "due_at",
+        "repeat": "repeat_type",
+        "seriesId": "series_id",
+        "occurrence": "occurrence",
+        "requireConfirm": "require_confirm",
+        "createdBy": "created_by",
+        "state": "state",
+        "subtasks": "_subtasks",
+        "comments": "_comments",
+        "archivedAt": "archived_at",
+        "deletedAt": "deleted_at",
+        "createdAt": "created_at",
+        "updatedAt": "updated_at",
+        "reminders": "reminders",
+    }
+    TIMES = frozenset({"dueAt", "archivedAt", "deletedAt", "createdAt", "updatedAt"})
+    CONVERT = {
+        "id": intern_id,
+        "createdBy": intern_id,
+        "seriesId": intern_id,
+        "state": intern_id,
+        "owners": intern_ids,
+        "repeat": lambda value: sys.intern(normalize_repeat(value)["type"]),
+        "subtasks": record_list(Subtask),
+        "comments": record_list(Comment),
+        "reminders": lambda value: value if isinstance(value, Reminders) else Reminders(value),
+    }
+    DEFAULTS = {"occurrence": 1, "requireConfirm": False}
+
+    def _copy(self, other: "Task") -> None:
+        other.load_detail()
+        self._detail = None
+        super()._copy(other)
+
+    def _fill(self, data: Dict[str, Any]) -> None:
+        self._detail = None
+        super()._fill(data)
+
+    def load_detail(self) -> None:
+        detail = self._detail
+        if detail is None:
+            return
+        with DETAIL_LOCK:
+            if self._detail is detail:
+                data = json.loads(detail.raw())
+                self._subtasks = self.CONVERT["subtasks"](data.get("subtasks"))
+                self._comments = self.CONVERT["comments"](data.get("comments"))
+                self._detail = None
+
+    def encoded_detail(self) -> bytes:
+        """Subtasks and comments as the binary snapshot stores them; empty when there are none."""
+        if self._detail is not None:
+            return self._detail.raw()
+        if not self._subtasks and not self._comments:
+            return b""
+        detail = {"subtasks": self._subtasks or [], "comments": self._comments or []}
+        return json.dumps(detail, ensure_ascii=False, default=plain, separators=(",", ":")).encode("utf-8")
+
+    def to_row(self) -> List[Any]:
+        """The snapshot header: every slot but the subtasks and comments, which encoded_detail() holds."""
+        return [
+            self.id, self.content, self.owners, self.due_at, self.repeat_type, self.series_id, self.occurrence,
+            self.require_confirm, self.created_by, self.state, self.archived_at, self.deleted_at, self.created_at,
+            self.updated_at, self.reminders.to_row(), self.extra,
+        ]
+
+    @classmethod
+    def from_row(cls, row: List[Any], detail: Optional[TaskDetail] = None) -> "Task":
+        task = cls.__new__(cls)
+        (
+            task.id, task.content, owners, task.due_at, repeat_type, series_id, task.occurrence,
+            task.require_confirm, created_by, state, task.archived_at, task.deleted_at, task.created_at,
+            task.updated_at, reminders, task.extra,
+        ) = row
+        task.id = intern_id(task.id)
+        task.owners = intern_ids(owners)
+        task.repeat_type = sys.intern(repeat_type)
+        task.series_id = intern_id(series_id)
+        task.created_by = intern_id(created_by)
+        task.state = intern_id(state)
+        task.reminders = Reminders.from_row(reminders)
+        task._subtasks = None
+        task._comments = None
+        task._detail = detail
+        return task
+
+    def _load(self, key: str, value: Any) -> Any:
+        if key == "repeat":
+            return {"type": value}
+        return super()._load(key, value)
+
+    def __getitem__(self, key: str) -> Any:
+        slot = TASK_LISTS.get(key)
+        if slot is None:
+            return super().__getitem__(key)
+        self.load_detail()
+        items = getattr(self, slot)
+        if items is None:
+            items = []
+            setattr(self, slot, items)
+        return items
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in TASK_LISTS:
+            self.load_detail()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        if key in TASK_LISTS:
+            self.load_detail()
+        super().__delitem__(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        slot = TASK_LISTS.get(key)
+        if slot is not None:
+            self.load_detail()
+            return getattr(self, slot) or []
+        return super().get(key, default)
+
+    def update(self, other: Any = (), **kwargs: Any) -> None:
+        self.load_detail()
+        super().update(other, **kwargs)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "Task":
+        with DETAIL_LOCK:
+            clone = super().__deepcopy__(memo)
+            clone._detail = self._detail
+        return clone
+
+    def millis(self, key: str) -> Optional[int]:
+        value = getattr(self, self.FIELDS[key])
+        return None if value is None else value // 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        self.load_detail()
+        data = {
+            "id": self.id,
+            "content": self.content,
+            "owners": self.owners,
+            "dueAt": us_to_iso(self.due_at),
+            "repeat": {"type": self.repeat_type},
+            "seriesId": self.series_id,
+            "occurrence": self.occurrence,
+            "requireConfirm": self.require_confirm,
+            "createdBy": self.created_by,
+            "state": self.state,
+            "subtasks": [st.to_dict() for st in self._subtasks] if self._subtasks else [],
+            "comments": [c.to_dict() for c in self._comments] if self._comments else [],
+            "archivedAt": us_to_iso(self.archived_at),
+            "deletedAt": us_to_iso(self.deleted_at),
+            "createdAt": us_to_iso(self.created_at),
+            "updatedAt": us_to_iso(self.updated_at),
+            "reminders": self.reminders.to_dict(),
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def encode(self) -> str:
+        """The task's JSON. Subtasks and comments still in a binary snapshot are spliced in
+        as stored (after the other fields) rather than loaded, so publishing keeps them lazy."""
+        detail = self._detail
+        if detail is None:
+            return json.dumps(self, ensure_ascii=False, default=plain)
+        data = {
+            "id": self.id,
+            "content": self.content,
+            "owners": self.owners,
+            "dueAt": us_to_iso(self.due_at),
+            "repeat": {"type": self.repeat_type},
+            "seriesId": self.series_id,
+            "occurrence": self.occurrence,
+            "requireConfirm": self.require_confirm,
+            "createdBy": self.created_by,
+            "state": self.state,
+            "archivedAt": us_to_iso(self.archived_at),
+            "deletedAt": us_to_iso(self.deleted_at),
+            "createdAt": us_to_iso(self.created_at),
+            "updatedAt": us_to_iso(self.updated_at),
+            "reminders": self.reminders.to_dict(),
+        }
+        if self.extra:
+            data.update(self.extra)
+        head = json.dumps(data, ensure_ascii=False, default=plain)
+        return f"{head[:-1]}, {detail.raw().decode('utf-8')[1:]}"
+
+
+def create_member(name: str) -> Member:
+    return Member({
         "id": str(uuid4()),
         "name": name,
         "reminderPrefs": {"enabled": True, "remind24h": True, "remind2h": True, "overdue": True},
-    }
+    })
 
 
 def normalize_repeat(value: Any) -> Dict[str, str]:
@@ -79,32 +700,104 @@ def normalize_repeat(value: Any) -> Dict[str, str]:
     return {"type": value}
 
 
-def create_subtask(content: str) -> Dict[str, Any]:
-    return {"id": str(uuid4()), "content": content, "done": False, "createdAt": now_iso(), "doneAt": None}
+def create_subtask(content: str) -> Subtask:
+    return Subtask({"id": str(uuid4()), "content": content, "done": False, "createdAt": now_iso(), "doneAt": None})
+
+
+class MentionMatcher:
+    """Aho-Corasick automaton over "@name" for every member of a roster.
+
+    find() reads a comment once and, left to right, keeps the longest mention
+    starting at each position that does not overlap an earlier one, so
+    "@爸爸" is not also read as "@爸". Every pattern starts with "@", so the
+    matches reported at one position are bounded by the "@"s within the
+    longest name.
+    """
+
+    def __init__(self, members: List[Dict[str, Any]]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Optional[Tuple[int, List[str]]]] = [None]
+        self._link: List[int] = [0]  # nearest proper suffix state that ends a name, 0 for none
+        for m in members:
+            name = str(m.get("name") or "").strip()
+            mid = str(m.get("id") or "").strip()
+            if not name or not mid:
+                continue
+            node = 0
+            for ch in "@" + name:
+                child = self._goto[node].get(ch)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(None)
+                    self._link.append(0)
+                    self._goto[node][ch] = child
+                node = child
+            if self._out[node] is None:
+                self._out[node] = (len(name) + 1, [])
+            self._out[node][1].append(mid)
+        pending = deque(self._goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for ch, child in self._goto[node].items():
+                state = self._fail[node]
+                while state and ch not in self._goto[state]:
+                    state = self._fail[state]
+                target = self._goto[state].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                suffix = self._fail[child]
+                self._link[child] = suffix if self._out[suffix] is not None else self._link[suffix]
+                pending.append(child)
+
+    def find(self, content: str) -> List[str]:
+        """Ids of the members mentioned in content, in order of first mention."""
+        goto, fail, out, link = self._goto, self._fail, self._out, self._link
+        longest: Dict[int, Tuple[int, List[str]]] = {}
+        node = 0
+        end = content.find("@")
+        size = len(content)
+        while 0 <= end < size:
+            ch = content[end]
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = node if out[node] is not None else link[node]
+            while hit:
+                length, ids = out[hit]
+                start = end - length + 1
+                if start not in longest or longest[start][0] < end:
+                    longest[start] = (end, ids)
+                hit = link[hit]
+            # Back at the root nothing can match before the next "@".
+            end = content.find("@", end + 1) if node == 0 else end + 1
+        if not longest:
+            return []
+        found: Dict[str, None] = {}
+        covered = -1
+        for start in sorted(longest):
+            if start <= covered:
+                continue
+            covered, ids = longest[start]
+            found.update(dict.fromkeys(ids))
+        return list(found)
 
 
-def extract_mentions(content: str, members: List[Dict[str, Any]]) -> List[str]:
+def extract_mentions(content: str, matcher: MentionMatcher) -> List[str]:
     if not content:
         return []
-    found: List[str] = []
-    for m in members:
-        name = str(m.get("name") or "").strip()
-        mid = str(m.get("id") or "").strip()
-        if not name or not mid:
-            continue
-        if f"@{name}" in content and mid not in found:
-            found.append(mid)
-    return found
+    return matcher.find(content)
 
 
-def create_comment(author_id: str, content: str, mention_ids: List[str]) -> Dict[str, Any]:
-    return {
+def create_comment(author_id: str, content: str, mention_ids: List[str]) -> Comment:
+    return Comment({
         "id": str(uuid4()),
         "authorId": author_id,
         "content": content,
         "mentions": mention_ids,
         "createdAt": now_iso(),
-    }
+    })
 
 
 def add_months(dt: datetime, months: int) -> datetime:
@@ -126,6 +819,26 @@ def next_due(due: datetime, repeat_type: str) -> datetime:
     return due
 
 
+REPEAT_STEPS = {"daily": timedelta(days=1), "weekly": timedelta(weeks=1)}
+
+
+def series_occurrences(head_due: datetime, repeat_type: str, start: datetime) -> Iterator[Tuple[int, datetime]]:
+    """Lazily yield (steps after head, due) for the not yet spawned occurrences due at or after start.
+
+    Follows next_due one step at a time, so monthly dates clamp exactly as
+    real spawns do; fixed-length steps jump straight to the window instead.
+    """
+    steps, due = 1, next_due(head_due, repeat_type)
+    step = REPEAT_STEPS.get(repeat_type)
+    if step is not None and due < start:
+        skip = -((due - start) // step)
+        steps, due = steps + skip, due + step * skip
+    while True:
+        if due >= start:
+            yield steps, due
+        steps, due = steps + 1, next_due(due, repeat_type)
+
+
 def create_task(
     content: str,
     owners: List[str],
@@ -135,11 +848,11 @@ def create_task(
     repeat: Any = None,
     series_id: Optional[str] = None,
     occurrence: int = 1,
-) -> Dict[str, Any]:
+) -> Task:
     now = now_iso()
     repeat_obj = normalize_repeat(repeat)
     series_id = series_id or (str(uuid4()) if repeat_obj["type"] != "none" else None)
-    return {
+    return Task({
         "id": str(uuid4()),
         "content": content,
         "owners": owners,
@@ -162,521 +875,4558 @@ def create_task(
             "lastOverdueAt": None,
             "snoozeUntil": None,
         },
-    }
+    })
 
 
-class Store:
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+METRICS_LOG_SECONDS = float(os.environ.get("METRICS_LOG_SECONDS") or 0)
+
+
+class Metrics:
+    """Counters, histograms and callback gauges rendered in the Prometheus text format.
+
+    Each update is a dict lookup plus a bisect under one short lock, cheap
+    enough to stay on in production.
+    """
+
     def __init__(self) -> None:
-        self._lock = threading.RLock()
-        self.state: Dict[str, Any] = {"members": [], "tasks": []}
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._gauges: Dict[str, Callable[[], List[Tuple[Dict[str, str], float]]]] = {}
 
-    def load(self) -> None:
+    def describe(self, name: str, kind: str, text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self._help[name] = (kind, text)
+        if kind == "histogram":
+            self._buckets[name] = buckets
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
         with self._lock:
-            if DATA_FILE.exists():
-                try:
-                    parsed = json.loads(DATA_FILE.read_text("utf-8"))
-                    self.state = {
-                        "members": list(parsed.get("members") or []),
-                        "tasks": list(parsed.get("tasks") or []),
-                    }
-                    for task in self.state["tasks"]:
-                        task.setdefault("subtasks", [])
-                        task.setdefault("comments", [])
-                        task.setdefault("archivedAt", None)
-                        task.setdefault("deletedAt", None)
-                        task["repeat"] = normalize_repeat(task.get("repeat"))
-                        if task["repeat"]["type"] != "none":
-                            task.setdefault("seriesId", str(uuid4()))
-                            task.setdefault("occurrence", 1)
-                        else:
-                            task.setdefault("seriesId", None)
-                            task.setdefault("occurrence", 1)
-                        task.setdefault(
-                            "reminders",
-                            {"remind24hSent": False, "remind2hSent": False, "lastOverdueAt": None, "snoozeUntil": None},
-                        )
-                    names = {str(m.get("name") or "") for m in self.state["members"]}
-                    if not self.state["tasks"] and names == {"爸爸", "妈妈", "我", "外婆"}:
-                        default_members = [create_member(name) for name in ["爸爸", "妈妈", "爷爷", "奶奶"]]
-                        self.state = {"members": default_members, "tasks": []}
-                        self.save()
-                    return
-                except Exception:
-                    pass
-            default_members = [create_member(name) for name in ["爸爸", "妈妈", "爷爷", "奶奶"]]
-            self.state = {"members": default_members, "tasks": []}
-            self.save()
+            self._counters[key] = self._counters.get(key, 0) + value
 
-    def save(self) -> None:
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        buckets = self._buckets[name]
         with self._lock:
-            DATA_FILE.write_text(json.dumps(self.state, ensure_ascii=False, indent=2), "utf-8")
+            series = self._histograms.get(key)
+            if series is None:
+                # One count per bucket, then +Inf, sum.
+                series = self._histograms[key] = [0.0] * (len(buckets) + 2)
+            series[bisect.bisect_left(buckets, value)] += 1
+            series[-1] += value
 
-    def get_member(self, member_id: str) -> Optional[Dict[str, Any]]:
+    def gauge(self, name: str, text: str, collect: Callable[[], List[Tuple[Dict[str, str], float]]]) -> None:
+        self._help[name] = ("gauge", text)
+        self._gauges[name] = collect
+
+    @staticmethod
+    def _labels(labels: Any, extra: str = "") -> str:
+        parts = ['%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> str:
         with self._lock:
-            for m in self.state["members"]:
-                if m.get("id") == member_id:
-                    return m
-            return None
+            counters = dict(self._counters)
+            histograms = {key: list(series) for key, series in self._histograms.items()}
+        lines: List[str] = []
+        for name, (kind, text) in sorted(self._help.items()):
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{self._labels(labels)} {value:g}")
+            elif kind == "histogram":
+                buckets = self._buckets[name]
+                for (metric, labels), series in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0.0
+                    for bound, count in zip(buckets, series):
+                        cumulative += count
+                        le = self._labels(labels, 'le="%g"' % bound)
+                        lines.append(f"{name}_bucket{le} {cumulative:g}")
+                    cumulative += series[len(buckets)]
+                    le = self._labels(labels, 'le="+Inf"')
+                    lines.append(f"{name}_bucket{le} {cumulative:g}")
+                    lines.append(f"{name}_sum{self._labels(labels)} {series[-1]:.6f}")
+                    lines.append(f"{name}_count{self._labels(labels)} {cumulative:g}")
+            else:
+                try:
+                    samples = self._gauges[name]()
+                except Exception:
+                    samples = []
+                for labels, value in samples:
+                    lines.append(f"{name}{self._labels(sorted(labels.items()))} {value:g}")
+        return "\n".join(lines) + "\n"
 
-    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+    def summary(self) -> Dict[str, Any]:
+        """Compact view for log dumps: counter values and histogram count/sum."""
         with self._lock:
-            for t in self.state["tasks"]:
-                if t.get("id") == task_id:
-                    return t
-            return None
+            out: Dict[str, Any] = {}
+            for (name, labels), value in self._counters.items():
+                out[name + self._labels(labels)] = value
+            for (name, labels), series in self._histograms.items():
+                count = sum(series[:-1])
+                out[name + self._labels(labels)] = {"count": count, "sum": round(series[-1], 6)}
+        return out
 
 
-@dataclass
-class SSEClient:
-    member_id: str
-    q: "queue.Queue[str]"
+metrics = Metrics()
+metrics.describe("http_requests_total", "counter", "HTTP requests by method, route and status.")
+metrics.describe("http_request_duration_seconds", "histogram", "Time spent in dispatch by method, route and PATCH action.")
+metrics.describe("store_lock_wait_seconds", "histogram", "Time spent waiting to acquire store._lock.")
+metrics.describe("store_lock_hold_seconds", "histogram", "Time store._lock was held per outermost acquisition.")
+metrics.describe("store_write_seconds", "histogram", "Duration of one group-commit write (journal append + fsync or SQLite transaction).")
+metrics.describe("store_write_records", "histogram", "Records per group-commit write.", (1, 2, 5, 10, 25, 50, 100, 250, 1000))
+metrics.describe("store_write_bytes_total", "counter", "Serialized record bytes handed to the storage backend.")
+metrics.describe("store_write_errors_total", "counter", "Group-commit writes that failed and were queued for retry.")
+metrics.describe("store_save_seconds", "histogram", "Duration of a full save / journal compaction.")
+metrics.describe("store_save_bytes_total", "counter", "Bytes written by full saves.")
+metrics.describe("serialize_seconds", "histogram", "JSON encoding time by what was encoded.")
+metrics.describe("sse_messages_dropped_total", "counter", "Queued SSE state messages superseded by a resync signal.")
+metrics.describe("sse_resyncs_total", "counter", "Resync signals sent to clients that fell too far behind.")
+metrics.describe("sse_replays_total", "counter", "Reconnects served from the event ring, by outcome.")
+metrics.describe("reminder_pass_seconds", "histogram", "Duration of one reminder scheduler pass over due tasks.")
+metrics.describe("reminder_tasks_processed_total", "counter", "Tasks examined by the reminder scheduler.")
+metrics.describe("reminders_queued_total", "counter", "Reminder events queued for a member's next digest.")
+metrics.describe("reminder_digests_total", "counter", "Reminder digests sent to members.")
+metrics.describe("reminders_sent_total", "counter", "Queued reminder events delivered in a digest.")
 
 
-class SSEHub:
+class TimedRLock:
+    """threading.RLock that reports wait and hold time of the outermost acquisition."""
+
     def __init__(self) -> None:
         self._lock = threading.RLock()
-        self._clients: List[SSEClient] = []
+        self._local = threading.local()
 
-    def add(self, client: SSEClient) -> None:
-        with self._lock:
-            self._clients.append(client)
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        depth = getattr(self._local, "depth", 0)
+        if depth:
+            self._lock.acquire()
+            self._local.depth = depth + 1
+            return True
+        started = time.perf_counter()
+        if not self._lock.acquire(blocking, timeout):
+            return False
+        acquired = time.perf_counter()
+        self._local.depth = 1
+        self._local.acquired = acquired
+        metrics.observe("store_lock_wait_seconds", acquired - started)
+        return True
 
-    def remove(self, client: SSEClient) -> None:
-        with self._lock:
-            self._clients = [c for c in self._clients if c is not client]
+    def release(self) -> None:
+        depth = self._local.depth - 1
+        self._local.depth = depth
+        held = time.perf_counter() - self._local.acquired if depth == 0 else None
+        self._lock.release()
+        if held is not None:
+            metrics.observe("store_lock_hold_seconds", held)
 
-    def broadcast_event(self, event: str, data: Any) -> None:
-        payload = json.dumps(data, ensure_ascii=False)
-        msg = f"event: {event}\ndata: {payload}\n\n"
-        with self._lock:
-            for client in list(self._clients):
-                try:
-                    client.q.put_nowait(msg)
-                except Exception:
-                    pass
+    def __enter__(self) -> bool:
+        return self.acquire()
 
-    def send_to_member(self, member_id: str, event: str, data: Any) -> None:
-        payload = json.dumps(data, ensure_ascii=False)
-        msg = f"event: {event}\ndata: {payload}\n\n"
-        with self._lock:
-            for client in list(self._clients):
-                if client.member_id != member_id:
-                    continue
-                try:
-                    client.q.put_nowait(msg)
-                except Exception:
-                    pass
+    def __exit__(self, *exc: Any) -> None:
+        self.release()
 
 
-store = Store()
-hub = SSEHub()
+def write_atomic(path: Path, payload: Union[str, bytes]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.{int(time.time() * 1000)}.tmp")
+    with open(temp_path, "wb") if isinstance(payload, bytes) else open(temp_path, "w", encoding="utf-8") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    try:
+        dir_fd = os.open(str(path.parent), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
 
 
-def broadcast_state() -> None:
-    hub.broadcast_event("state_update", store.state)
+def is_cold(task: Task) -> bool:
+    """Archived and recycle-bin tasks live in the cold tier, outside state["tasks"]."""
+    return task.archived_at is not None or task.deleted_at is not None
 
 
-def is_owner(task: Dict[str, Any], member_id: str) -> bool:
-    return member_id in (task.get("owners") or [])
+def task_index_keys(task: Task) -> Dict[str, Any]:
+    """What a task is filed under: key tuples per TASK_INDEX_FIELDS and a sort key per TASK_SORT_FIELDS."""
+    keys: Dict[str, Any] = {
+        "owner": tuple(task.owners),
+        "createdBy": (task.created_by or "",),
+        "seriesId": (task.series_id,) if task.series_id else (),
+        "state": (task.state or "",),
+    }
+    for sort_field in TASK_SORT_FIELDS:
+        value = task.millis(sort_field)
+        keys[sort_field] = MISSING_SORT_KEY if value is None else value
+    return keys
 
 
-def is_creator(task: Dict[str, Any], member_id: str) -> bool:
-    return task.get("createdBy") == member_id
+HOT_TASK_SQL = "archived_at IS NULL AND deleted_at IS NULL"  # is_cold() as a WHERE clause on tasks
 
 
-ACTIVE_STATES = {"已指派", "已接受", "进行中"}
+def put_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    return {"op": "put_task", "task": task}
 
 
-def maybe_send_reminder(task: Dict[str, Any], reminder_type: str) -> None:
-    for owner_id in task.get("owners") or []:
-        member = store.get_member(owner_id)
-        if not member:
-            continue
-        prefs = member.get("reminderPrefs") or {}
-        if not prefs.get("enabled", True):
-            continue
-        if reminder_type == "remind24h" and not prefs.get("remind24h", True):
-            continue
-        if reminder_type == "remind2h" and not prefs.get("remind2h", True):
-            continue
-        if reminder_type == "overdue" and not prefs.get("overdue", True):
-            continue
-        hub.send_to_member(owner_id, "reminder", {"taskId": task.get("id"), "type": reminder_type})
+def delete_task(task_id: str) -> Dict[str, Any]:
+    return {"op": "delete_task", "id": task_id}
 
 
-def reminder_loop(stop_event: threading.Event) -> None:
-    while not stop_event.is_set():
-        time.sleep(60)
-        now = datetime.now(timezone.utc)
-        dirty = False
-        with store._lock:
-            for task in store.state["tasks"]:
-                if task.get("deletedAt") or task.get("archivedAt"):
-                    continue
-                if task.get("state") not in ACTIVE_STATES:
-                    continue
-                due = parse_iso(task.get("dueAt"))
-                if not due:
-                    continue
-                snooze_until = parse_iso((task.get("reminders") or {}).get("snoozeUntil"))
-                if snooze_until and now < snooze_until:
-                    continue
-                if snooze_until and now >= snooze_until:
-                    task["reminders"]["snoozeUntil"] = None
-                    dirty = True
-                diff = due - now
-                if diff <= timedelta(hours=24) and not task["reminders"].get("remind24hSent"):
-                    maybe_send_reminder(task, "remind24h")
-                    task["reminders"]["remind24hSent"] = True
-                    dirty = True
-                if diff <= timedelta(hours=2) and not task["reminders"].get("remind2hSent"):
-                    maybe_send_reminder(task, "remind2h")
-                    task["reminders"]["remind2hSent"] = True
-                    dirty = True
-                if diff <= timedelta(seconds=0):
-                    last = parse_iso(task["reminders"].get("lastOverdueAt"))
-                    if not last or (now - last) >= timedelta(hours=6):
-                        maybe_send_reminder(task, "overdue")
-                        task["reminders"]["lastOverdueAt"] = now_iso()
-                        dirty = True
-        if dirty:
-            store.save()
+def put_member(member: Dict[str, Any]) -> Dict[str, Any]:
+    return {"op": "put_member", "member": member}
 
 
-class Handler(BaseHTTPRequestHandler):
-    server_version = "HomeTodo/0.1"
+def put_reminder_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    return {"op": "put_reminder_event", "event": event}
 
-    def do_OPTIONS(self) -> None:
-        self.send_response(HTTPStatus.NO_CONTENT)
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "GET,POST,PATCH,DELETE,OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
-        self.end_headers()
 
-    def do_GET(self) -> None:
-        parsed = urlparse(self.path)
-        if parsed.path == "/api/state":
-            json_response(self, 200, store.state)
-            return
-        if parsed.path == "/events":
-            self.handle_sse(parsed)
-            return
-        self.serve_static(parsed.path)
+def delete_reminder_event(event_id: str) -> Dict[str, Any]:
+    return {"op": "delete_reminder_event", "id": event_id}
 
-    def do_POST(self) -> None:
-        parsed = urlparse(self.path)
-        if parsed.path == "/api/members":
-            body = read_json_body(self)
-            name = str(body.get("name") or "").strip()
-            if not name:
-                json_response(self, 400, {"error": "成员名不能为空"})
-                return
-            member = create_member(name)
-            with store._lock:
-                store.state["members"].append(member)
-                store.save()
-            broadcast_state()
-            json_response(self, 200, member)
-            return
-        if parsed.path == "/api/tasks":
-            body = read_json_body(self)
-            content = str(body.get("content") or "").strip()
-            created_by = str(body.get("createdBy") or "").strip()
-            if not content or not created_by:
-                json_response(self, 400, {"error": "任务内容或创建者不能为空"})
-                return
-            owners = [str(x) for x in (body.get("owners") or []) if store.get_member(str(x))]
-            if not owners and store.get_member(created_by):
-                owners = [created_by]
-            due_at = body.get("dueAt")
-            due_at = parse_iso(due_at).isoformat() if due_at and parse_iso(due_at) else None
-            repeat = body.get("repeat")
-            repeat_obj = normalize_repeat(repeat)
-            if repeat_obj["type"] != "none" and not due_at:
-                json_response(self, 400, {"error": "设置重复任务时必须填写截止时间"})
-                return
-            require_confirm = bool(body.get("requireConfirm"))
-            task = create_task(content, owners, due_at, require_confirm, created_by, repeat_obj)
-            with store._lock:
-                store.state["tasks"].insert(0, task)
-                store.save()
-            broadcast_state()
-            json_response(self, 200, task)
-            return
-        json_response(self, 404, {"error": "Not found"})
 
-    def do_PATCH(self) -> None:
-        parsed = urlparse(self.path)
-        if parsed.path.startswith("/api/members/"):
-            member_id = parsed.path.split("/")[-1]
-            member = store.get_member(member_id)
-            if not member:
-                json_response(self, 404, {"error": "成员不存在"})
-                return
-            body = read_json_body(self)
-            with store._lock:
-                if body.get("name"):
-                    member["name"] = str(body.get("name") or "").strip() or member["name"]
-                prefs = body.get("reminderPrefs")
-                if isinstance(prefs, dict):
-                    member["reminderPrefs"] = {
-                        "enabled": bool(prefs.get("enabled")),
-                        "remind24h": bool(prefs.get("remind24h")),
-                        "remind2h": bool(prefs.get("remind2h")),
-                        "overdue": bool(prefs.get("overdue")),
-                    }
-                store.save()
-            broadcast_state()
-            json_response(self, 200, member)
-            return
+def put_task_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    return {"op": "put_task_event", "event": event}
 
-        if parsed.path.startswith("/api/tasks/"):
-            task_id = parsed.path.split("/")[-1]
-            task = store.get_task(task_id)
-            if not task:
-                json_response(self, 404, {"error": "任务不存在"})
-                return
-            body = read_json_body(self)
-            actor_id = str(body.get("actorId") or "").strip()
-            action = str(body.get("action") or "").strip()
-            changed = False
-            spawned: Optional[Dict[str, Any]] = None
-            with store._lock:
-                previous_state = task.get("state")
-                if task.get("deletedAt") and action not in {"restore", "purge"}:
-                    json_response(self, 400, {"error": "任务已在回收站，无法操作"})
-                    return
-                if action == "accept" and is_owner(task, actor_id) and task.get("state") == "已指派":
-                    task["state"] = "已接受"
-                    changed = True
-                if action == "start" and is_owner(task, actor_id) and task.get("state") == "已接受":
-                    task["state"] = "进行中"
-                    changed = True
-                if action == "complete" and is_owner(task, actor_id) and task.get("state") in {"已接受", "进行中"}:
-                    task["state"] = "待确认" if task.get("requireConfirm") else "已完成"
-                    changed = True
-                if action == "confirm" and is_creator(task, actor_id) and task.get("state") == "待确认":
-                    task["state"] = "已完成"
-                    changed = True
-                if action == "snooze" and is_owner(task, actor_id):
-                    minutes = max(5, int(body.get("minutes") or 60))
-                    task["reminders"]["snoozeUntil"] = (datetime.now(timezone.utc) + timedelta(minutes=minutes)).isoformat()
-                    changed = True
-                if (
-                    action == "archive"
-                    and (is_creator(task, actor_id) or is_owner(task, actor_id))
-                    and not task.get("archivedAt")
-                    and task.get("state") == "已完成"
-                ):
-                    task["archivedAt"] = now_iso()
-                    changed = True
-                if action == "unarchive" and (is_creator(task, actor_id) or is_owner(task, actor_id)) and task.get("archivedAt"):
-                    task["archivedAt"] = None
-                    changed = True
-                if action == "restore" and (is_creator(task, actor_id) or is_owner(task, actor_id)) and task.get("deletedAt"):
-                    task["deletedAt"] = None
-                    changed = True
-                if action == "purge" and (is_creator(task, actor_id) or is_owner(task, actor_id)) and task.get("deletedAt"):
-                    store.state["tasks"] = [t for t in store.state["tasks"] if t.get("id") != task_id]
-                    store.save()
-                    broadcast_state()
-                    json_response(self, 200, {"ok": True})
-                    return
-                if action == "subtask_add" and (is_creator(task, actor_id) or is_owner(task, actor_id)):
-                    content = str(body.get("content") or "").strip()
-                    if not content:
-                        json_response(self, 400, {"error": "子任务内容不能为空"})
-                        return
-                    task.setdefault("subtasks", []).append(create_subtask(content))
-                    changed = True
-                if action == "subtask_toggle" and (is_creator(task, actor_id) or is_owner(task, actor_id)):
-                    subtask_id = str(body.get("subtaskId") or "").strip()
-                    for st in task.get("subtasks") or []:
-                        if st.get("id") == subtask_id:
-                            st["done"] = not bool(st.get("done"))
-                            st["doneAt"] = now_iso() if st["done"] else None
-                            changed = True
-                            break
-                if action == "subtask_delete" and (is_creator(task, actor_id) or is_owner(task, actor_id)):
-                    subtask_id = str(body.get("subtaskId") or "").strip()
-                    before = len(task.get("subtasks") or [])
-                    task["subtasks"] = [st for st in (task.get("subtasks") or []) if st.get("id") != subtask_id]
-                    changed = changed or (len(task["subtasks"]) != before)
-                if action == "comment" and (is_creator(task, actor_id) or is_owner(task, actor_id)):
-                    content = str(body.get("content") or "").strip()
-                    if not content:
-                        json_response(self, 400, {"error": "评论内容不能为空"})
-                        return
-                    mention_ids = extract_mentions(content, store.state["members"])
-                    comment = create_comment(actor_id, content, mention_ids)
-                    task.setdefault("comments", []).append(comment)
-                    for mid in mention_ids:
-                        if mid != actor_id:
-                            member = store.get_member(mid)
-                            prefs = (member or {}).get("reminderPrefs") or {}
-                            if not prefs.get("enabled", True):
-                                continue
-                            hub.send_to_member(
-                                mid,
-                                "mention",
-                                {"taskId": task.get("id"), "commentId": comment["id"], "authorId": actor_id, "content": content},
-                            )
-                    changed = True
-                if action == "update" and (is_creator(task, actor_id) or is_owner(task, actor_id)):
-                    if body.get("content"):
-                        task["content"] = str(body.get("content") or "").strip()
-                    if isinstance(body.get("owners"), list):
-                        owners = [str(x) for x in body.get("owners") if store.get_member(str(x))]
-                        if owners:
-                            task["owners"] = owners
-                    if "dueAt" in body:
-                        due = parse_iso(body.get("dueAt"))
-                        task["dueAt"] = due.isoformat() if due else None
-                        task["reminders"]["remind24hSent"] = False
-                        task["reminders"]["remind2hSent"] = False
-                        task["reminders"]["lastOverdueAt"] = None
-                        task["reminders"]["snoozeUntil"] = None
-                    if "repeat" in body:
-                        next_repeat = normalize_repeat(body.get("repeat"))
-                        if next_repeat["type"] != "none" and not task.get("dueAt"):
-                            json_response(self, 400, {"error": "设置重复任务时必须填写截止时间"})
-                            return
-                        task["repeat"] = next_repeat
-                        if next_repeat["type"] != "none" and not task.get("seriesId"):
-                            task["seriesId"] = str(uuid4())
-                            task["occurrence"] = 1
-                    if "requireConfirm" in body:
-                        task["requireConfirm"] = bool(body.get("requireConfirm"))
-                    changed = True
-                if not changed:
-                    json_response(self, 400, {"error": "动作不允许或无变化"})
-                    return
-                task["updatedAt"] = now_iso()
-                if (
-                    previous_state != "已完成"
-                    and task.get("state") == "已完成"
-                    and not task.get("archivedAt")
-                    and not task.get("deletedAt")
-                ):
-                    repeat_type = normalize_repeat(task.get("repeat")).get("type")
-                    due = parse_iso(task.get("dueAt"))
-                    if repeat_type != "none" and due:
-                        next_task = create_task(
-                            content=task.get("content") or "",
-                            owners=list(task.get("owners") or []),
-                            due_at=next_due(due, repeat_type).isoformat(),
-                            require_confirm=bool(task.get("requireConfirm")),
-                            created_by=str(task.get("createdBy") or ""),
-                            repeat=task.get("repeat"),
-                            series_id=str(task.get("seriesId") or ""),
-                            occurrence=int(task.get("occurrence") or 1) + 1,
-                        )
-                        if task.get("subtasks"):
-                            next_task["subtasks"] = [
-                                create_subtask(str(st.get("content") or "")) for st in task.get("subtasks") or []
-                            ]
-                        store.state["tasks"].insert(0, next_task)
-                        spawned = next_task
-                store.save()
-            broadcast_state()
-            json_response(self, 200, {"task": task, "spawned": spawned})
-            return
 
-        json_response(self, 404, {"error": "Not found"})
+def delete_task_event(event_id: str) -> Dict[str, Any]:
+    return {"op": "delete_task_event", "id": event_id}
 
-    def do_DELETE(self) -> None:
-        parsed = urlparse(self.path)
-        if parsed.path.startswith("/api/tasks/"):
-            task_id = parsed.path.split("/")[-1]
-            body = read_json_body(self)
-            actor_id = str(body.get("actorId") or "").strip()
-            with store._lock:
-                task = store.get_task(task_id)
-                if not task:
-                    json_response(self, 404, {"error": "任务不存在"})
-                    return
-                if not (is_creator(task, actor_id) or is_owner(task, actor_id)):
-                    json_response(self, 403, {"error": "无删除权限"})
-                    return
-                if not task.get("deletedAt"):
-                    task["deletedAt"] = now_iso()
-                    task["updatedAt"] = now_iso()
-                store.save()
-            broadcast_state()
-            json_response(self, 200, {"ok": True})
-            return
-        json_response(self, 404, {"error": "Not found"})
-
-    def serve_static(self, request_path: str) -> None:
-        if request_path in {"", "/"}:
-            request_path = "/index.html"
-        file_path = safe_path_join(PUBLIC_DIR, request_path)
-        if not file_path or not file_path.exists() or not file_path.is_file():
-            self.send_response(404)
-            self.end_headers()
-            return
-        content = file_path.read_bytes()
-        content_type = "text/plain; charset=utf-8"
-        if file_path.suffix == ".html":
-            content_type = "text/html; charset=utf-8"
-        elif file_path.suffix == ".css":
-            content_type = "text/css; charset=utf-8"
-        elif file_path.suffix == ".js":
-            content_type = "application/javascript; charset=utf-8"
-        elif file_path.suffix == ".json":
-            content_type = "application/json; charset=utf-8"
-        self.send_response(200)
-        self.send_header("Content-Type", content_type)
-        self.send_header("Content-Length", str(len(content)))
-        self.end_headers()
-        self.wfile.write(content)
 
-    def handle_sse(self, parsed) -> None:
-        params = parse_qs(parsed.query or "")
-        member_id = (params.get("memberId") or [""])[0]
-        if not member_id:
-            self.send_response(400)
-            self.end_headers()
-            return
-        self.send_response(200)
-        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
-        self.send_header("Cache-Control", "no-cache")
-        self.send_header("Connection", "keep-alive")
-        self.end_headers()
-        self.wfile.write(b": connected\n\n")
-        self.wfile.flush()
+def task_event(task: Dict[str, Any], actor_id: str, action: str, previous_state: Optional[str], occurred_at: str) -> TaskEvent:
+    return TaskEvent({
+        "id": str(uuid4()),
+        "taskId": task.get("id"),
+        "actorId": actor_id,
+        "action": action,
+        "occurredAt": occurred_at,
+        "state": task.get("state"),
+        "previousState": previous_state,
+        "owners": list(task.get("owners") or []),
+        "seriesId": task.get("seriesId"),
+        "dueAt": task.get("dueAt"),
+        "createdAt": task.get("createdAt"),
+    })
 
-        client = SSEClient(member_id=member_id, q=queue.Queue(maxsize=100))
-        hub.add(client)
-        try:
-            client.q.put_nowait(f"event: state_update\ndata: {json.dumps(store.state, ensure_ascii=False)}\n\n")
-            while True:
-                try:
-                    msg = client.q.get(timeout=25)
-                    self.wfile.write(msg.encode("utf-8"))
-                    self.wfile.flush()
-                except queue.Empty:
-                    self.wfile.write(b": ping\n\n")
-                    self.wfile.flush()
-        except Exception:
-            pass
-        finally:
-            hub.remove(client)
+
+class EncodedSnapshot:
+    """An encoded state shared by every reader and never changed once built.
+
+    Either finished text, or the version, members and per-task fragments of
+    a published store snapshot, joined by whichever reader needs it first.
+    """
+
+    def __init__(
+        self,
+        key: Tuple[int, int],
+        etag: str,
+        text: Optional[str] = None,
+        parts: Optional[Tuple[int, str, Tuple[Tuple[str, ...], ...]]] = None,
+    ) -> None:
+        self.key = key
+        self.etag = etag
+        self.parts = parts
+        self._text = text
+        self._body: Optional[bytes] = None
+        self._gzip: Optional[bytes] = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            started = time.perf_counter()
+            version, members, chunks = self.parts
+            tasks = ", ".join(fragment for chunk in chunks for fragment in chunk)
+            self._text = f'{{"version": {version}, "members": {members}, "tasks": [{tasks}]}}'
+            metrics.observe("serialize_seconds", time.perf_counter() - started, kind="snapshot")
+        return self._text
+
+    @property
+    def body(self) -> bytes:
+        if self._body is None:
+            self._body = self.text.encode("utf-8")
+        return self._body
+
+    def gzipped(self) -> bytes:
+        if self._gzip is None:
+            self._gzip = gzip.compress(self.body, compresslevel=6)
+        return self._gzip
+
+
+class StoreError(Exception):
+    """The store could not make a change durable; the request gets a 503."""
+
+
+class Store:
+    """In-memory household state shared by every storage backend.
+
+    Mutations are applied to ``state`` under ``_lock`` and then handed to
+    ``commit()``. A single writer thread drains everything queued since the
+    previous write into one ``_write()`` call, so concurrent requests share
+    one fsync / transaction. Subclasses only implement ``_read``, ``_write``,
+    ``_read_cold`` and ``save``.
+
+    A failed write stays queued and is retried; until one succeeds, waiters
+    and new commits get StoreError instead of an acknowledgement.
+
+    Archived and deleted tasks are kept out of ``state`` in a cold tier that
+    is only read from disk the first time someone asks for it; changes made
+    before that are held in ``_cold_overlay`` (None marks a purge).
+    """
+
+    def __init__(self) -> None:
+        self._lock = TimedRLock()
+        self.state: Dict[str, Any] = {"members": [], "tasks": []}
+        self._version = 0
+        self.epoch = uuid4().hex[:8]
+        self._fragments: Dict[str, str] = {}
+        self._dirty: Set[str] = set()
+        # Published task fragments in chunks, oldest chunk first and newest task first within one.
+        self._chunks: List[Tuple[str, ...]] = []
+        self._chunk_ids: List[List[str]] = []
+        self._chunk_of: Dict[str, int] = {}
+        self._stale_chunks: Set[int] = set()
+        self._task_parts: Tuple[Tuple[str, ...], ...] = ()
+        self.members_json = "[]"
+        self._members_dirty = True
+        self.published = EncodedSnapshot((0, 0), f'"{self.epoch}-0-0"', parts=(0, "[]", ()))
+        self.members_by_id: Dict[str, Dict[str, Any]] = {}
+        self.tasks_by_id: Dict[str, Dict[str, Any]] = {}
+        self.indexes: Dict[str, Dict[str, Set[str]]] = {index_field: {} for index_field in TASK_INDEX_FIELDS}
+        self.series_heads: Dict[str, str] = {}
+        self._index_keys: Dict[str, Dict[str, Tuple[str, ...]]] = {}
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._cold: Optional[Dict[str, Dict[str, Any]]] = None
+        self._cold_overlay: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.search_file: Optional[Path] = None
+        self.reminder_events: Dict[str, ReminderEvent] = {}
+        self.task_events: Dict[str, TaskEvent] = {}
+        self.roster_version = 0
+        self.seq = 0
+        self._durable = 0
+        self._pending: List[Tuple[int, str]] = []
+        self._failure: Optional[Exception] = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._writer: Optional[threading.Thread] = None
+
+    def load(self) -> None:
+        with self._lock:
+            loaded = self._read()
+            seeded = loaded is None
+            if loaded is not None:
+                self.state = {
+                    "members": [m if isinstance(m, Member) else Member(m) for m in loaded["members"]],
+                    "tasks": [t if isinstance(t, Task) else Task(t) for t in loaded["tasks"]],
+                }
+                for task in self.state["tasks"]:
+                    if task.repeat_type != "none" and not task.series_id:
+                        task.series_id = str(uuid4())
+                names = {str(m.get("name") or "") for m in self.state["members"]}
+                if not self.state["tasks"] and names == {"爸爸", "妈妈", "我", "外婆"}:
+                    default_members = [create_member(name) for name in ["爸爸", "妈妈", "爷爷", "奶奶"]]
+                    self.state = {"members": default_members, "tasks": []}
+                    seeded = True
+            else:
+                default_members = [create_member(name) for name in ["爸爸", "妈妈", "爷爷", "奶奶"]]
+                self.state = {"members": default_members, "tasks": []}
+            self.rebuild_indexes()
+            self._publish()
+            if seeded:
+                self.save()
+            self._durable = self.seq
+            # Data written before tiering (or by the Node server) still has history in the hot set.
+            stale = [task for task in self.state["tasks"] if is_cold(task)]
+            if stale:
+                self.commit(*[put_task(task) for task in stale])
+            self._writer = threading.Thread(target=self._run_writer, daemon=True)
+            self._writer.start()
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _write(self, batch: List[Tuple[int, str]]) -> None:
+        raise NotImplementedError
+
+    def save(self) -> None:
+        raise NotImplementedError
+
+    def _read_cold(self) -> Dict[str, Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _apply(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Replay one record onto state; returns it with the live Task / Member in place of the decoded dict."""
+        op = record.get("op")
+        if op == "put_task":
+            task = record["task"]
+            existing = self.tasks_by_id.get(task.get("id"))
+            if existing is not None:
+                existing.clear()
+                existing.update(task)
+                task = existing
+            else:
+                task = Task(task)
+            self.place_task(task)
+            return put_task(task)
+        if op == "delete_task":
+            self.remove_task(str(record.get("id")))
+        elif op == "put_member":
+            self._members_dirty = True
+            member = record["member"]
+            existing = self.members_by_id.get(member.get("id"))
+            if existing is not None:
+                existing.clear()
+                existing.update(member)
+                self.roster_version += 1
+                return put_member(existing)
+            member = Member(member)
+            self.add_member(member)
+            return put_member(member)
+        elif op == "put_reminder_event":
+            event = ReminderEvent(record["event"])
+            self.add_reminder_event(event)
+            return put_reminder_event(event)
+        elif op == "delete_reminder_event":
+            self.remove_reminder_event(str(record.get("id")))
+        elif op == "put_task_event":
+            event = TaskEvent(record["event"])
+            self.add_task_event(event)
+            return put_task_event(event)
+        elif op == "delete_task_event":
+            self.remove_task_event(str(record.get("id")))
+        return record
+
+    def rebuild_indexes(self) -> None:
+        self.members_by_id = {m.get("id"): m for m in self.state["members"]}
+        self._members_dirty = True
+        self._fragments = {}
+        self._chunks, self._chunk_ids, self._chunk_of, self._stale_chunks = [], [], {}, set()
+        self.roster_version += 1
+        self.tasks_by_id = {}
+        self.indexes = {index_field: {} for index_field in TASK_INDEX_FIELDS}
+        self.sorted_indexes = {sort_field: [] for sort_field in TASK_SORT_FIELDS}
+        self.series_heads = {}
+        self._index_keys = {}
+        for task in self.state["tasks"]:
+            self.tasks_by_id[task.get("id")] = task
+            self.index_task(task)
+
+    def index_task(self, task: Task) -> None:
+        """Refresh the secondary index entries of a task after it changed in place."""
+        task_id = task.id
+        self._dirty.add(task_id)
+        keys = task_index_keys(task)
+        previous = self._index_keys.get(task_id)
+        if previous == keys:
+            return
+        for sort_field in TASK_SORT_FIELDS:
+            if previous and previous[sort_field] == keys[sort_field]:
+                continue
+            entries = self.sorted_indexes[sort_field]
+            if previous:
+                self._remove_sorted(entries, (previous[sort_field], task_id))
+            bisect.insort(entries, (keys[sort_field], task_id))
+        for index_field in TASK_INDEX_FIELDS:
+            old = previous[index_field] if previous else ()
+            if old == keys[index_field]:
+                continue
+            index = self.indexes[index_field]
+            for key in old:
+                ids = index.get(key)
+                if ids is not None:
+                    ids.discard(task_id)
+                    if not ids:
+                        del index[key]
+            for key in keys[index_field]:
+                index.setdefault(key, set()).add(task_id)
+            if index_field == "seriesId":
+                for key in {*old, *keys[index_field]}:
+                    self._refresh_series_head(key)
+        self._index_keys[task_id] = keys
+
+    @staticmethod
+    def _remove_sorted(entries: List[Tuple[int, str]], entry: Tuple[int, str]) -> None:
+        pos = bisect.bisect_left(entries, entry)
+        if pos < len(entries) and entries[pos] == entry:
+            del entries[pos]
+
+    def _unindex_task(self, task_id: str) -> None:
+        self._dirty.add(task_id)
+        chunk = self._chunk_of.pop(task_id, None)
+        if chunk is not None:
+            self._chunk_ids[chunk].remove(task_id)
+            self._stale_chunks.add(chunk)
+        previous = self._index_keys.pop(task_id, None)
+        if not previous:
+            return
+        for sort_field in TASK_SORT_FIELDS:
+            self._remove_sorted(self.sorted_indexes[sort_field], (previous[sort_field], task_id))
+        for index_field in TASK_INDEX_FIELDS:
+            index = self.indexes[index_field]
+            for key in previous[index_field]:
+                ids = index.get(key)
+                if ids is not None:
+                    ids.discard(task_id)
+                    if not ids:
+                        del index[key]
+        for key in previous["seriesId"]:
+            self._refresh_series_head(key)
+
+    def _refresh_series_head(self, series_id: str) -> None:
+        """Point series_heads at the latest hot occurrence of a series, the one the next spawn copies."""
+        ids = self.indexes["seriesId"].get(series_id)
+        if not ids:
+            self.series_heads.pop(series_id, None)
+            return
+        self.series_heads[series_id] = max(ids, key=lambda i: (self.tasks_by_id[i].occurrence or 1, i))
+
+    def add_task(self, task: Dict[str, Any]) -> None:
+        with self._lock:
+            self.state["tasks"].insert(0, task)
+            self.tasks_by_id[task.get("id")] = task
+            self.index_task(task)
+
+    def remove_task(self, task_id: str) -> None:
+        with self._lock:
+            self._set_cold(task_id, None)
+            task = self.tasks_by_id.pop(task_id, None)
+            if task is None:
+                return
+            self.state["tasks"].remove(task)
+            self._unindex_task(task_id)
+
+    def place_task(self, task: Dict[str, Any]) -> None:
+        """Move a task into the tier its archivedAt/deletedAt say it belongs to, and refresh its indexes."""
+        task_id = task.get("id")
+        with self._lock:
+            if is_cold(task):
+                hot = self.tasks_by_id.pop(task_id, None)
+                if hot is not None:
+                    self.state["tasks"].remove(hot)
+                    self._unindex_task(task_id)
+                self._set_cold(task_id, task)
+                return
+            if task_id in self.tasks_by_id:
+                self.index_task(task)
+                return
+            if self._cold is not None:
+                self._cold.pop(task_id, None)
+            else:
+                self._cold_overlay.pop(task_id, None)
+            self.add_task(task)
+
+    def _set_cold(self, task_id: str, task: Optional[Dict[str, Any]]) -> None:
+        if self._cold is None:
+            self._cold_overlay[task_id] = task
+        elif task is None:
+            self._cold.pop(task_id, None)
+        else:
+            self._cold[task_id] = task
+
+    def _ensure_cold(self) -> Dict[str, Dict[str, Any]]:
+        if self._cold is not None:
+            return self._cold
+        loaded = self._read_cold()
+        with self._lock:
+            if self._cold is None:
+                for task_id, task in self._cold_overlay.items():
+                    if task is None:
+                        loaded.pop(task_id, None)
+                    else:
+                        loaded[task_id] = task
+                for task_id in [i for i in loaded if i in self.tasks_by_id]:
+                    # Moved back to the hot set after the cold copy was written.
+                    del loaded[task_id]
+                self._cold = loaded
+                self._cold_overlay = {}
+            return self._cold
+
+    def cold_tasks(self) -> List[Dict[str, Any]]:
+        cold = self._ensure_cold()
+        with self._lock:
+            return list(cold.values())
+
+    def get_cold_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return self._ensure_cold().get(task_id)
+
+    def cold_loaded(self) -> bool:
+        return self._cold is not None
+
+    def release_cold(self) -> None:
+        """Drop the in-memory cold tier once everything in it is durable; the next access reloads it."""
+        with self._lock, self._cond:
+            if self._durable == self.seq:
+                self._cold = None
+
+    def add_member(self, member: Dict[str, Any]) -> None:
+        with self._lock:
+            self.state["members"].append(member)
+            self.members_by_id[member.get("id")] = member
+            self.roster_version += 1
+
+    def rename_member(self, member: Dict[str, Any], name: str) -> None:
+        with self._lock:
+            if member.get("name") != name:
+                member["name"] = name
+                self.roster_version += 1
+
+    def find_tasks(self, index_field: str, key: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self.tasks_by_id[task_id] for task_id in self.indexes[index_field].get(key, ())]
+
+    def related_tasks(self, member_id: str) -> List[Dict[str, Any]]:
+        """Hot tasks the member owns or created, oldest first."""
+        with self._lock:
+            ids = self.indexes["owner"].get(member_id, set()) | self.indexes["createdBy"].get(member_id, set())
+            order = sorted((self._index_keys[task_id]["createdAt"], task_id) for task_id in ids)
+            return [self.tasks_by_id[task_id] for _, task_id in order]
+
+    def query_tasks(
+        self,
+        filters: Dict[str, Set[str]],
+        sort: str = "createdAt",
+        descending: bool = False,
+        due_from: Optional[int] = None,
+        due_to: Optional[int] = None,
+        after: Optional[Tuple[int, str]] = None,
+        limit: int = 50,
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, str]]]:
+        """Page through tasks matching every filter (values within one field are OR-ed), in (sort key, id) order.
+
+        Returns the page and the position to pass as `after` for the next one, or None on the last page.
+        """
+        with self._lock:
+            candidates: Optional[Set[str]] = None
+            for index_field, values in filters.items():
+                index = self.indexes[index_field]
+                ids: Set[str] = set().union(*(index.get(v, ()) for v in values)) if values else set()
+                candidates = ids if candidates is None else candidates & ids
+                if not candidates:
+                    return [], None
+            entries = self.sorted_indexes[sort]
+            if candidates is not None and len(candidates) * 8 < len(entries):
+                # Few matches: sorting them beats walking the whole sort index.
+                entries = sorted((self._index_keys[task_id][sort], task_id) for task_id in candidates)
+                candidates = None
+            lo, hi = 0, len(entries)
+            if sort == "dueAt" and (due_from is not None or due_to is not None):
+                if due_from is not None:
+                    lo = bisect.bisect_left(entries, (due_from, ""))
+                hi = bisect.bisect_left(entries, (MISSING_SORT_KEY if due_to is None else due_to + 1, ""))
+            if after is not None:
+                if descending:
+                    hi = min(hi, bisect.bisect_left(entries, after))
+                else:
+                    lo = max(lo, bisect.bisect_right(entries, after))
+            positions = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+            page: List[Dict[str, Any]] = []
+            last: Optional[Tuple[int, str]] = None
+            for pos in positions:
+                entry = entries[pos]
+                task_id = entry[1]
+                if candidates is not None and task_id not in candidates:
+                    continue
+                if sort != "dueAt" and (due_from is not None or due_to is not None):
+                    due = self._index_keys[task_id]["dueAt"]
+                    if due == MISSING_SORT_KEY or (due_from is not None and due < due_from) or (due_to is not None and due > due_to):
+                        continue
+                if len(page) == limit:
+                    return page, last
+                page.append(self.tasks_by_id[task_id])
+                last = entry
+            return page, None
+
+    def query_cold_tasks(
+        self,
+        filters: Dict[str, Set[str]],
+        archived: bool,
+        deleted: bool,
+        sort: str = "createdAt",
+        descending: bool = False,
+        due_from: Optional[int] = None,
+        due_to: Optional[int] = None,
+        after: Optional[Tuple[int, str]] = None,
+        limit: int = 50,
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, str]]]:
+        """query_tasks() over the archived and/or deleted tasks of the cold tier, with the same order and positions.
+
+        The cold tier has no indexes, so this sorts the matching tasks on every call.
+        """
+        cold = self._ensure_cold()
+        with self._lock:
+            entries: List[Tuple[int, str]] = []
+            for task in cold.values():
+                if not (deleted if task.deleted_at is not None else archived):
+                    continue
+                keys = task_index_keys(task)
+                if any(values.isdisjoint(keys[index_field]) for index_field, values in filters.items()):
+                    continue
+                due = keys["dueAt"]
+                if due_from is not None or due_to is not None:
+                    if due == MISSING_SORT_KEY or (due_from is not None and due < due_from) or (due_to is not None and due > due_to):
+                        continue
+                entries.append((keys[sort], task.id))
+            entries.sort()
+            lo, hi = 0, len(entries)
+            if after is not None:
+                if descending:
+                    hi = bisect.bisect_left(entries, after)
+                else:
+                    lo = bisect.bisect_right(entries, after)
+            positions = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+            page = [entries[pos] for pos in positions[:limit]]
+            return [cold[task_id] for _, task_id in page], page[-1] if len(positions) > limit else None
+
+    def subscribe(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        """Call listener(record) for every committed record, under the store lock."""
+        self._listeners.append(listener)
+
+    def commit(self, *records: Dict[str, Any]) -> int:
+        """Queue records for the writer; pass the result to wait() once the lock is released."""
+        with self._lock, self._cond:
+            if self._failure is not None:
+                raise StoreError(self._failure)
+            for record in records:
+                if record.get("op") == "put_task":
+                    self.place_task(record["task"])
+                elif record.get("op") == "put_member":
+                    self._members_dirty = True
+                for listener in self._listeners:
+                    listener(record)
+                self.seq += 1
+                self._pending.append((self.seq, json.dumps({"seq": self.seq, **record}, ensure_ascii=False, default=plain)))
+            self._publish()
+            self._cond.notify_all()
+            return self.seq
+
+    def wait(self, seq: int) -> None:
+        """Block until seq is on disk; raises StoreError if the write carrying it failed."""
+        with self._cond:
+            while self._durable < seq and not self._closed:
+                if self._failure is not None:
+                    raise StoreError(self._failure)
+                self._cond.wait()
+
+    @property
+    def failure(self) -> Optional[Exception]:
+        """The error of the last write if it failed and no write has succeeded since."""
+        return self._failure
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._writer:
+            self._writer.join(timeout=5)
+
+    def _run_writer(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                batch, self._pending = self._pending, []
+                closed = self._closed
+            if batch:
+                started = time.perf_counter()
+                try:
+                    self._write(batch)
+                except Exception as exc:
+                    log.error("store write of %d records failed: %s", len(batch), exc)
+                    metrics.inc("store_write_errors_total")
+                    with self._cond:
+                        # Keep the batch at the head of the queue; nothing in it is acknowledged.
+                        self._pending = batch + self._pending
+                        self._failure = exc
+                        self._cond.notify_all()
+                        if closed:
+                            log.error("store closed with %d records not written", len(self._pending))
+                            return
+                        self._cond.wait(STORE_RETRY_SECONDS)
+                    continue
+                metrics.observe("store_write_seconds", time.perf_counter() - started)
+                metrics.observe("store_write_records", len(batch))
+                metrics.inc("store_write_bytes_total", sum(len(line) for _, line in batch))
+                with self._cond:
+                    self._durable = max(self._durable, batch[-1][0])
+                    self._failure = None
+                    self._cond.notify_all()
+            if closed:
+                return
+
+    def get_member(self, member_id: str) -> Optional[Dict[str, Any]]:
+        return self.members_by_id.get(member_id)
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return self.tasks_by_id.get(task_id)
+
+    def add_reminder_event(self, event: ReminderEvent) -> None:
+        with self._lock:
+            self.reminder_events[event.id] = event
+
+    def remove_reminder_event(self, event_id: str) -> None:
+        with self._lock:
+            self.reminder_events.pop(event_id, None)
+
+    def add_task_event(self, event: TaskEvent) -> None:
+        with self._lock:
+            self.task_events[event.id] = event
+
+    def remove_task_event(self, event_id: str) -> None:
+        with self._lock:
+            self.task_events.pop(event_id, None)
+
+    def pending_reminders(self, member_id: Optional[str] = None) -> List[ReminderEvent]:
+        """Queued reminder events not sent yet, oldest first."""
+        with self._lock:
+            pending = [
+                event
+                for event in self.reminder_events.values()
+                if event.sent_at is None and (member_id is None or event.member_id == member_id)
+            ]
+        pending.sort(key=lambda event: event.queued_at or 0)
+        return pending
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @version.setter
+    def version(self, version: int) -> None:
+        """Set with the lock held; the new version is published right away."""
+        self._version = version
+        self._publish()
+
+    def _publish(self) -> None:
+        """Swap in a snapshot of the current state; call with the lock held.
+
+        Readers take ``published`` without the lock, and a published snapshot
+        is never changed, so a handler mutating tasks in place cannot tear
+        it. Only tasks (re)indexed since the last call are encoded again, and
+        only the chunks holding them are rebuilt; every other chunk, and the
+        members unless a put_member was committed, is shared with the
+        previous snapshot.
+        """
+        if self._dirty or self._stale_chunks:
+            started = time.perf_counter()
+            fragments = self._fragments
+            stale = self._stale_chunks
+            added: Set[str] = set()
+            for task_id in self._dirty:
+                task = self.tasks_by_id.get(task_id)
+                if task is None:
+                    fragments.pop(task_id, None)
+                    continue
+                fragments[task_id] = task.encode()
+                chunk = self._chunk_of.get(task_id)
+                if chunk is None:
+                    added.add(task_id)
+                else:
+                    stale.add(chunk)
+            if added:
+                # add_task() inserts at the front of state["tasks"], so that is where the new ones are.
+                ordered: List[str] = []
+                for task in self.state["tasks"]:
+                    if task.id in added:
+                        ordered.append(task.id)
+                        if len(ordered) == len(added):
+                            break
+                for task_id in reversed(ordered):
+                    if not self._chunk_ids or len(self._chunk_ids[-1]) >= TASK_CHUNK:
+                        self._chunk_ids.append([])
+                        self._chunks.append(())
+                    self._chunk_ids[-1].insert(0, task_id)
+                    self._chunk_of[task_id] = len(self._chunk_ids) - 1
+                    stale.add(len(self._chunk_ids) - 1)
+            if len(self._chunk_ids) > 2 * (len(self.tasks_by_id) // TASK_CHUNK + 1):
+                # Removals left the chunks sparse; regroup them in state["tasks"] order.
+                ids = [task.id for task in reversed(self.state["tasks"])]
+                self._chunk_ids = [ids[start : start + TASK_CHUNK][::-1] for start in range(0, len(ids), TASK_CHUNK)]
+                self._chunk_of = {task_id: chunk for chunk, chunk_ids in enumerate(self._chunk_ids) for task_id in chunk_ids}
+                stale = set(range(len(self._chunk_ids)))
+                self._chunks = [()] * len(self._chunk_ids)
+            for chunk in stale:
+                self._chunks[chunk] = tuple(fragments[task_id] for task_id in self._chunk_ids[chunk])
+            self._dirty = set()
+            self._stale_chunks = set()
+            self._task_parts = tuple(reversed(self._chunks))
+            metrics.observe("serialize_seconds", time.perf_counter() - started, kind="publish")
+        if self._members_dirty:
+            self.members_json = json.dumps(self.state["members"], ensure_ascii=False, default=plain)
+            self._members_dirty = False
+        key = (self._version, self.seq)
+        self.published = EncodedSnapshot(key, f'"{self.epoch}-{key[0]}-{key[1]}"', parts=(key[0], self.members_json, self._task_parts))
+
+    def task_json(self, task: Task) -> str:
+        """A hot task's published encoding; call with the lock held."""
+        if task.id in self._dirty:
+            return task.encode()
+        return self._fragments.get(task.id) or task.encode()
+
+    def encoded_snapshot(self) -> "EncodedSnapshot":
+        """The snapshot of the last commit or version change; taken without the lock."""
+        return self.published
+
+
+class JsonStore(Store):
+    """data.json snapshot plus an append-only data.json.journal.
+
+    Once the journal passes JOURNAL_COMPACT_BYTES a background save() folds
+    it into a new snapshot stamped with the last sequence it covers; load
+    replays only the journal records newer than that stamp.
+
+    The cold tier is data.json.cold, a log of put_task / delete_task records
+    (last one per id wins). Cold changes reach it when save() compacts the
+    journal, so until then the journal stays their only durable copy.
+    """
+
+    def __init__(self, data_file: Path = DATA_FILE) -> None:
+        super().__init__()
+        self.data_file = data_file
+        self.snapshot_file = data_file
+        self.journal_file = data_file.with_name(data_file.name + ".journal")
+        self.cold_file = data_file.with_name(data_file.name + ".cold")
+        self.search_file = data_file.with_name(data_file.name + ".search")
+        self._cold_unflushed: Dict[str, Tuple[int, Optional[Dict[str, Any]]]] = {}
+        self._cold_generation = 0
+        self._journal = None
+        self._journal_size = 0
+        self._file_lock = threading.Lock()
+        self._compacting = threading.Lock()
+
+    def _read_snapshot(self) -> Tuple[Optional[Dict[str, Any]], int]:
+        """The state in the last snapshot and the journal sequence it covers."""
+        if not self.data_file.exists():
+            return None, 0
+        try:
+            parsed = json.loads(self.data_file.read_text("utf-8"))
+            state = {
+                "members": [Member(m) for m in parsed.get("members") or []],
+                "tasks": [Task(t) for t in parsed.get("tasks") or []],
+                "reminderEvents": [ReminderEvent(e) for e in parsed.get("reminderEvents") or []],
+                "taskEvents": [TaskEvent(e) for e in parsed.get("taskEvents") or []],
+            }
+            return state, int(parsed.get("journalSeq") or 0)
+        except Exception:
+            return None, 0
+
+    def _encode_snapshot(self, seq: int) -> Union[str, bytes]:
+        # The published fragments already match the state under the lock; only the join is left.
+        _, members, chunks = self.published.parts
+        tasks = ", ".join(fragment for chunk in chunks for fragment in chunk)
+        reminder_events = json.dumps(list(self.reminder_events.values()), ensure_ascii=False, default=plain)
+        task_events = json.dumps(list(self.task_events.values()), ensure_ascii=False, default=plain)
+        return (
+            f'{{"members": {members}, "tasks": [{tasks}], '
+            f'"reminderEvents": {reminder_events}, "taskEvents": {task_events}, "journalSeq": {seq}}}'
+        )
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        state, snapshot_seq = self._read_snapshot()
+        self.seq = snapshot_seq
+        if state is not None:
+            self.reminder_events = {event.id: event for event in state.pop("reminderEvents", ())}
+            self.task_events = {event.id: event for event in state.pop("taskEvents", ())}
+            self.state = state
+        self.rebuild_indexes()
+        valid_size = 0
+        if self.journal_file.exists():
+            with open(self.journal_file, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # A torn tail from a crash mid-append; it was never acknowledged.
+                        log.warning("dropping %d-byte partial record at the end of %s", len(line), self.journal_file)
+                        break
+                    valid_size += len(line)
+                    try:
+                        record = json.loads(line.decode("utf-8"))
+                    except Exception:
+                        # Keep going: the records after a damaged line were acknowledged.
+                        log.error("skipping unreadable record at byte %d of %s", valid_size - len(line), self.journal_file)
+                        continue
+                    seq = int(record.get("seq") or 0)
+                    if seq > snapshot_seq:
+                        if state is None:
+                            state = self.state
+                        self._apply(record)
+                    self.seq = max(self.seq, seq)
+        self.journal_file.parent.mkdir(parents=True, exist_ok=True)
+        self._journal = open(self.journal_file, "a", encoding="utf-8")
+        if self._journal.tell() > valid_size:
+            self._journal.truncate(valid_size)
+        self._journal_size = valid_size
+        return state
+
+    def _set_cold(self, task_id: str, task: Optional[Dict[str, Any]]) -> None:
+        super()._set_cold(task_id, task)
+        self._cold_generation += 1
+        self._cold_unflushed[task_id] = (self._cold_generation, task)
+
+    def place_task(self, task: Dict[str, Any]) -> None:
+        super().place_task(task)
+        if not is_cold(task):
+            self._cold_unflushed.pop(task.get("id"), None)
+
+    def _read_cold(self) -> Dict[str, Dict[str, Any]]:
+        cold: Dict[str, Dict[str, Any]] = {}
+        lines = 0
+        with self._file_lock:
+            if self.cold_file.exists():
+                with open(self.cold_file, "rb") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line.decode("utf-8"))
+                        except Exception:
+                            break
+                        lines += 1
+                        if record.get("op") == "put_task":
+                            cold[record["task"].get("id")] = Task(record["task"])
+                        elif record.get("op") == "delete_task":
+                            cold.pop(str(record.get("id")), None)
+            if lines > 2 * len(cold) + 64:
+                write_atomic(
+                    self.cold_file,
+                    "".join(json.dumps(put_task(task), ensure_ascii=False, default=plain) + "\n" for task in cold.values()),
+                )
+            for task_id, (_, task) in dict(self._cold_unflushed).items():
+                if task is None:
+                    cold.pop(task_id, None)
+                else:
+                    cold[task_id] = task
+        return cold
+
+    def _flush_cold(self, pending: Dict[str, Tuple[int, Optional[Dict[str, Any]]]], data: str) -> None:
+        if not pending:
+            return
+        with self._file_lock:
+            with open(self.cold_file, "a", encoding="utf-8") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        with self._lock:
+            for task_id, (generation, _) in pending.items():
+                current = self._cold_unflushed.get(task_id)
+                if current is not None and current[0] == generation:
+                    del self._cold_unflushed[task_id]
+
+    def _write(self, batch: List[Tuple[int, str]]) -> None:
+        data = "".join(line + "\n" for _, line in batch)
+        with self._file_lock:
+            try:
+                self._journal.write(data)
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+            except Exception:
+                # Cut off whatever part of the batch got out so the retry starts on a clean line.
+                try:
+                    self._journal.close()
+                except Exception:
+                    pass
+                os.truncate(self.journal_file, self._journal_size)
+                self._journal = open(self.journal_file, "a", encoding="utf-8")
+                raise
+            self._journal_size += len(data.encode("utf-8"))
+            size = self._journal_size
+        if size >= JOURNAL_COMPACT_BYTES and not self._compacting.locked():
+            threading.Thread(target=self.save, daemon=True).start()
+
+    def save(self) -> None:
+        with self._compacting:
+            started = time.perf_counter()
+            with self._lock:
+                seq = self.seq
+                payload = self._encode_snapshot(seq)
+                cold_pending = dict(self._cold_unflushed)
+                cold_data = "".join(
+                    json.dumps(put_task(task) if task is not None else delete_task(task_id), ensure_ascii=False, default=plain) + "\n"
+                    for task_id, (_, task) in cold_pending.items()
+                )
+            # Cold changes must be in data.json.cold before the journal records carrying them are dropped.
+            self._flush_cold(cold_pending, cold_data)
+            write_atomic(self.snapshot_file, payload)
+            with self._file_lock:
+                # Keep records appended while the snapshot was being written; anything
+                # at or below seq still in flight is skipped on replay.
+                kept: List[str] = []
+                self._journal.close()
+                with open(self.journal_file, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            if int(json.loads(line).get("seq") or 0) > seq:
+                                kept.append(line)
+                        except Exception:
+                            # Not in the snapshot either, so keep it for the next load to report.
+                            kept.append(line)
+                write_atomic(self.journal_file, "".join(kept))
+                self._journal = open(self.journal_file, "a", encoding="utf-8")
+                self._journal_size = self._journal.tell()
+            metrics.observe("store_save_seconds", time.perf_counter() - started)
+            metrics.inc("store_save_bytes_total", len(payload) + len(cold_data))
+
+    def load(self) -> None:
+        super().load()
+        if self._cold_unflushed:
+            # Fold tasks that just moved to the cold tier out of data.json right away.
+            self.save()
+
+    def close(self) -> None:
+        super().close()
+        drained = not self._pending and self._failure is None and not (self._writer and self._writer.is_alive())
+        if self._journal and self._journal_size and drained:
+            # Fold the journal in so the snapshot alone is the whole hot state again;
+            # the Node JSON store reads data.json and knows nothing of the journal.
+            try:
+                self.save()
+            except Exception:
+                log.exception("compacting %s on shutdown failed", self.journal_file)
+        with self._file_lock:
+            if self._journal:
+                self._journal.close()
+
+
+def encode_binary_snapshot(state: Dict[str, Any], seq: int) -> bytes:
+    """Header, then a length-prefixed JSON block of member, task, reminder and task event rows, then one
+    length-prefixed detail record per task with subtasks or comments, then the
+    offset index of those records in task order."""
+    tasks = state["tasks"]
+    meta = json.dumps(
+        {
+            "members": [member.to_row() for member in state["members"]],
+            "tasks": [task.to_row() for task in tasks],
+            "reminderEvents": [event.to_row() for event in state.get("reminderEvents") or ()],
+            "taskEvents": [event.to_row() for event in state.get("taskEvents") or ()],
+        },
+        ensure_ascii=False,
+        default=plain,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    parts = [b"", SNAPSHOT_LENGTH.pack(len(meta)), meta]
+    offset = SNAPSHOT_HEADER.size + SNAPSHOT_LENGTH.size + len(meta)
+    index = bytearray()
+    for task in tasks:
+        detail = task.encoded_detail()
+        if not detail:
+            index += SNAPSHOT_INDEX.pack(0, 0)
+            continue
+        parts.append(SNAPSHOT_LENGTH.pack(len(detail)))
+        parts.append(detail)
+        offset += SNAPSHOT_LENGTH.size
+        index += SNAPSHOT_INDEX.pack(offset, len(detail))
+        offset += len(detail)
+    parts[0] = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(tasks), seq, offset)
+    parts.append(bytes(index))
+    return b"".join(parts)
+
+
+def read_binary_snapshot(path: Path) -> Tuple[Dict[str, Any], int]:
+    """Map a snapshot written by encode_binary_snapshot(); task details stay in the map until used."""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(buffer) < SNAPSHOT_HEADER.size + SNAPSHOT_LENGTH.size:
+        raise ValueError("snapshot is truncated")
+    magic, version, count, seq, index_offset = SNAPSHOT_HEADER.unpack_from(buffer, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("not a snapshot file")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"unsupported snapshot version {version}")
+    if index_offset + count * SNAPSHOT_INDEX.size != len(buffer):
+        raise ValueError("snapshot is truncated")
+    (meta_length,) = SNAPSHOT_LENGTH.unpack_from(buffer, SNAPSHOT_HEADER.size)
+    start = SNAPSHOT_HEADER.size + SNAPSHOT_LENGTH.size
+    meta = json.loads(buffer[start : start + meta_length])
+    rows = meta["tasks"]
+    if len(rows) != count:
+        raise ValueError("snapshot index does not match its tasks")
+    tasks = [
+        Task.from_row(row, TaskDetail(buffer, offset, length) if length else None)
+        for row, (offset, length) in zip(rows, SNAPSHOT_INDEX.iter_unpack(buffer[index_offset:]))
+    ]
+    return {
+        "members": [Member.from_row(row) for row in meta["members"]],
+        "tasks": tasks,
+        "reminderEvents": [ReminderEvent.from_row(row) for row in meta.get("reminderEvents") or ()],
+        "taskEvents": [TaskEvent.from_row(row) for row in meta.get("taskEvents") or ()],
+    }, seq
+
+
+class BinaryStore(JsonStore):
+    """The JsonStore journal and cold tier behind a binary snapshot, data.snap.
+
+    The snapshot is memory-mapped on load: task rows are decoded up front,
+    while each task's subtasks and comments stay in the map until first
+    touched. Without data.snap the first load imports data.json (which is
+    then left as it was) and writes one; scripts/snapshot.py converts in
+    either direction.
+    """
+
+    def __init__(self, data_file: Path = DATA_FILE, snapshot_file: Path = SNAPSHOT_FILE) -> None:
+        super().__init__(data_file)
+        self.snapshot_file = snapshot_file
+        self._imported = False
+
+    def _read_snapshot(self) -> Tuple[Optional[Dict[str, Any]], int]:
+        if self.snapshot_file.exists():
+            # No fallback to data.json here: the journal behind it may already be compacted away.
+            return read_binary_snapshot(self.snapshot_file)
+        state, seq = super()._read_snapshot()
+        self._imported = state is not None
+        return state, seq
+
+    def _encode_snapshot(self, seq: int) -> Union[str, bytes]:
+        return encode_binary_snapshot(
+            {**self.state, "reminderEvents": list(self.reminder_events.values()), "taskEvents": list(self.task_events.values())}, seq
+        )
+
+    def load(self) -> None:
+        super().load()
+        if self._imported:
+            self._imported = False
+            self.save()
+
+
+def apply_migrations(db: sqlite3.Connection) -> int:
+    db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def get_version() -> int:
+        row = db.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        return int(row[0]) if row and row[0] else 0
+
+    def set_version(version: int) -> None:
+        db.execute(
+            "INSERT INTO meta (key, value) VALUES ('schema_version', ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (str(version),),
+        )
+
+    version = get_version()
+    if version < 1:
+        db.execute("CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks (state)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_tasks_due_at ON tasks (due_at)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_tasks_created_by ON tasks (created_by)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_task_owners_member ON task_owners (member_id)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_subtasks_task ON subtasks (task_id)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_comments_task ON comments (task_id)")
+        set_version(1)
+        version = 1
+    if version < 2:
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS reminders (task_id TEXT PRIMARY KEY, remind24h_sent INTEGER, remind2h_sent INTEGER, last_overdue_at TEXT, snooze_until TEXT)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS idx_reminders_task ON reminders (task_id)")
+        set_version(2)
+        version = 2
+    if version < 3:
+        db.execute("CREATE TABLE IF NOT EXISTS reminder_events (id TEXT PRIMARY KEY, task_id TEXT, member_id TEXT, type TEXT, sent_at TEXT)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_reminder_events_task ON reminder_events (task_id)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_reminder_events_member ON reminder_events (member_id)")
+        set_version(3)
+        version = 3
+    if version < 4:
+        db.execute("CREATE TABLE IF NOT EXISTS task_events (id TEXT PRIMARY KEY, task_id TEXT, actor_id TEXT, action TEXT, occurred_at TEXT)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_task_events_task ON task_events (task_id)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_task_events_actor ON task_events (actor_id)")
+        set_version(4)
+        version = 4
+    if version < 5:
+        db.execute("CREATE INDEX IF NOT EXISTS idx_reminder_events_sent_at ON reminder_events (sent_at)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_task_events_occurred_at ON task_events (occurred_at)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_task_events_action ON task_events (action)")
+        set_version(5)
+        version = 5
+    if version < 6:
+        try:
+            db.execute("ALTER TABLE members ADD COLUMN wechat_openid TEXT")
+        except sqlite3.OperationalError:
+            db.execute("SELECT wechat_openid FROM members LIMIT 1").fetchone()
+        set_version(6)
+        version = 6
+    if version < 7:
+        db.execute("CREATE INDEX IF NOT EXISTS idx_tasks_archived_at ON tasks (archived_at)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_tasks_deleted_at ON tasks (deleted_at)")
+        set_version(7)
+        version = 7
+    if version < 8:
+        try:
+            db.execute("ALTER TABLE reminder_events ADD COLUMN queued_at TEXT")
+        except sqlite3.OperationalError:
+            db.execute("SELECT queued_at FROM reminder_events LIMIT 1").fetchone()
+        set_version(8)
+        version = 8
+    if version < 9:
+        try:
+            db.execute("ALTER TABLE task_events ADD COLUMN detail TEXT")
+        except sqlite3.OperationalError:
+            db.execute("SELECT detail FROM task_events LIMIT 1").fetchone()
+        set_version(9)
+        version = 9
+    db.commit()
+    return version
+
+
+class SqliteStore(Store):
+    """Same normalized schema and migrations as store/sqliteStore.js, so both servers can share one file."""
+
+    def __init__(self, sqlite_file: Path = SQLITE_FILE, seed_file: Path = DATA_FILE) -> None:
+        super().__init__()
+        self.sqlite_file = sqlite_file
+        self.seed_file = seed_file
+        self.search_file = sqlite_file.with_name(sqlite_file.name + ".search")
+        self.sqlite_file.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(sqlite_file), check_same_thread=False)
+        self._db_lock = threading.Lock()
+        self._loaded_member_ids: Set[str] = set()
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS members (id TEXT PRIMARY KEY, name TEXT, reminder_prefs TEXT, wechat_openid TEXT)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks (id TEXT PRIMARY KEY, content TEXT, due_at TEXT, require_confirm INTEGER, state TEXT, created_by TEXT, created_at TEXT, updated_at TEXT, archived_at TEXT, deleted_at TEXT, repeat_rule TEXT, series_id TEXT, occurrence INTEGER, reminders TEXT)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS task_owners (task_id TEXT, member_id TEXT, PRIMARY KEY (task_id, member_id))")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS subtasks (id TEXT PRIMARY KEY, task_id TEXT, content TEXT, done INTEGER, created_at TEXT, done_at TEXT)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS comments (id TEXT PRIMARY KEY, task_id TEXT, author_id TEXT, content TEXT, mentions TEXT, created_at TEXT)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS reminders (task_id TEXT PRIMARY KEY, remind24h_sent INTEGER, remind2h_sent INTEGER, last_overdue_at TEXT, snooze_until TEXT)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS reminder_events (id TEXT PRIMARY KEY, task_id TEXT, member_id TEXT, type TEXT, sent_at TEXT, queued_at TEXT)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS task_events (id TEXT PRIMARY KEY, task_id TEXT, actor_id TEXT, action TEXT, occurred_at TEXT, detail TEXT)"
+        )
+        apply_migrations(self._db)
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        db = self._db
+        members = db.execute("SELECT id, name, reminder_prefs, wechat_openid FROM members").fetchall()
+        self._loaded_member_ids = {row[0] for row in members}
+        if not members and not db.execute("SELECT 1 FROM tasks LIMIT 1").fetchone():
+            seed = self._read_seed()
+            if seed is not None:
+                self.reminder_events = {event.id: event for event in map(ReminderEvent, seed.pop("reminderEvents"))}
+                self.task_events = {event.id: event for event in map(TaskEvent, seed.pop("taskEvents"))}
+                self.state = seed
+                self.save()
+            return seed
+        self.reminder_events = {
+            row[0]: ReminderEvent({"id": row[0], "taskId": row[1], "memberId": row[2], "type": row[3], "queuedAt": row[4], "sentAt": row[5]})
+            for row in db.execute("SELECT id, task_id, member_id, type, queued_at, sent_at FROM reminder_events")
+        }
+        # Rows the Node server logged have no detail; the stats fill it in from the task.
+        self.task_events = {
+            row[0]: TaskEvent({"id": row[0], "taskId": row[1], "actorId": row[2], "action": row[3], "occurredAt": row[4], **json.loads(row[5] or "{}")})
+            for row in db.execute("SELECT id, task_id, actor_id, action, occurred_at, detail FROM task_events")
+        }
+        return {
+            "members": [
+                {
+                    "id": row[0],
+                    "name": row[1],
+                    "reminderPrefs": json.loads(row[2]) if row[2] else {},
+                    "wechatOpenId": row[3] or None,
+                }
+                for row in members
+            ],
+            "tasks": self._select_tasks(HOT_TASK_SQL),
+        }
+
+    def _select_tasks(self, where: str) -> List[Dict[str, Any]]:
+        """Task rows matching `where`, newest first, joined with their child rows."""
+        db = self._db
+        tasks = db.execute(
+            f"SELECT id, content, due_at, require_confirm, state, created_by, created_at, updated_at, archived_at, deleted_at, repeat_rule, series_id, occurrence, reminders FROM tasks WHERE {where} ORDER BY created_at DESC"
+        ).fetchall()
+        ids = f"SELECT id FROM tasks WHERE {where}"
+        owners_by_task: Dict[str, List[str]] = {}
+        for task_id, member_id in db.execute(f"SELECT task_id, member_id FROM task_owners WHERE task_id IN ({ids})"):
+            owners_by_task.setdefault(task_id, []).append(member_id)
+        subtasks_by_task: Dict[str, List[Dict[str, Any]]] = {}
+        for row in db.execute(f"SELECT id, task_id, content, done, created_at, done_at FROM subtasks WHERE task_id IN ({ids})"):
+            subtasks_by_task.setdefault(row[1], []).append(
+                {"id": row[0], "content": row[2], "done": bool(row[3]), "createdAt": row[4], "doneAt": row[5] or None}
+            )
+        comments_by_task: Dict[str, List[Dict[str, Any]]] = {}
+        for row in db.execute(f"SELECT id, task_id, author_id, content, mentions, created_at FROM comments WHERE task_id IN ({ids})"):
+            comments_by_task.setdefault(row[1], []).append(
+                {
+                    "id": row[0],
+                    "authorId": row[2],
+                    "content": row[3],
+                    "mentions": json.loads(row[4]) if row[4] else [],
+                    "createdAt": row[5],
+                }
+            )
+        reminders_by_task: Dict[str, Dict[str, Any]] = {}
+        for row in db.execute(
+            f"SELECT task_id, remind24h_sent, remind2h_sent, last_overdue_at, snooze_until FROM reminders WHERE task_id IN ({ids})"
+        ):
+            reminders_by_task[row[0]] = {
+                "remind24hSent": bool(row[1]),
+                "remind2hSent": bool(row[2]),
+                "lastOverdueAt": row[3] or None,
+                "snoozeUntil": row[4] or None,
+            }
+        return [
+            {
+                "id": row[0],
+                "content": row[1],
+                "dueAt": row[2],
+                "requireConfirm": bool(row[3]),
+                "state": row[4],
+                "createdBy": row[5],
+                "createdAt": row[6],
+                "updatedAt": row[7],
+                "archivedAt": row[8] or None,
+                "deletedAt": row[9] or None,
+                "repeat": json.loads(row[10]) if row[10] else None,
+                "seriesId": row[11] or None,
+                "occurrence": row[12],
+                "reminders": reminders_by_task.get(row[0]) or (json.loads(row[13]) if row[13] else {}),
+                "owners": owners_by_task.get(row[0], []),
+                "subtasks": subtasks_by_task.get(row[0], []),
+                "comments": comments_by_task.get(row[0], []),
+            }
+            for row in tasks
+        ]
+
+    def _read_seed(self) -> Optional[Dict[str, Any]]:
+        if not self.seed_file.exists():
+            return None
+        try:
+            parsed = json.loads(self.seed_file.read_text("utf-8"))
+            return {
+                "members": list(parsed.get("members") or []),
+                "tasks": list(parsed.get("tasks") or []),
+                "reminderEvents": list(parsed.get("reminderEvents") or []),
+                "taskEvents": list(parsed.get("taskEvents") or []),
+            }
+        except Exception:
+            return None
+
+    def _upsert_member(self, member: Dict[str, Any]) -> None:
+        self._db.execute(
+            "INSERT INTO members (id, name, reminder_prefs, wechat_openid) VALUES (?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET name = excluded.name, reminder_prefs = excluded.reminder_prefs, wechat_openid = excluded.wechat_openid",
+            (member.get("id"), member.get("name"), json.dumps(member.get("reminderPrefs") or {}, ensure_ascii=False), member.get("wechatOpenId")),
+        )
+
+    def _upsert_task(self, task: Dict[str, Any]) -> None:
+        db = self._db
+        task_id = task.get("id")
+        reminder = task.get("reminders") or {}
+        db.execute(
+            "INSERT INTO tasks (id, content, due_at, require_confirm, state, created_by, created_at, updated_at, archived_at, deleted_at, repeat_rule, series_id, occurrence, reminders) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET content = excluded.content, due_at = excluded.due_at, require_confirm = excluded.require_confirm, state = excluded.state, created_by = excluded.created_by, created_at = excluded.created_at, updated_at = excluded.updated_at, archived_at = excluded.archived_at, deleted_at = excluded.deleted_at, repeat_rule = excluded.repeat_rule, series_id = excluded.series_id, occurrence = excluded.occurrence, reminders = excluded.reminders",
+            (
+                task_id,
+                task.get("content"),
+                task.get("dueAt"),
+                1 if task.get("requireConfirm") else 0,
+                task.get("state"),
+                task.get("createdBy"),
+                task.get("createdAt"),
+                task.get("updatedAt"),
+                task.get("archivedAt"),
+                task.get("deletedAt"),
+                json.dumps(task["repeat"], ensure_ascii=False) if task.get("repeat") else None,
+                task.get("seriesId"),
+                task.get("occurrence"),
+                json.dumps(reminder, ensure_ascii=False, default=plain),
+            ),
+        )
+        db.execute(
+            "INSERT INTO reminders (task_id, remind24h_sent, remind2h_sent, last_overdue_at, snooze_until) VALUES (?, ?, ?, ?, ?) ON CONFLICT(task_id) DO UPDATE SET remind24h_sent = excluded.remind24h_sent, remind2h_sent = excluded.remind2h_sent, last_overdue_at = excluded.last_overdue_at, snooze_until = excluded.snooze_until",
+            (
+                task_id,
+                1 if reminder.get("remind24hSent") else 0,
+                1 if reminder.get("remind2hSent") else 0,
+                reminder.get("lastOverdueAt"),
+                reminder.get("snoozeUntil"),
+            ),
+        )
+        db.execute("DELETE FROM task_owners WHERE task_id = ?", (task_id,))
+        db.execute("DELETE FROM subtasks WHERE task_id = ?", (task_id,))
+        db.execute("DELETE FROM comments WHERE task_id = ?", (task_id,))
+        db.executemany(
+            "INSERT INTO task_owners (task_id, member_id) VALUES (?, ?) ON CONFLICT(task_id, member_id) DO NOTHING",
+            [(task_id, owner_id) for owner_id in task.get("owners") or []],
+        )
+        db.executemany(
+            "INSERT INTO subtasks (id, task_id, content, done, created_at, done_at) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET content = excluded.content, done = excluded.done, created_at = excluded.created_at, done_at = excluded.done_at",
+            [
+                (st.get("id"), task_id, st.get("content"), 1 if st.get("done") else 0, st.get("createdAt"), st.get("doneAt"))
+                for st in task.get("subtasks") or []
+            ],
+        )
+        db.executemany(
+            "INSERT INTO comments (id, task_id, author_id, content, mentions, created_at) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET author_id = excluded.author_id, content = excluded.content, mentions = excluded.mentions, created_at = excluded.created_at",
+            [
+                (c.get("id"), task_id, c.get("authorId"), c.get("content"), json.dumps(c.get("mentions") or [], ensure_ascii=False), c.get("createdAt"))
+                for c in task.get("comments") or []
+            ],
+        )
+
+    def _upsert_reminder_event(self, event: Dict[str, Any]) -> None:
+        self._db.execute(
+            "INSERT INTO reminder_events (id, task_id, member_id, type, queued_at, sent_at) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET task_id = excluded.task_id, member_id = excluded.member_id, type = excluded.type, queued_at = excluded.queued_at, sent_at = excluded.sent_at",
+            (event.get("id"), event.get("taskId"), event.get("memberId"), event.get("type"), event.get("queuedAt"), event.get("sentAt")),
+        )
+
+    def _upsert_task_event(self, event: Dict[str, Any]) -> None:
+        self._db.execute(
+            "INSERT INTO task_events (id, task_id, actor_id, action, occurred_at, detail) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET task_id = excluded.task_id, actor_id = excluded.actor_id, action = excluded.action, occurred_at = excluded.occurred_at, detail = excluded.detail",
+            (
+                event.get("id"),
+                event.get("taskId"),
+                event.get("actorId"),
+                event.get("action"),
+                event.get("occurredAt"),
+                json.dumps({key: event.get(key) for key in TaskEvent.DETAIL}, ensure_ascii=False),
+            ),
+        )
+
+    def _delete_task(self, task_id: str) -> None:
+        for table, column in (("tasks", "id"), ("task_owners", "task_id"), ("subtasks", "task_id"), ("comments", "task_id"), ("reminders", "task_id")):
+            self._db.execute(f"DELETE FROM {table} WHERE {column} = ?", (task_id,))
+
+    def _read_cold(self) -> Dict[str, Dict[str, Any]]:
+        with self._db_lock:
+            tasks = self._select_tasks(f"NOT ({HOT_TASK_SQL})")
+        return {task["id"]: Task(task) for task in tasks}
+
+    def _write(self, batch: List[Tuple[int, str]]) -> None:
+        with self._db_lock:
+            try:
+                for _, line in batch:
+                    record = json.loads(line)
+                    op = record.get("op")
+                    if op == "put_task":
+                        self._upsert_task(record["task"])
+                    elif op == "delete_task":
+                        self._delete_task(str(record.get("id")))
+                    elif op == "put_member":
+                        self._upsert_member(record["member"])
+                    elif op == "put_reminder_event":
+                        self._upsert_reminder_event(record["event"])
+                    elif op == "delete_reminder_event":
+                        self._db.execute("DELETE FROM reminder_events WHERE id = ?", (str(record.get("id")),))
+                    elif op == "put_task_event":
+                        self._upsert_task_event(record["event"])
+                    elif op == "delete_task_event":
+                        self._db.execute("DELETE FROM task_events WHERE id = ?", (str(record.get("id")),))
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+
+    def save(self) -> None:
+        started = time.perf_counter()
+        with self._lock:
+            state = json.loads(json.dumps(self.state, ensure_ascii=False, default=plain))
+            events = [event.to_dict() for event in self.reminder_events.values()]
+            task_events = [event.to_dict() for event in self.task_events.values()]
+            # Only upserts: rows missing here may have been written by another server
+            # since we loaded. Tasks and events leave through their delete records in
+            # _write(); members only when load() swaps the legacy roster for the defaults.
+            member_ids = {m.get("id") for m in state["members"]}
+            removed_members = self._loaded_member_ids - member_ids
+        with self._db_lock:
+            try:
+                db = self._db
+                db.executemany("DELETE FROM members WHERE id = ?", [(member_id,) for member_id in removed_members])
+                for member in state["members"]:
+                    self._upsert_member(member)
+                for task in state["tasks"]:
+                    self._upsert_task(task)
+                for event in events:
+                    self._upsert_reminder_event(event)
+                for event in task_events:
+                    self._upsert_task_event(event)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+        self._loaded_member_ids = member_ids
+        metrics.observe("store_save_seconds", time.perf_counter() - started)
+
+    def close(self) -> None:
+        super().close()
+        with self._db_lock:
+            self._db.close()
+
+
+def record_key(record: Dict[str, Any]) -> Tuple[str, str]:
+    if record.get("op") == "put_member":
+        return "member", str(record["member"].get("id"))
+    if record.get("op") == "put_reminder_event":
+        return "reminder", str(record["event"].get("id"))
+    if record.get("op") == "delete_reminder_event":
+        return "reminder", str(record.get("id"))
+    if record.get("op") == "put_task_event":
+        return "task_event", str(record["event"].get("id"))
+    if record.get("op") == "delete_task_event":
+        return "task_event", str(record.get("id"))
+    return "task", str(record["task"].get("id") if record.get("op") == "put_task" else record.get("id"))
+
+
+class SharedSqliteStore(SqliteStore):
+    """A cluster worker's copy of a household whose file the broker writes.
+
+    Commits update memory here as usual, but the writer thread hands each
+    batch to the broker, which writes it to SQLite, relays it in its own
+    order to every worker holding the household (this one included) and
+    answers once all of them have applied it. Other workers' records are applied as they arrive;
+    our own echo is dropped unless another worker's record for the same
+    task or member landed in between, in which case it is replayed so
+    every copy ends on the broker's order.
+    """
+
+    def __init__(self, household_id: str, sqlite_file: Path = SQLITE_FILE, seed_file: Path = DATA_FILE) -> None:
+        super().__init__(sqlite_file, seed_file)
+        self.household_id = household_id
+        self._inflight: Dict[Tuple[str, str], int] = {}
+        self._contested: Set[Tuple[str, str]] = set()
+
+    def commit(self, *records: Dict[str, Any]) -> int:
+        with self._lock:
+            seq = super().commit(*records)
+            for record in records:
+                key = record_key(record)
+                self._inflight[key] = self._inflight.get(key, 0) + 1
+            return seq
+
+    def _write(self, batch: List[Tuple[int, str]]) -> None:
+        broker_link.request({"op": "write", "h": self.household_id, "records": [line for _, line in batch]})
+
+    def save(self) -> None:
+        """Nothing to do: the broker seeded and owns the file."""
+
+    def apply_remote(self, lines: List[str], own: bool) -> None:
+        with self._lock:
+            for line in lines:
+                record = json.loads(line)
+                key = record_key(record)
+                if own:
+                    left = self._inflight.get(key, 1) - 1
+                    if left > 0:
+                        self._inflight[key] = left
+                        continue
+                    self._inflight.pop(key, None)
+                    if key not in self._contested:
+                        continue
+                    self._contested.discard(key)
+                elif key in self._inflight:
+                    self._contested.add(key)
+                applied = self._apply(record)
+                for listener in self._listeners:
+                    listener(applied)
+                with self._cond:
+                    # Durable already; only bumped so the published snapshot gets a new key.
+                    self.seq += 1
+                    if not self._pending and self._durable == self.seq - 1:
+                        self._durable = self.seq
+            self._publish()
+
+
+def create_store(directory: Optional[Path] = None) -> Store:
+    """The configured backend, on the default files or on the ones inside a household's directory."""
+    mode = str(os.environ.get("STORE") or "json").lower()
+    if WORKER_ID is not None:
+        if directory is None:
+            return SharedSqliteStore(DEFAULT_HOUSEHOLD)
+        return SharedSqliteStore(directory.name, directory / "data.sqlite", directory / "data.json")
+    if directory is None:
+        if mode == "sqlite":
+            return SqliteStore()
+        if mode == "binary":
+            return BinaryStore()
+        return JsonStore()
+    if mode == "sqlite":
+        return SqliteStore(directory / "data.sqlite", directory / "data.json")
+    if mode == "binary":
+        return BinaryStore(directory / "data.json", directory / "data.snap")
+    return JsonStore(directory / "data.json")
+
+
+class EventQueue:
+    """Outgoing SSE messages for one client.
+
+    State messages (deltas and snapshots) are only useful until the client
+    falls too far behind: past SSE_QUEUE_LIMIT of them they are all replaced
+    by a single resync signal, since the client has to refetch /api/state
+    anyway. Targeted messages (reminder, mention) are never coalesced; if
+    SSE_TARGETED_LIMIT of those pile up the stream is closed so the client
+    reconnects and replays them from the hub's ring buffer.
+    """
+
+    def __init__(self) -> None:
+        self._items: Deque[Tuple[bool, str]] = deque()
+        self._state_count = 0
+        self._targeted_count = 0
+        self.overflowed = False
+
+    def put(self, msg: str, is_state: bool) -> None:
+        if self.overflowed:
+            return
+        self._items.append((is_state, msg))
+        if not is_state:
+            self._targeted_count += 1
+            if self._targeted_count > SSE_TARGETED_LIMIT:
+                self.overflowed = True
+            return
+        self._state_count += 1
+        if self._state_count > SSE_QUEUE_LIMIT:
+            kept = deque(item for item in self._items if not item[0])
+            metrics.inc("sse_messages_dropped_total", len(self._items) - len(kept))
+            metrics.inc("sse_resyncs_total")
+            kept.append((True, SSE_RESYNC_MESSAGE))
+            self._items = kept
+            self._state_count = 0
+
+    def pop(self) -> Optional[str]:
+        if not self._items:
+            return None
+        is_state, msg = self._items.popleft()
+        if not is_state:
+            self._targeted_count -= 1
+        elif msg is not SSE_RESYNC_MESSAGE:
+            self._state_count -= 1
+        return msg
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+
+class ThreadEventQueue(EventQueue):
+    def __init__(self) -> None:
+        super().__init__()
+        self._cond = threading.Condition()
+
+    def put(self, msg: str, is_state: bool) -> None:
+        with self._cond:
+            super().put(msg, is_state)
+            self._cond.notify()
+
+    def get(self, timeout: float) -> Optional[str]:
+        """Next message, or None after `timeout` seconds without one (or once the queue overflowed)."""
+        with self._cond:
+            if not self._items and not self.overflowed:
+                self._cond.wait(timeout)
+            return None if self.overflowed else self.pop()
+
+
+class AsyncEventQueue(EventQueue):
+    """Only touched from its event loop; the hub hops there with call_soon_threadsafe."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._ready = asyncio.Event()
+
+    def put(self, msg: str, is_state: bool) -> None:
+        super().put(msg, is_state)
+        self._ready.set()
+
+    async def get(self, timeout: float) -> Optional[str]:
+        if not self._items and not self.overflowed:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return None if self.overflowed else self.pop()
+
+
+@dataclass
+class SSEClient:
+    member_id: str
+    q: Any
+    loop: Optional[asyncio.AbstractEventLoop] = None
+    scope: str = "all"
+
+
+def encode_event(data: Any) -> str:
+    started = time.perf_counter()
+    text = json.dumps(data, ensure_ascii=False, default=plain)
+    metrics.observe("serialize_seconds", time.perf_counter() - started, kind="event")
+    return text
+
+
+def with_version(version: int, encoded: str) -> str:
+    """Prefix an encoded JSON object with a version field without re-encoding it."""
+    return f'{{"version": {version}, {encoded[1:]}' if encoded != "{}" else f'{{"version": {version}}}'
+
+
+def reaches(client: SSEClient, member_id: Optional[str], scope: Optional[str]) -> bool:
+    """Whether a message for (member_id, scope) goes to client; None matches any member / any scope."""
+    return (member_id is None or client.member_id == member_id) and (scope is None or client.scope == scope)
+
+
+def _fan_out(clients: List[SSEClient], msg: str, is_state: bool) -> None:
+    for client in clients:
+        client.q.put(msg, is_state)
+
+
+class SSEHub:
+    """Connected clients plus a ring of recent messages, so a reconnecting client can resume from Last-Event-ID.
+
+    Every message is addressed by (member_id, scope): state broadcasts go to
+    (None, "all"), scope=mine projections to (member, "mine") and targeted
+    reminder/mention events to (member, None).
+    """
+
+    def __init__(self, household_id: str) -> None:
+        self.household_id = household_id
+        self._lock = threading.RLock()
+        self._clients: List[SSEClient] = []
+        self.epoch = uuid4().hex[:8]
+        self._last_id = 0
+        self._ring: Deque[Tuple[int, Optional[str], Optional[str], str]] = deque(maxlen=SSE_REPLAY_EVENTS)
+
+    def add(self, client: SSEClient) -> None:
+        with self._lock:
+            self._clients.append(client)
+
+    def remove(self, client: SSEClient) -> None:
+        with self._lock:
+            self._clients = [c for c in self._clients if c is not client]
+
+    def clients(self) -> List[SSEClient]:
+        with self._lock:
+            return list(self._clients)
+
+    def current_id(self) -> str:
+        return f"{self.epoch}-{self._last_id}"
+
+    def align(self, epoch: str, last_id: int) -> None:
+        """Continue the broker's event numbering, so ids mean the same on every cluster worker."""
+        with self._lock:
+            self.epoch = epoch
+            self._last_id = last_id
+
+    def attach(self, client: SSEClient, last_event_id: str) -> bool:
+        """Add a client, first queueing what it missed after last_event_id.
+
+        Returns False when that position is unknown (another server run, or
+        older than the ring) and the caller must send a full snapshot instead.
+        """
+        with self._lock:
+            replayed = False
+            epoch, _, raw = last_event_id.rpartition("-")
+            if epoch == self.epoch and raw.isdigit():
+                last = int(raw)
+                oldest = self._ring[0][0] if self._ring else self._last_id + 1
+                if last <= self._last_id and last + 1 >= oldest:
+                    for event_id, member_id, scope, msg in self._ring:
+                        if event_id > last and reaches(client, member_id, scope):
+                            self.deliver([client], msg, is_state=scope is not None)
+                    replayed = True
+            self._clients.append(client)
+            return replayed
+
+    def deliver(self, clients: List[SSEClient], msg: str, is_state: bool) -> None:
+        """Queue msg for each client; asyncio clients get one hop onto their loop per call."""
+        by_loop: Dict[asyncio.AbstractEventLoop, List[SSEClient]] = {}
+        for client in clients:
+            if client.loop is None:
+                client.q.put(msg, is_state)
+            else:
+                by_loop.setdefault(client.loop, []).append(client)
+        for loop, batch in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_fan_out, batch, msg, is_state)
+            except RuntimeError:
+                pass
+
+    def _publish(self, member_id: Optional[str], scope: Optional[str], event: str, payload: str, event_id: Optional[int] = None) -> None:
+        """Number (or, in a cluster, take the broker's number for), record and deliver one message."""
+        with self._lock:
+            self._last_id = self._last_id + 1 if event_id is None else event_id
+            msg = f"id: {self.epoch}-{self._last_id}\nevent: {event}\ndata: {payload}\n\n"
+            self._ring.append((self._last_id, member_id, scope, msg))
+            clients = [c for c in self._clients if reaches(c, member_id, scope)]
+            self.deliver(clients, msg, is_state=scope is not None)
+
+    def broadcast_event(self, event: str, payload: str) -> None:
+        """Send an already encoded state change to every full-state stream."""
+        self._publish(None, "all", event, payload)
+
+    def send_to_scope(self, member_id: str, event: str, payload: str) -> None:
+        """Send an already encoded projection change to the member's scope=mine streams."""
+        self._publish(member_id, "mine", event, payload)
+
+    def send_to_member(self, member_id: str, event: str, data: Any) -> None:
+        if broker_link is not None:
+            broker_link.send_to_member(self.household_id, member_id, event, encode_event(data))
+            return
+        self._publish(member_id, None, event, encode_event(data))
+
+
+def sse_client_samples(depth: bool) -> List[Tuple[Dict[str, str], float]]:
+    samples: List[Tuple[Dict[str, str], float]] = []
+    for household in households.loaded():
+        per_member: Dict[str, List[int]] = {}
+        for client in household.hub.clients():
+            per_member.setdefault(client.member_id, []).append(client.q.qsize())
+        for member, sizes in per_member.items():
+            samples.append(({"household": household.id, "member": member}, max(sizes) if depth else len(sizes)))
+    return samples
+
+
+def store_task_samples() -> List[Tuple[Dict[str, str], float]]:
+    samples: List[Tuple[Dict[str, str], float]] = []
+    for household in households.loaded():
+        shard = household.store
+        samples.append(({"household": household.id, "tier": "hot"}, len(shard.tasks_by_id)))
+        if shard._cold is not None:
+            samples.append(({"household": household.id, "tier": "cold"}, len(shard._cold)))
+    return samples
+
+
+metrics.gauge("sse_clients", "Connected /events streams per household and member.", lambda: sse_client_samples(False))
+metrics.gauge("sse_queue_depth_max", "Deepest outgoing queue among a member's streams.", lambda: sse_client_samples(True))
+metrics.gauge("store_tasks", "Tasks held in memory per household by tier.", store_task_samples)
+
+
+def task_audience(task: Dict[str, Any]) -> FrozenSet[str]:
+    """Members whose scope=mine view contains the task: its owners and its creator."""
+    return frozenset([*(str(x) for x in task.get("owners") or []), str(task.get("createdBy") or "")]) - {""}
+
+
+class MemberProjections:
+    """scope=mine views: the roster plus the hot tasks a member owns or created.
+
+    Each member's view has its own version, so a scoped client sees a gapless
+    sequence just like a full one. Nothing is tracked until the first scoped
+    request; from then on every published change updates the remembered
+    audience of its tasks, so a reassigned task reaches the members who lost
+    it (as task_removed) as well as those who gained it, and members whose
+    view did not change are sent nothing. Call everything with store._lock held.
+    """
+
+    def __init__(self, store: Store, hub: SSEHub) -> None:
+        self.store = store
+        self.hub = hub
+        self.versions: Dict[str, int] = {}
+        self._audiences: Optional[Dict[str, FrozenSet[str]]] = None
+        self._encoded: Dict[str, EncodedSnapshot] = {}
+
+    def _track(self) -> Dict[str, FrozenSet[str]]:
+        if self._audiences is None:
+            self._audiences = {task_id: task_audience(task) for task_id, task in self.store.tasks_by_id.items()}
+        return self._audiences
+
+    def snapshot(self, member_id: str) -> EncodedSnapshot:
+        self._track()
+        store = self.store
+        key = (self.versions.get(member_id, 0), store.seq)
+        cached = self._encoded.get(member_id)
+        if cached is None or cached.key != key:
+            started = time.perf_counter()
+            tasks = ", ".join(store.task_json(task) for task in store.related_tasks(member_id))
+            text = f'{{"version": {key[0]}, "scope": "mine", "members": {store.members_json}, "tasks": [{tasks}]}}'
+            metrics.observe("serialize_seconds", time.perf_counter() - started, kind="projection")
+            cached = EncodedSnapshot(key, f'"{store.epoch}-{member_id}-{key[0]}-{key[1]}"', text)
+            self._encoded[member_id] = cached
+        return cached
+
+    def _send(self, member_id: str, event: str, encoded: str) -> None:
+        version = self.versions[member_id] = self.versions.get(member_id, 0) + 1
+        self.hub.send_to_scope(member_id, event, with_version(version, encoded))
+
+    def publish(self, event: str, payload: Dict[str, Any], encoded: str) -> None:
+        """Forward a change (payload and its encoding, without version) to the views it touches."""
+        for member_id, member_event, text in self.route(event, payload, encoded):
+            self._send(member_id, member_event, text)
+
+    def route(self, event: str, payload: Dict[str, Any], encoded: str) -> List[Tuple[str, str, str]]:
+        """The (member, event, encoding without version) messages a change makes, updating the remembered audiences."""
+        audiences = self._audiences
+        if audiences is None:
+            return []
+        messages: List[Tuple[str, str, str]] = []
+        roster = [str(member.get("id")) for member in self.store.state["members"]]
+        if event.startswith("member_"):
+            for member_id in roster:
+                messages.append((member_id, event, encoded))
+        elif event == "task_deleted":
+            before = audiences.pop(payload["taskId"], None)
+            for member_id in roster if before is None else before:
+                messages.append((member_id, event, encoded))
+        elif event == "batch":
+            tasks: Dict[str, List[str]] = {}
+            removed: Dict[str, List[str]] = {}
+            deleted: Dict[str, List[str]] = {}
+            for task in payload["tasks"]:
+                task_id = str(task.get("id"))
+                before = audiences.get(task_id, frozenset())
+                after = audiences[task_id] = task_audience(task)
+                text = encode_event(task)
+                for member_id in after:
+                    tasks.setdefault(member_id, []).append(text)
+                for member_id in before - after:
+                    removed.setdefault(member_id, []).append(task_id)
+            for task_id in payload["deletedTaskIds"]:
+                before = audiences.pop(task_id, None)
+                for member_id in roster if before is None else before:
+                    deleted.setdefault(member_id, []).append(task_id)
+            for member_id in {*tasks, *removed, *deleted}:
+                messages.append((member_id, event, (
+                    f'{{"tasks": [{", ".join(tasks.get(member_id, []))}], '
+                    f'"deletedTaskIds": {json.dumps(deleted.get(member_id, []))}, '
+                    f'"removedTaskIds": {json.dumps(removed.get(member_id, []))}}}'
+                )))
+        else:
+            task = payload["task"]
+            task_id = str(task.get("id"))
+            before = audiences.get(task_id, frozenset())
+            after = audiences[task_id] = task_audience(task)
+            for member_id in after:
+                messages.append((member_id, event, encoded))
+            for member_id in before - after:
+                messages.append((member_id, "task_removed", encode_event({"taskId": task_id})))
+        return messages
+
+
+
+class MentionCache:
+    """The mention matcher for the current roster, rebuilt only after a member is added or renamed."""
+
+    def __init__(self, store: Store) -> None:
+        self.store = store
+        self._matcher: Optional[MentionMatcher] = None
+        self._version = -1
+
+    def matcher(self) -> MentionMatcher:
+        store = self.store
+        with store._lock:
+            if self._matcher is None or self._version != store.roster_version:
+                self._matcher = MentionMatcher(store.state["members"])
+                self._version = store.roster_version
+            return self._matcher
+
+
+
+def publish_change(household: "Household", event: str, payload: Dict[str, Any]) -> None:
+    store = household.store
+    with store._lock:
+        encoded = encode_event(payload)
+        if broker_link is not None:
+            broker_link.publish_change(household.id, event, encoded, household.projections.route(event, payload, encoded))
+            return
+        store.version += 1
+        household.hub.broadcast_event(event, with_version(store.version, encoded))
+        household.projections.publish(event, payload, encoded)
+
+
+def is_owner(task: Dict[str, Any], member_id: str) -> bool:
+    return member_id in (task.get("owners") or [])
+
+
+def is_creator(task: Dict[str, Any], member_id: str) -> bool:
+    return task.get("createdBy") == member_id
+
+
+ACTIVE_STATES = {"已指派", "已接受", "进行中"}
+
+
+def wants_reminder(member: Dict[str, Any], reminder_type: str) -> bool:
+    prefs = member.get("reminderPrefs") or {}
+    return bool(prefs.get("enabled", True) and prefs.get(reminder_type, True))
+
+
+def time_zone(name: Any) -> Any:
+    """The named IANA zone, or the server's local zone when it is missing or unknown."""
+    try:
+        return ZoneInfo(str(name))
+    except (ZoneInfoNotFoundError, ValueError):
+        return datetime.now().astimezone().tzinfo
+
+
+def clock_minutes(value: Any) -> Optional[int]:
+    match = CLOCK_RE.match(str(value or ""))
+    return None if match is None else int(match.group(1)) * 60 + int(match.group(2))
+
+
+def quiet_hours_of(value: Any) -> Optional[Dict[str, Any]]:
+    """Normalize reminderPrefs.quietHours: {"start": "HH:MM", "end": "HH:MM", "timeZone": IANA name}."""
+    if not isinstance(value, dict):
+        return None
+    start, end = clock_minutes(value.get("start")), clock_minutes(value.get("end"))
+    if start is None or end is None or start == end:
+        return None
+    zone = str(value.get("timeZone") or "")
+    return {"start": value["start"], "end": value["end"], "timeZone": zone if isinstance(time_zone(zone), ZoneInfo) else None}
+
+
+def quiet_hours_end(member: Dict[str, Any], now: datetime) -> Optional[datetime]:
+    """When the member's quiet hours around now end, or None outside them."""
+    quiet = (member.get("reminderPrefs") or {}).get("quietHours")
+    if not isinstance(quiet, dict):
+        return None
+    start, end = clock_minutes(quiet.get("start")), clock_minutes(quiet.get("end"))
+    if start is None or end is None or start == end:
+        return None
+    local = now.astimezone(time_zone(quiet.get("timeZone")))
+    minute = local.hour * 60 + local.minute
+    if not (start <= minute < end if start < end else minute >= start or minute < end):
+        return None
+    until = local.replace(hour=end // 60, minute=end % 60, second=0, microsecond=0)
+    if until <= local:
+        until += timedelta(days=1)
+    return until.astimezone(timezone.utc)
+
+
+def maybe_send_reminder(store: Store, task: Task, reminder_type: str, now_us: int, queued: List[ReminderEvent]) -> None:
+    """Queue the reminder for every owner who wants it; the scheduler sends them in per-member digests.
+
+    The id is derived from what fired it (the due time, or the overdue
+    round), so the same reminder is one event however often it is written.
+    """
+    mark = task.due_at if reminder_type != "overdue" else now_us
+    for owner_id in task.owners or []:
+        member = store.get_member(owner_id)
+        if not member or not wants_reminder(member, reminder_type):
+            continue
+        event = ReminderEvent({"id": f"{task.id}-{reminder_type}-{mark}-{owner_id}", "taskId": task.id, "memberId": owner_id, "type": reminder_type})
+        event.queued_at = now_us
+        queued.append(event)
+
+
+def process_reminders(store: Store, task: Task, now: datetime, queued: List[ReminderEvent]) -> bool:
+    if task.deleted_at is not None or task.archived_at is not None:
+        return False
+    if task.state not in ACTIVE_STATES:
+        return False
+    due = task.due_at
+    if due is None:
+        return False
+    now_us = to_epoch_us(now)
+    reminders = task.reminders
+    dirty = False
+    snooze_until = reminders.snooze_until
+    if snooze_until is not None and now_us < snooze_until:
+        return False
+    if snooze_until is not None:
+        reminders.snooze_until = None
+        dirty = True
+    diff = due - now_us
+    if diff <= 24 * HOUR_US and not reminders.remind24h_sent:
+        maybe_send_reminder(store, task, "remind24h", now_us, queued)
+        reminders.remind24h_sent = True
+        dirty = True
+    if diff <= 2 * HOUR_US and not reminders.remind2h_sent:
+        maybe_send_reminder(store, task, "remind2h", now_us, queued)
+        reminders.remind2h_sent = True
+        dirty = True
+    if diff <= 0:
+        last = reminders.last_overdue_at
+        if last is None or now_us - last >= 6 * HOUR_US:
+            maybe_send_reminder(store, task, "overdue", now_us, queued)
+            reminders.last_overdue_at = now_us
+            dirty = True
+    return dirty
+
+
+def next_reminder_at(task: Task) -> Optional[datetime]:
+    """The earliest moment process_reminders() could change anything for this task."""
+    if task.deleted_at is not None or task.archived_at is not None:
+        return None
+    if task.state not in ACTIVE_STATES:
+        return None
+    due = task.due_at
+    if due is None:
+        return None
+    reminders = task.reminders
+    snooze_until = reminders.snooze_until
+    fire_at = due
+    last = reminders.last_overdue_at
+    if last is not None and last + 6 * HOUR_US > due:
+        fire_at = last + 6 * HOUR_US
+    if not reminders.remind2h_sent:
+        fire_at = min(fire_at, due - 2 * HOUR_US)
+    if not reminders.remind24h_sent:
+        fire_at = min(fire_at, due - 24 * HOUR_US)
+    if snooze_until is not None and fire_at < snooze_until:
+        fire_at = snooze_until
+    return us_to_datetime(fire_at)
+
+
+class ReminderScheduler:
+    """Min-heap of (next fire time, task id), kept current by store commits.
+
+    Stale heap entries are skipped lazily: an entry only fires if it still
+    matches the task's latest scheduled time in ``_fire_at``.
+
+    A firing task queues reminder events in the store, in the same commit
+    as its sent flags. Each member's queued events go out together as one
+    ``reminder_digest`` REMINDER_DIGEST_SECONDS after the first of them,
+    or when the member's quiet hours end; ``_digests`` holds those times.
+    """
+
+    def __init__(self, store: Store, hub: SSEHub) -> None:
+        self.store = store
+        self.hub = hub
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, str]] = []
+        self._fire_at: Dict[str, float] = {}
+        self._digests: Dict[str, float] = {}
+        self._stopped = False
+        self.leader = True  # in a cluster, only the worker holding the household's lease fires reminders
+
+    def set_leader(self, leader: bool) -> None:
+        with self._cond:
+            if self.leader != leader:
+                self.leader = leader
+                self._cond.notify_all()
+
+    def reset(self, tasks: List[Dict[str, Any]], pending: List[ReminderEvent] = ()) -> None:
+        with self._cond:
+            self._heap = []
+            self._fire_at = {}
+            for task in tasks:
+                fire_at = next_reminder_at(task)
+                if fire_at:
+                    self._fire_at[task["id"]] = fire_at.timestamp()
+                    self._heap.append((fire_at.timestamp(), task["id"]))
+            heapq.heapify(self._heap)
+            # Left over from the last run: give members' streams a window to reconnect first.
+            self._digests = {}
+            resume_at = time.time() + max(REMINDER_DIGEST_SECONDS, 10.0)
+            for event in pending:
+                self._digests.setdefault(event.member_id, max(resume_at, event.queued_at / 1e6 + REMINDER_DIGEST_SECONDS))
+            self._cond.notify_all()
+
+    def hold_digest(self, member_id: str, at: float, later: bool = False) -> None:
+        """Send the member's queued reminders at ``at``; unless later, keep an earlier time already set."""
+        with self._cond:
+            current = self._digests.get(member_id)
+            if later or current is None or at < current:
+                self._digests[member_id] = at
+                self._cond.notify_all()
+
+    def schedule(self, task: Dict[str, Any]) -> None:
+        fire_at = next_reminder_at(task)
+        with self._cond:
+            if not fire_at:
+                self._fire_at.pop(task.get("id"), None)
+                return
+            ts = fire_at.timestamp()
+            if self._fire_at.get(task["id"]) == ts:
+                return
+            self._fire_at[task["id"]] = ts
+            heapq.heappush(self._heap, (ts, task["id"]))
+            if self._heap[0][1] == task["id"]:
+                self._cond.notify_all()
+
+    def on_commit(self, record: Dict[str, Any]) -> None:
+        if record.get("op") == "put_task":
+            self.schedule(record["task"])
+        elif record.get("op") == "delete_task":
+            with self._cond:
+                self._fire_at.pop(record.get("id"), None)
+        elif record.get("op") == "put_reminder_event":
+            event = record["event"]
+            if event.sent_at is None:
+                self.hold_digest(event.member_id, event.queued_at / 1e6 + REMINDER_DIGEST_SECONDS)
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _next_due(self) -> Optional[Tuple[List[str], List[str]]]:
+        """Block until tasks fire or digests are due; returns (task ids, member ids), or None once stopped."""
+        with self._cond:
+            while not self._stopped:
+                if not self.leader:
+                    self._cond.wait()
+                    continue
+                now = time.time()
+                due_ids: List[str] = []
+                while self._heap and self._heap[0][0] <= now:
+                    ts, task_id = heapq.heappop(self._heap)
+                    if self._fire_at.get(task_id) == ts:
+                        del self._fire_at[task_id]
+                        due_ids.append(task_id)
+                due_members = [member_id for member_id, at in self._digests.items() if at <= now]
+                for member_id in due_members:
+                    del self._digests[member_id]
+                if due_ids or due_members:
+                    return due_ids, due_members
+                wake = list(self._digests.values())
+                if self._heap:
+                    wake.append(self._heap[0][0])
+                self._cond.wait(timeout=min(wake) - now if wake else None)
+            return None
+
+    def run(self) -> None:
+        while True:
+            due = self._next_due()
+            if due is None:
+                return
+            due_ids, due_members = due
+            now = datetime.now(timezone.utc)
+            if due_ids:
+                self._fire(due_ids, now)
+            if due_members:
+                self._send_digests(due_members, now)
+
+    def _fire(self, due_ids: List[str], now: datetime) -> None:
+        store = self.store
+        started = time.perf_counter()
+        with store._lock:
+            dirty_tasks: List[Dict[str, Any]] = []
+            queued: List[ReminderEvent] = []
+            for task_id in due_ids:
+                task = store.get_task(task_id)
+                if not task:
+                    continue
+                try:
+                    if process_reminders(store, task, now, queued):
+                        dirty_tasks.append(task)
+                    else:
+                        self.schedule(task)
+                except Exception:
+                    log.exception("reminder for task %s failed", task_id)
+            for event in queued:
+                store.add_reminder_event(event)
+            records = [put_task(task) for task in dirty_tasks] + [put_reminder_event(event) for event in queued]
+            seq = store.commit(*records) if records else 0
+        metrics.observe("reminder_pass_seconds", time.perf_counter() - started)
+        metrics.inc("reminder_tasks_processed_total", len(due_ids))
+        metrics.inc("reminders_queued_total", len(queued))
+        if seq:
+            store.wait(seq)
+
+    def _send_digests(self, member_ids: List[str], now: datetime) -> None:
+        """Send each member's queued reminders as one event and record them as sent.
+
+        Reminders the member no longer wants, for tasks that are gone or no
+        longer active, or repeating an earlier one in the digest, are dropped
+        from the outbox instead.
+        """
+        store = self.store
+        now_us = to_epoch_us(now)
+        records: List[Dict[str, Any]] = []
+        with store._lock:
+            for member_id in member_ids:
+                pending = store.pending_reminders(member_id)
+                if not pending:
+                    continue
+                member = store.get_member(member_id)
+                quiet_until = quiet_hours_end(member, now) if member else None
+                if quiet_until is not None:
+                    self.hold_digest(member_id, quiet_until.timestamp(), later=True)
+                    continue
+                items: List[Dict[str, Any]] = []
+                seen: Set[Tuple[str, str]] = set()
+                for event in pending:
+                    task = store.get_task(event.task_id)
+                    key = (event.task_id, event.type)
+                    if (
+                        member is None
+                        or not wants_reminder(member, event.type)
+                        or task is None
+                        or task.state not in ACTIVE_STATES
+                        or task.deleted_at is not None
+                        or task.archived_at is not None
+                        or key in seen
+                    ):
+                        store.remove_reminder_event(event.id)
+                        records.append(delete_reminder_event(event.id))
+                        continue
+                    seen.add(key)
+                    event.sent_at = now_us
+                    records.append(put_reminder_event(event))
+                    items.append({"id": event.id, "taskId": event.task_id, "type": event.type, "queuedAt": event["queuedAt"]})
+                if items:
+                    self.hub.send_to_member(member_id, "reminder_digest", {"reminders": items})
+                    metrics.inc("reminder_digests_total")
+                    metrics.inc("reminders_sent_total", len(items))
+            seq = store.commit(*records) if records else 0
+        if seq:
+            store.wait(seq)
+
+background_stop = threading.Event()
+
+
+def normalize_text(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def search_terms(text: str) -> List[Tuple[str, List[str]]]:
+    """Split normalized text into runs with their tokens: CJK runs give bigrams, other runs are one word token."""
+    terms: List[Tuple[str, List[str]]] = []
+    for match in SEARCH_RUN_RE.finditer(text):
+        run = match.group(0)
+        if match.group(1) and len(run) > 1:
+            terms.append((run, [run[i:i + 2] for i in range(len(run) - 1)]))
+        else:
+            terms.append((run, [run]))
+    return terms
+
+
+def index_tokens(text: str) -> Set[str]:
+    """Bigrams plus single characters for CJK runs, so one-character queries still hit the index."""
+    tokens: Set[str] = set()
+    for match in SEARCH_RUN_RE.finditer(text):
+        run = match.group(0)
+        if match.group(1):
+            tokens.update(run)
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.add(run)
+    return tokens
+
+
+@dataclass
+class SearchDoc:
+    ordinal: int
+    updated_at: str
+    state: str
+    owners: List[str]
+    archived: bool
+    fields: Tuple[str, str, str]
+
+    def tokens(self) -> Set[str]:
+        return index_tokens("\n".join(self.fields))
+
+
+class SearchIndex:
+    """Inverted index over task content, subtask contents and comment bodies.
+
+    Kept current by store commits; recycle-bin tasks are not indexed. Tasks
+    are numbered so postings are sets of small ints, which is also how they
+    are saved: one packed uint32 array per token in the store's
+    ``search_file``, written every SEARCH_SAVE_SECONDS and at shutdown. On
+    startup only tasks whose updatedAt differs from the saved copy are
+    tokenized again.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._docs: Dict[str, SearchDoc] = {}
+        self._ids: List[Optional[str]] = []
+        self._postings: Dict[str, Set[int]] = {}
+        self._dirty = False
+
+    def _unpost(self, ordinal: int, tokens: Set[str]) -> None:
+        for token in tokens:
+            ordinals = self._postings.get(token)
+            if ordinals is not None:
+                ordinals.discard(ordinal)
+                if not ordinals:
+                    del self._postings[token]
+
+    def _drop(self, task_id: str) -> None:
+        doc = self._docs.pop(task_id, None)
+        if doc is None:
+            return
+        self._unpost(doc.ordinal, doc.tokens())
+        self._ids[doc.ordinal] = None
+        self._dirty = True
+
+    def _put(self, task: Dict[str, Any]) -> None:
+        task_id = str(task.get("id"))
+        if task.get("deletedAt"):
+            self._drop(task_id)
+            return
+        old = self._docs.get(task_id)
+        if old is not None and old.updated_at == str(task.get("updatedAt") or ""):
+            return
+        if old is None:
+            ordinal = len(self._ids)
+            self._ids.append(task_id)
+        else:
+            ordinal = old.ordinal
+        doc = SearchDoc(
+            ordinal=ordinal,
+            updated_at=str(task.get("updatedAt") or ""),
+            state=str(task.get("state") or ""),
+            owners=[str(x) for x in task.get("owners") or []],
+            archived=bool(task.get("archivedAt")),
+            fields=(
+                normalize_text(str(task.get("content") or "")),
+                normalize_text("\n".join(str(st.get("content") or "") for st in task.get("subtasks") or [])),
+                normalize_text("\n".join(str(c.get("content") or "") for c in task.get("comments") or [])),
+            ),
+        )
+        tokens = doc.tokens()
+        previous = old.tokens() if old is not None else set()
+        self._unpost(ordinal, previous - tokens)
+        for token in tokens - previous:
+            self._postings.setdefault(token, set()).add(ordinal)
+        self._docs[task_id] = doc
+        self._dirty = True
+
+    def on_commit(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            if record.get("op") == "put_task":
+                self._put(record["task"])
+            elif record.get("op") == "delete_task":
+                self._drop(str(record.get("id")))
+
+    def load(self, path: Optional[Path]) -> None:
+        """Restore the saved index; a missing or unreadable file just leaves it empty."""
+        if path is None or not path.exists():
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            ids: List[Optional[str]] = [None] * len(saved["ids"])
+            docs: Dict[str, SearchDoc] = {}
+            for ordinal, entry in enumerate(saved["ids"]):
+                if entry is not None:
+                    task_id, updated_at, state, owners, archived, fields = entry
+                    ids[ordinal] = task_id
+                    docs[task_id] = SearchDoc(ordinal, updated_at, state, owners, archived, tuple(fields))
+            postings: Dict[str, Set[int]] = {}
+            for token, packed in saved["postings"].items():
+                ordinals = array("I")
+                ordinals.frombytes(base64.b64decode(packed))
+                if saved.get("byteorder") != sys.byteorder:
+                    ordinals.byteswap()
+                postings[token] = set(ordinals)
+        except Exception as exc:
+            log.warning("ignoring unreadable search index %s: %s", path, exc)
+            return
+        with self._lock:
+            self._docs, self._ids, self._postings, self._dirty = docs, ids, postings, False
+
+    def save(self, path: Optional[Path]) -> None:
+        if path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = []
+            for task_id in self._ids:
+                doc = self._docs.get(task_id) if task_id is not None else None
+                entries.append(
+                    None if doc is None else [task_id, doc.updated_at, doc.state, doc.owners, doc.archived, list(doc.fields)]
+                )
+            postings = {
+                token: base64.b64encode(array("I", ordinals).tobytes()).decode("ascii")
+                for token, ordinals in self._postings.items()
+            }
+            self._dirty = False
+        write_atomic(
+            path, json.dumps({"version": 1, "byteorder": sys.byteorder, "ids": entries, "postings": postings}, ensure_ascii=False)
+        )
+
+    def reconcile(self, tasks: List[Dict[str, Any]], complete: bool = False) -> None:
+        """Re-index tasks whose updatedAt differs from the indexed copy; with complete, drop docs not in tasks."""
+        with self._lock:
+            for task in tasks:
+                self._put(task)
+            if complete:
+                live = {str(task.get("id")) for task in tasks}
+                for task_id in [task_id for task_id in self._docs if task_id not in live]:
+                    self._drop(task_id)
+
+    def search(
+        self,
+        query: str,
+        states: Set[str],
+        owner: str,
+        archived: Optional[bool],
+        limit: int,
+        after: Optional[Tuple[int, str, str]] = None,
+    ) -> Tuple[List[str], int, Optional[Tuple[int, str, str]]]:
+        """Ids of matching tasks, best first, the total number of matches and the position to pass
+        as `after` for the next page (None on the last one).
+
+        Candidates come from intersecting postings (rarest first) and are then
+        checked for each query run as a substring, since two bigrams can match
+        without being adjacent. Score is the weighted count of occurrences per
+        field; ties go to the most recently updated task.
+        """
+        terms = search_terms(normalize_text(query))
+        if not terms:
+            return [], 0, None
+        with self._lock:
+            lists = sorted((self._postings.get(token, set()) for _, grams in terms for token in grams), key=len)
+            candidates = set(lists[0])
+            for ordinals in lists[1:]:
+                candidates &= ordinals
+                if not candidates:
+                    break
+            scored: List[Tuple[int, str, str]] = []
+            for ordinal in candidates:
+                task_id = self._ids[ordinal]
+                doc = self._docs[task_id]
+                if states and doc.state not in states:
+                    continue
+                if owner and owner not in doc.owners:
+                    continue
+                if archived is not None and doc.archived != archived:
+                    continue
+                score = 0
+                for run, _ in terms:
+                    hits = sum(weight * text.count(run) for weight, text in zip(SEARCH_FIELD_WEIGHTS, doc.fields))
+                    if not hits:
+                        break
+                    score += hits
+                else:
+                    scored.append((score, doc.updated_at, task_id))
+        scored.sort(reverse=True)
+        total = len(scored)
+        if after is not None:
+            scored = [entry for entry in scored if entry < after]
+        page = scored[:limit]
+        return [task_id for _, _, task_id in page], total, page[-1] if len(scored) > limit else None
+
+
+
+def reconcile_cold_search(household: "Household") -> None:
+    """Bring archived tasks in the index up to date and drop ids that no longer exist, without keeping the cold tier loaded."""
+    store = household.store
+    was_loaded = store.cold_loaded()
+    try:
+        store.cold_tasks()
+        with store._lock:
+            household.search_index.reconcile(store.state["tasks"] + store.cold_tasks(), complete=True)
+    except Exception:
+        log.exception("search index reconcile failed for %s", household.id)
+    if not was_loaded:
+        store.release_cold()
+
+
+def run_search_save() -> None:
+    while not background_stop.wait(SEARCH_SAVE_SECONDS):
+        for household in households.each():
+            if not household.scheduler.leader:
+                continue  # in a cluster, one copy of each index is enough
+            try:
+                household.search_index.save(household.store.search_file)
+            except Exception:
+                log.exception("search index save failed for %s", household.id)
+
+
+STAT_FIELDS = ("created", "completed", "onTime", "overdue", "undated", "cycleUs", "cycles", "createdDone")
+
+
+class TaskStats:
+    """Completion KPIs in hourly buckets, fed by the task event log as it is committed.
+
+    Each bucket holds a row of STAT_FIELDS counters for the household and for
+    every member ("member", id) and repeat series ("series", id) an event
+    touched, so a window's numbers are a sum over its buckets and no task is
+    rescanned. createdDone is counted in the hour the task was created: a
+    window's completion rate is the share of the tasks created in it that are
+    done by now. Buckets older than the longest STATS_WINDOWS are dropped;
+    reset() rebuilds everything from the log.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buckets: Dict[int, Dict[Tuple[str, str], List[int]]] = {}
+        self._newest = 0
+
+    def reset(self, events: List[TaskEvent], lookup: Callable[[str], Optional[Task]]) -> None:
+        with self._lock:
+            self._buckets = {}
+            self._newest = 0
+        for event in sorted(events, key=lambda e: e.occurred_at or 0):
+            task = lookup(event.task_id) if event.state is None else None
+            if task is not None:
+                # Logged by the Node server, which keeps no detail: take it from the task as it is now.
+                event.owners = list(task.owners or [])
+                event.series_id = task.series_id
+                event.due_at = task.due_at
+                event.created_at = task.created_at
+                event.state = {"create": "已指派", "confirm": "已完成", "complete": "待确认" if task.require_confirm else "已完成"}.get(
+                    event.action, task.state
+                )
+            self.add(event)
+
+    def on_commit(self, record: Dict[str, Any]) -> None:
+        if record.get("op") == "put_task_event":
+            self.add(record["event"])
+
+    def add(self, event: TaskEvent) -> None:
+        occurred = event.occurred_at
+        if occurred is None:
+            return
+        keys = [("", "")] + [("member", owner) for owner in event.owners or ()]
+        if event.series_id:
+            keys.append(("series", event.series_id))
+        hour = occurred // HOUR_US
+        with self._lock:
+            if hour > self._newest:
+                self._newest = hour
+                oldest = hour - max(STATS_WINDOWS.values())
+                for stale in [h for h in self._buckets if h <= oldest]:
+                    del self._buckets[stale]
+            if event.action == "create":
+                self._bump(hour, keys, {"created": 1})
+            if event.state == "已完成" and event.previous_state != "已完成":
+                due, created = event.due_at, event.created_at
+                counts = {"completed": 1, "undated" if due is None else "onTime" if occurred <= due else "overdue": 1}
+                if created is not None:
+                    counts.update(cycleUs=occurred - created, cycles=1)
+                    self._bump(created // HOUR_US, keys, {"createdDone": 1})
+                self._bump(hour, keys, counts)
+
+    def _bump(self, hour: int, keys: List[Tuple[str, str]], counts: Dict[str, int]) -> None:
+        if hour <= self._newest - max(STATS_WINDOWS.values()):
+            return
+        rows = self._buckets.setdefault(hour, {})
+        for key in keys:
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = [0] * len(STAT_FIELDS)
+            for name, amount in counts.items():
+                row[STAT_FIELDS.index(name)] += amount
+
+    def totals(self, first_hour: int) -> Dict[Tuple[str, str], List[int]]:
+        """Counters summed over the buckets from first_hour (epoch hours) on."""
+        totals: Dict[Tuple[str, str], List[int]] = {}
+        with self._lock:
+            for hour, rows in self._buckets.items():
+                if hour < first_hour:
+                    continue
+                for key, row in rows.items():
+                    total = totals.get(key)
+                    if total is None:
+                        totals[key] = list(row)
+                    else:
+                        for index, value in enumerate(row):
+                            total[index] += value
+        return totals
+
+
+
+def stat_kpis(row: List[int]) -> Dict[str, Any]:
+    created, completed, on_time, overdue, undated, cycle_us, cycles, created_done = row
+    return {
+        "created": created,
+        "completed": completed,
+        "completionRate": round(created_done / created, 4) if created else None,
+        "onTime": on_time,
+        "overdue": overdue,
+        "undated": undated,
+        "onTimeRate": round(on_time / (on_time + overdue), 4) if on_time + overdue else None,
+        "avgCompletionHours": round(cycle_us / cycles / HOUR_US, 2) if cycles else None,
+    }
+
+
+def purge_task_events(store: Store, now: Optional[datetime] = None) -> int:
+    """Drop task events older than TASK_EVENT_RETENTION_DAYS (0 keeps them forever), never
+    within the longest stats window, which is rebuilt from the log on load."""
+    if TASK_EVENT_RETENTION_DAYS <= 0:
+        return 0
+    days = max(TASK_EVENT_RETENTION_DAYS, max(STATS_WINDOWS.values()) // 24)
+    cutoff = to_epoch_us((now or datetime.now(timezone.utc)) - timedelta(days=days))
+    with store._lock:
+        expired = [event.id for event in store.task_events.values() if event.occurred_at is not None and event.occurred_at < cutoff]
+        for event_id in expired:
+            store.remove_task_event(event_id)
+        seq = store.commit(*[delete_task_event(event_id) for event_id in expired]) if expired else 0
+    if seq:
+        store.wait(seq)
+    return len(expired)
+
+
+def purge_expired_tasks(household: "Household", now: Optional[datetime] = None) -> int:
+    """Permanently drop recycle-bin tasks deleted more than RECYCLE_RETENTION_DAYS ago (0 keeps them forever)."""
+    if RECYCLE_RETENTION_DAYS <= 0:
+        return 0
+    cutoff = to_epoch_us((now or datetime.now(timezone.utc)) - timedelta(days=RECYCLE_RETENTION_DAYS))
+
+    def expired(task: Optional[Task]) -> bool:
+        return task is not None and task.deleted_at is not None and task.deleted_at < cutoff
+
+    store = household.store
+    was_loaded = store.cold_loaded()
+    candidates = [str(task.get("id")) for task in store.cold_tasks() if expired(task)]
+    purged = 0
+    seq = 0
+    with store._lock:
+        for task_id in candidates:
+            if not expired(store.get_cold_task(task_id)):
+                continue
+            store.remove_task(task_id)
+            seq = store.commit(delete_task(task_id))
+            publish_change(household, "task_deleted", {"taskId": task_id})
+            purged += 1
+    if seq:
+        store.wait(seq)
+    if not was_loaded:
+        store.release_cold()
+    return purged
+
+
+def purge_reminder_events(store: Store, now: Optional[datetime] = None) -> int:
+    """Drop reminder events sent more than REMINDER_EVENT_RETENTION_DAYS ago (0 keeps them forever)."""
+    if REMINDER_EVENT_RETENTION_DAYS <= 0:
+        return 0
+    cutoff = to_epoch_us((now or datetime.now(timezone.utc)) - timedelta(days=REMINDER_EVENT_RETENTION_DAYS))
+    with store._lock:
+        expired = [event.id for event in store.reminder_events.values() if event.sent_at is not None and event.sent_at < cutoff]
+        for event_id in expired:
+            store.remove_reminder_event(event_id)
+        seq = store.commit(*[delete_reminder_event(event_id) for event_id in expired]) if expired else 0
+    if seq:
+        store.wait(seq)
+    return len(expired)
+
+
+def run_metrics_log() -> None:
+    while not background_stop.wait(METRICS_LOG_SECONDS):
+        log.info("metrics %s", json.dumps(metrics.summary(), ensure_ascii=False, sort_keys=True))
+
+
+def run_retention() -> None:
+    while not background_stop.wait(RETENTION_SWEEP_SECONDS):
+        for household in households.each():
+            if not household.scheduler.leader:
+                continue
+            try:
+                purge_expired_tasks(household)
+            except Exception:
+                log.exception("recycle bin sweep failed for %s", household.id)
+            try:
+                purge_reminder_events(household.store)
+            except Exception:
+                log.exception("reminder event sweep failed for %s", household.id)
+            try:
+                purge_task_events(household.store)
+            except Exception:
+                log.exception("task event sweep failed for %s", household.id)
+
+
+def frame_bytes(frame: Dict[str, Any]) -> bytes:
+    return (json.dumps(frame, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+class BrokerPeer:
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.worker = ""
+        self._send_lock = threading.Lock()
+
+    def send(self, data: bytes) -> None:
+        try:
+            with self._send_lock:
+                self.sock.sendall(data)
+        except OSError:
+            pass
+
+
+@dataclass
+class BrokerShard:
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    store: Optional[Store] = None
+    peers: Set[BrokerPeer] = field(default_factory=set)
+    epoch: str = field(default_factory=lambda: uuid4().hex[:8])
+    version: int = 0
+    views: Dict[str, int] = field(default_factory=dict)
+    event_id: int = 0
+    writes: int = 0
+    # write id -> (writer, its request id, holders that have not applied the write yet)
+    unapplied: Dict[int, Tuple[BrokerPeer, int, Set[BrokerPeer]]] = field(default_factory=dict)
+
+
+class Broker:
+    """The local pub/sub hub of a WORKERS > 1 cluster, served by the supervisor on a Unix socket.
+
+    It is the only writer of every household's SQLite file and the one
+    place where changes get their order: a worker's write is committed,
+    relayed to every worker holding the household (the writer included)
+    and acknowledged once each of them reports it applied, so a request
+    on any worker after the acknowledgement reads the write and validates
+    against it. Published changes and targeted events are
+    stamped here with the household version, the member's scope=mine
+    version and the SSE event id, so /api/state from one worker lines up
+    with /events from another. It also hands out scheduler leases, which
+    lapse after LEASE_SECONDS without renewal or when the holder
+    disconnects.
+
+    Frames are JSON lines; a worker's frame carrying "rid" gets a reply
+    with the same "rid".
+    """
+
+    LATER: Dict[str, Any] = {}  # _handle() result for a request answered by a later frame
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._shards: Dict[str, BrokerShard] = {}
+        self._leases: Dict[str, Tuple[BrokerPeer, float]] = {}
+        self._listener: Optional[socket.socket] = None
+
+    def prepare(self, household_id: str) -> BrokerShard:
+        """The household's shard, its file seeded and migrated by one full load the first time."""
+        with self._lock:
+            shard = self._shards.get(household_id)
+            if shard is None:
+                shard = self._shards[household_id] = BrokerShard()
+        with shard.lock:
+            if shard.store is None:
+                directory = None if household_id == DEFAULT_HOUSEHOLD else HOUSEHOLDS_DIR / household_id
+                seeded = create_store(directory)
+                seeded.load()
+                seeded.save()  # keeps series ids assigned on load, so every worker reads the same ones
+                seeded.close()
+                shard.store = create_store(directory)  # never loaded: only its _write is used
+            return shard
+
+    def start(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            self.path.unlink()
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(str(self.path))
+        self._listener.listen()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def close(self) -> None:
+        if self._listener is not None:
+            self._listener.close()
+        with self._lock:
+            shards = list(self._shards.values())
+        for shard in shards:
+            with shard.lock:
+                if shard.store is not None:
+                    shard.store.close()
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(BrokerPeer(sock),), daemon=True).start()
+
+    def _serve(self, peer: BrokerPeer) -> None:
+        try:
+            for line in peer.sock.makefile("rb"):
+                frame = json.loads(line)
+                try:
+                    reply = self._handle(peer, frame)
+                except Exception as exc:
+                    log.exception("broker %s from worker %s failed", frame.get("op"), peer.worker)
+                    reply = {"error": str(exc)}
+                if "rid" in frame and reply is not self.LATER:
+                    peer.send(frame_bytes({"op": "reply", "rid": frame["rid"], **(reply or {})}))
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self._lock:
+                shards = list(self._shards.values())
+                self._leases = {name: lease for name, lease in self._leases.items() if lease[0] is not peer}
+            for shard in shards:
+                with shard.lock:
+                    self._drop(shard, peer)
+            peer.sock.close()
+
+    def _handle(self, peer: BrokerPeer, frame: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        op = frame["op"]
+        if op == "hello":
+            peer.worker = str(frame["worker"])
+            return None
+        if op == "lease":
+            now = time.monotonic()
+            with self._lock:
+                holder = self._leases.get(frame["name"])
+                if holder is not None and holder[0] is not peer and holder[1] > now:
+                    return {"granted": False}
+                self._leases[frame["name"]] = (peer, now + LEASE_SECONDS)
+                return {"granted": True}
+        if op == "release":
+            with self._lock:
+                holder = self._leases.get(frame["name"])
+                if holder is not None and holder[0] is peer:
+                    del self._leases[frame["name"]]
+            return None
+        shard = self.prepare(frame["h"])
+        with shard.lock:
+            if op == "open":
+                shard.peers.add(peer)
+                return {"epoch": shard.epoch, "version": shard.version, "views": shard.views, "eventId": shard.event_id}
+            if op == "leave":
+                self._drop(shard, peer)
+                return None
+            if op == "write":
+                shard.store._write([(0, line) for line in frame["records"]])
+                shard.writes += 1
+                holders = set(shard.peers)
+                self._relay(shard, {"op": "records", "h": frame["h"], "origin": peer.worker, "records": frame["records"], "wid": shard.writes})
+                if not holders:
+                    return None
+                shard.unapplied[shard.writes] = (peer, frame["rid"], holders)
+                return self.LATER
+            if op == "applied":
+                self._applied(shard, peer, [frame["wid"]])
+                return None
+            if op == "change":
+                shard.version += 1
+                shard.event_id += 1
+                frame.update(version=shard.version, id=shard.event_id, origin=peer.worker)
+                for entry in frame["scoped"]:
+                    version = shard.views[entry[0]] = shard.views.get(entry[0], 0) + 1
+                    shard.event_id += 1
+                    entry.extend((version, shard.event_id))
+                self._relay(shard, frame)
+                return None
+            if op == "member":
+                shard.event_id += 1
+                frame["id"] = shard.event_id
+                self._relay(shard, frame)
+                return None
+        raise ValueError(f"unknown frame {op}")
+
+    @staticmethod
+    def _relay(shard: BrokerShard, frame: Dict[str, Any]) -> None:
+        data = frame_bytes(frame)
+        for peer in list(shard.peers):
+            peer.send(data)
+
+    @staticmethod
+    def _applied(shard: BrokerShard, peer: BrokerPeer, write_ids: List[int]) -> None:
+        """Record that peer applied these writes; acknowledge each one no holder still owes. Call with shard.lock held."""
+        for write_id in write_ids:
+            entry = shard.unapplied.get(write_id)
+            if entry is None:
+                continue
+            writer, rid, holders = entry
+            holders.discard(peer)
+            if not holders:
+                del shard.unapplied[write_id]
+                writer.send(frame_bytes({"op": "reply", "rid": rid}))
+
+    def _drop(self, shard: BrokerShard, peer: BrokerPeer) -> None:
+        """Stop relaying to peer and stop waiting for it to apply anything. Call with shard.lock held."""
+        shard.peers.discard(peer)
+        self._applied(shard, peer, list(shard.unapplied))
+
+
+class BrokerLink:
+    """A cluster worker's connection to the Broker.
+
+    A reader thread only sorts incoming frames: replies wake the waiting
+    request(), everything else is queued for one applier thread that hands
+    it to its household in arrival order. The socket is therefore always
+    drained, however long applying a frame has to wait for a store lock.
+
+    Losing the connection fails every waiting and later request and sends
+    the process SIGTERM, so run() shuts down as usual and exits with 1 for
+    the supervisor to start a fresh worker.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._sock: Optional[socket.socket] = None
+        self._send_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._replies: Dict[int, Dict[str, Any]] = {}
+        self._next_rid = 0
+        self._inbox: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        self._closing = False
+        self.lost = False
+
+    def connect(self, timeout: float = 10.0) -> None:
+        deadline = time.monotonic() + timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(str(self.path))
+                break
+            except OSError:
+                sock.close()
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        self._sock = sock
+        self.send({"op": "hello", "worker": WORKER_ID})
+        threading.Thread(target=self._read, daemon=True).start()
+        threading.Thread(target=self._apply, daemon=True).start()
+
+    def close(self) -> None:
+        self._closing = True
+        self._inbox.put(None)
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+
+    def send(self, frame: Dict[str, Any]) -> None:
+        data = frame_bytes(frame)
+        with self._send_lock:
+            self._sock.sendall(data)
+
+    def request(self, frame: Dict[str, Any], timeout: float = 30.0) -> Dict[str, Any]:
+        with self._cond:
+            self._next_rid += 1
+            rid = frame["rid"] = self._next_rid
+        self.send(frame)
+        with self._cond:
+            if not self._cond.wait_for(lambda: rid in self._replies or self._closing or self.lost, timeout):
+                raise TimeoutError(f"broker did not answer {frame['op']}")
+            reply = self._replies.pop(rid, None)
+        if reply is None:
+            raise ConnectionError("broker connection closed")
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply
+
+    def _read(self) -> None:
+        try:
+            for line in self._sock.makefile("rb"):
+                frame = json.loads(line)
+                if frame["op"] == "reply":
+                    with self._cond:
+                        self._replies[frame["rid"]] = frame
+                        self._cond.notify_all()
+                else:
+                    self._inbox.put(frame)
+        except (OSError, ValueError):
+            pass
+        if not self._closing:
+            # Without the broker nothing can be written; let the supervisor start a fresh worker.
+            log.error("broker connection lost, shutting down")
+            with self._cond:
+                self.lost = True
+                self._cond.notify_all()
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    def _apply(self) -> None:
+        while True:
+            frame = self._inbox.get()
+            if frame is None:
+                return
+            household = households.find(frame["h"])
+            if household is not None:
+                try:
+                    household.receive(frame)
+                except Exception:
+                    log.exception("applying broker %s for %s failed", frame["op"], frame["h"])
+            if "wid" in frame:
+                # The writer's request is held until every holder says this; a frame still in a
+                # starting shard's backlog counts, since no request is served before it is replayed.
+                self.send({"op": "applied", "h": frame["h"], "wid": frame["wid"]})
+
+    def open(self, household_id: str) -> Dict[str, Any]:
+        """Start receiving the household's frames; returns the broker's counters for it."""
+        return self.request({"op": "open", "h": household_id})
+
+    def leave(self, household_id: str) -> None:
+        try:
+            self.send({"op": "leave", "h": household_id})
+            self.send({"op": "release", "name": f"scheduler/{household_id}"})
+        except OSError:
+            pass  # the broker drops a lost worker's households and leases itself
+
+    def lease(self, name: str) -> bool:
+        return bool(self.request({"op": "lease", "name": name})["granted"])
+
+    def publish_change(self, household_id: str, event: str, encoded: str, scoped: List[Tuple[str, str, str]]) -> None:
+        self.send({"op": "change", "h": household_id, "event": event, "encoded": encoded, "scoped": [list(m) for m in scoped]})
+
+    def send_to_member(self, household_id: str, member_id: str, event: str, payload: str) -> None:
+        self.send({"op": "member", "h": household_id, "member": member_id, "event": event, "payload": payload})
+
+
+broker_link = BrokerLink(BROKER_SOCKET) if WORKER_ID is not None else None
+
+
+def apply_broker_frame(household: "Household", frame: Dict[str, Any]) -> None:
+    """Apply one relayed frame to the household: peers' records, stamped changes and targeted events."""
+    store, hub, projections = household.store, household.hub, household.projections
+    op = frame["op"]
+    if op == "records":
+        store.apply_remote(frame["records"], frame["origin"] == WORKER_ID)
+    elif op == "change":
+        with store._lock:
+            store.version = frame["version"]
+            encoded = frame["encoded"]
+            if frame["origin"] != WORKER_ID:
+                # The publishing worker already moved its audiences when it routed the change.
+                projections.route(frame["event"], json.loads(encoded), encoded)
+            hub._publish(None, "all", frame["event"], with_version(frame["version"], encoded), frame["id"])
+            for member_id, event, text, version, event_id in frame["scoped"]:
+                projections.versions[member_id] = version
+                hub._publish(member_id, "mine", event, with_version(version, text), event_id)
+    elif op == "member":
+        hub._publish(frame["member"], None, frame["event"], frame["payload"], frame["id"])
+
+
+class Household:
+    """One family's shard: its store (and so its lock and files), SSE hub,
+    scoped projections, mention matcher, search index, reminder scheduler and
+    task stats.
+    Households share nothing but the process-wide metrics and static files.
+    """
+
+    def __init__(self, household_id: str, shard: Store, previous: Optional["Household"] = None) -> None:
+        self.id = household_id
+        self.store = shard
+        self.hub = SSEHub(household_id)
+        self.projections = MemberProjections(shard, self.hub)
+        self.mentions = MentionCache(shard)
+        self.search_index = SearchIndex()
+        self.scheduler = ReminderScheduler(shard, self.hub)
+        self.task_stats = TaskStats()
+        shard.subscribe(self.scheduler.on_commit)
+        shard.subscribe(self.task_stats.on_commit)
+        shard.subscribe(self.search_index.on_commit)
+        self.users = 0
+        self.last_used = time.monotonic()
+        self.started = False
+        self.stopped = threading.Event()
+        self._previous = previous  # an evicted shard on the same files, still closing
+        self._start_lock = threading.Lock()
+        # In a cluster, broker frames that arrive while the shard loads wait here.
+        self.backlog: Optional[List[Dict[str, Any]]] = [] if broker_link is not None else None
+        self._inbox_lock = threading.Lock()
+        if broker_link is not None:
+            self.scheduler.leader = False
+
+    def start(self) -> None:
+        """Load the shard and start its scheduler; a no-op once started."""
+        with self._start_lock:
+            if self.started:
+                return
+            if self._previous is not None:
+                self._previous.stopped.wait()
+                self._previous = None
+            store = self.store
+            # Join before reading the file: anything relayed after this point is either already
+            # on disk or queued in the backlog, and replaying it twice is harmless.
+            joined = broker_link.open(self.id) if broker_link is not None else None
+            store.load()
+            if joined is not None:
+                store.version = joined["version"]
+                self.projections.versions = dict(joined["views"])
+                self.projections._track()  # routing a change needs every worker's scoped audiences
+                self.hub.align(joined["epoch"], joined["eventId"])
+            self.scheduler.reset(store.state["tasks"], store.pending_reminders())
+            self.task_stats.reset(list(store.task_events.values()), store.get_task)
+            self.search_index.load(store.search_file)
+            self.search_index.reconcile(store.state["tasks"])
+            threading.Thread(target=self.scheduler.run, daemon=True).start()
+            threading.Thread(target=reconcile_cold_search, args=(self,), daemon=True).start()
+            with self._inbox_lock:
+                for frame in self.backlog or ():
+                    apply_broker_frame(self, frame)
+                self.backlog = None
+            self.started = True
+
+    def receive(self, frame: Dict[str, Any]) -> None:
+        with self._inbox_lock:
+            if self.backlog is not None:
+                self.backlog.append(frame)
+            else:
+                apply_broker_frame(self, frame)
+
+    def stop(self) -> None:
+        with self._start_lock:
+            if self.started:
+                self.scheduler.stop()
+                self.search_index.save(self.store.search_file)
+                self.store.close()
+                if broker_link is not None:
+                    broker_link.leave(self.id)
+                self.started = False
+            self.stopped.set()
+
+
+class Households:
+    """Household shards by id.
+
+    The default household lives on DATA_FILE / SQLITE_FILE / SNAPSHOT_FILE,
+    is what unprefixed routes use, and stays loaded. Any other household is
+    served under /h/<id>/ from HOUSEHOLDS_DIR/<id>/: it exists once that
+    directory does, loads on its first request and is closed once it has
+    had no request or open stream for HOUSEHOLD_IDLE_SECONDS.
+    """
+
+    def __init__(self) -> None:
+        self.default = Household(DEFAULT_HOUSEHOLD, create_store())
+        self._shards: Dict[str, Household] = {}
+        self._closing: Dict[str, Household] = {}
+        self._lock = threading.Lock()
+
+    def find(self, household_id: str) -> Optional[Household]:
+        """The registered household with this id, loaded or not, without holding it."""
+        with self._lock:
+            return self.default if household_id == DEFAULT_HOUSEHOLD else self._shards.get(household_id)
+
+    def loaded(self) -> List[Household]:
+        with self._lock:
+            return [household for household in (self.default, *self._shards.values()) if household.started]
+
+    def acquire(self, household_id: str) -> Optional[Household]:
+        """The household, held against eviction until release(); None if it does not exist. Not yet started."""
+        with self._lock:
+            if household_id == DEFAULT_HOUSEHOLD:
+                household = self.default
+            else:
+                household = self._shards.get(household_id)
+                if household is None:
+                    directory = HOUSEHOLDS_DIR / household_id
+                    if not directory.is_dir():
+                        return None
+                    household = Household(household_id, create_store(directory), self._closing.get(household_id))
+                    self._shards[household_id] = household
+            household.users += 1
+            return household
+
+    def release(self, household: Household) -> None:
+        with self._lock:
+            household.users -= 1
+            household.last_used = time.monotonic()
+
+    @contextmanager
+    def enter(self, household_id: str) -> Iterator[Optional[Household]]:
+        """Start and hold a household for one request or stream; yields None for an unknown id."""
+        household = self.acquire(household_id)
+        if household is None:
+            yield None
+            return
+        try:
+            household.start()
+            yield household
+        finally:
+            self.release(household)
+
+    def each(self) -> Iterator[Household]:
+        """Hold every loaded household in turn against eviction, for background sweeps."""
+        for household in self.loaded():
+            with self._lock:
+                if household is not self.default and self._shards.get(household.id) is not household:
+                    continue
+                household.users += 1
+            try:
+                yield household
+            finally:
+                self.release(household)
+
+    def evict_idle(self) -> List[str]:
+        now = time.monotonic()
+        with self._lock:
+            idle = [h for h in self._shards.values() if h.users == 0 and now - h.last_used >= HOUSEHOLD_IDLE_SECONDS]
+            for household in idle:
+                del self._shards[household.id]
+                self._closing[household.id] = household
+        for household in idle:
+            try:
+                household.stop()
+            finally:
+                with self._lock:
+                    if self._closing.get(household.id) is household:
+                        del self._closing[household.id]
+        return [household.id for household in idle]
+
+    def close(self) -> None:
+        with self._lock:
+            shards = [self.default, *self._shards.values()]
+            self._shards.clear()
+        for household in shards:
+            household.stop()
+
+
+households = Households()
+
+
+def run_household_eviction() -> None:
+    while not background_stop.wait(min(60.0, HOUSEHOLD_IDLE_SECONDS)):
+        try:
+            households.evict_idle()
+        except Exception:
+            log.exception("household eviction failed")
+
+
+def run_scheduler_leases() -> None:
+    """Cluster workers: take or renew the scheduler lease of every loaded household."""
+    while True:
+        for household in households.loaded():
+            try:
+                leader = broker_link.lease(f"scheduler/{household.id}")
+            except Exception as exc:
+                log.warning("scheduler lease for %s failed: %s", household.id, exc)
+                leader = False
+            household.scheduler.set_leader(leader)
+        if background_stop.wait(LEASE_SECONDS / 3):
+            return
+
+
+def household_of(path: str) -> Tuple[str, str]:
+    """Split /h/<household>/rest into the household id and /rest; other paths belong to the default household."""
+    match = HOUSEHOLD_PATH_RE.match(path)
+    if match is None:
+        return DEFAULT_HOUSEHOLD, path
+    return match.group(1), match.group(2) or "/"
+
+
+def accepts_gzip(headers: Any) -> bool:
+    return "gzip" in str(headers.get("Accept-Encoding") or "").lower()
+
+
+def etag_matches(headers: Any, etag: str) -> bool:
+    candidates = str(headers.get("If-None-Match") or "")
+    return any(tag.strip() in {etag, f"W/{etag}", "*"} for tag in candidates.split(","))
+
+
+def api_get_state(household: Household, query: Dict[str, List[str]], headers: Any) -> Response:
+    store = household.store
+    scope = (query.get("scope") or ["all"])[0]
+    if scope == "mine":
+        member_id = (query.get("memberId") or [""])[0]
+        if not store.get_member(member_id):
+            return json_response(404, {"error": "成员不存在"})
+        with store._lock:
+            snapshot = household.projections.snapshot(member_id)
+    elif scope == "all":
+        snapshot = store.encoded_snapshot()
+    else:
+        return json_response(400, {"error": "scope 只能是 all 或 mine"})
+    cache_headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(headers, snapshot.etag):
+        return Response(HTTPStatus.NOT_MODIFIED, headers=cache_headers)
+    response_headers = {"Content-Type": "application/json; charset=utf-8", **cache_headers}
+    if accepts_gzip(headers):
+        return Response(200, snapshot.gzipped(), {**response_headers, "Content-Encoding": "gzip"})
+    return Response(200, snapshot.body, response_headers)
+
+
+TASK_QUERY_FILTERS = {"owner": "owner", "creator": "createdBy", "seriesId": "seriesId", "state": "state"}
+TASK_QUERY_MAX_LIMIT = 200
+
+
+def encode_cursor(position: Tuple[Any, ...]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(position)).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[int, str]]:
+    try:
+        key, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return int(key), str(task_id)
+    except Exception:
+        return None
+
+
+def decode_search_cursor(cursor: str) -> Optional[Tuple[int, str, str]]:
+    try:
+        score, updated_at, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return int(score), str(updated_at), str(task_id)
+    except Exception:
+        return None
+
+
+def parse_paging(query: Dict[str, List[str]], decode: Callable[[str], Any] = decode_cursor) -> Any:
+    """Return (limit, after) from limit= and cursor=, or an error Response."""
+    try:
+        limit = max(1, min(TASK_QUERY_MAX_LIMIT, int((query.get("limit") or ["50"])[0])))
+    except ValueError:
+        return json_response(400, {"error": "limit 必须是数字"})
+    after = None
+    cursor = (query.get("cursor") or [""])[0]
+    if cursor:
+        after = decode(cursor)
+        if after is None:
+            return json_response(400, {"error": "无效的 cursor"})
+    return limit, after
+
+
+def api_list_cold_tasks(household: Household, query: Dict[str, List[str]], deleted: bool) -> Response:
+    """GET /api/history (archived) or /api/recycle-bin (deleted), newest first, filtered by owner= / creator=."""
+    store = household.store
+    paging = parse_paging(query)
+    if isinstance(paging, Response):
+        return paging
+    limit, after = paging
+    owner = (query.get("owner") or [""])[0]
+    creator = (query.get("creator") or [""])[0]
+    time_field = "deletedAt" if deleted else "archivedAt"
+    entries = []
+    for task in store.cold_tasks():
+        if bool(task.get("deletedAt")) != deleted:
+            continue
+        if owner and owner not in (task.get("owners") or []):
+            continue
+        if creator and task.get("createdBy") != creator:
+            continue
+        entries.append((task.millis(time_field) or 0, task.id, task))
+    entries.sort(key=lambda entry: (entry[0], entry[1]))
+    end = len(entries)
+    if after is not None:
+        end = bisect.bisect_left([(key, task_id) for key, task_id, _ in entries], after)
+    start = max(0, end - limit)
+    page = entries[start:end][::-1]
+    next_cursor = encode_cursor((page[-1][0], page[-1][1])) if page and start > 0 else None
+    with store._lock:
+        return json_response(200, {"tasks": [task for _, _, task in page], "nextCursor": next_cursor})
+
+
+def api_list_tasks(household: Household, query: Dict[str, List[str]]) -> Response:
+    """GET /api/tasks?owner=&creator=&state=&seriesId=&dueFrom=&dueTo=&archived=&deleted=&sort=&order=&limit=&cursor=
+
+    Repeated or comma-separated values of one filter are OR-ed; `state=active` expands to ACTIVE_STATES.
+    Live tasks are listed by default; `archived=true` and/or `deleted=true` list those tasks from the
+    cold tier instead, with the same filters, sort orders and cursors.
+    """
+    def values(name: str) -> List[str]:
+        return [v for raw in query.get(name, []) for v in raw.split(",") if v]
+
+    filters: Dict[str, Set[str]] = {}
+    for param, index_field in TASK_QUERY_FILTERS.items():
+        wanted = set(values(param))
+        if param == "state" and "active" in wanted:
+            wanted = (wanted - {"active"}) | ACTIVE_STATES
+        if wanted:
+            filters[index_field] = wanted
+
+    sort = (query.get("sort") or ["createdAt"])[0]
+    order = (query.get("order") or ["asc"])[0]
+    if sort not in TASK_SORT_FIELDS or order not in {"asc", "desc"}:
+        return json_response(400, {"error": "不支持的排序方式"})
+    due_bounds = []
+    for name in ("dueFrom", "dueTo"):
+        raw = (query.get(name) or [""])[0]
+        bound = epoch_ms(raw) if raw else None
+        if raw and bound is None:
+            return json_response(400, {"error": f"{name} 不是有效时间"})
+        due_bounds.append(bound)
+    tiers = {}
+    for name in ("archived", "deleted"):
+        raw = (query.get(name) or ["false"])[0].lower()
+        if raw not in {"true", "1", "false", "0"}:
+            return json_response(400, {"error": f"{name} 只能是 true 或 false"})
+        tiers[name] = raw in {"true", "1"}
+    paging = parse_paging(query)
+    if isinstance(paging, Response):
+        return paging
+    limit, after = paging
+
+    store = household.store
+    if tiers["archived"] or tiers["deleted"]:
+        tasks, last = store.query_cold_tasks(
+            filters, tiers["archived"], tiers["deleted"], sort, order == "desc", due_bounds[0], due_bounds[1], after, limit
+        )
+        with store._lock:
+            return json_response(200, {"tasks": tasks, "nextCursor": encode_cursor(last) if last else None})
+    with store._lock:
+        tasks, last = store.query_tasks(
+            filters, sort, order == "desc", due_bounds[0], due_bounds[1], after, limit
+        )
+        # Encode while the lock is held: the page holds live task dicts.
+        return json_response(200, {"tasks": tasks, "nextCursor": encode_cursor(last) if last else None})
+
+
+AGENDA_DEFAULT_DAYS = 30
+
+
+def agenda_tasks(
+    store: Store, start_ms: int, end_ms: int, owner: str, after: Optional[Tuple[int, str]]
+) -> Iterator[Tuple[Tuple[int, str], Dict[str, Any]]]:
+    """Live tasks due in [start_ms, end_ms), in due order, read straight off the dueAt index."""
+    entries = store.sorted_indexes["dueAt"]
+    owned = store.indexes["owner"].get(owner, set()) if owner else None
+    pos = bisect.bisect_left(entries, (start_ms, ""))
+    if after is not None:
+        pos = max(pos, bisect.bisect_right(entries, after))
+    for index in range(pos, len(entries)):
+        key = entries[index]
+        if key[0] >= end_ms:
+            return
+        if owned is None or key[1] in owned:
+            task = store.tasks_by_id[key[1]]
+            yield key, {"type": "task", "dueAt": task.get("dueAt"), "task": task}
+
+
+def agenda_series(
+    head: Task, start: datetime, end_ms: int, after: Optional[Tuple[int, str]]
+) -> Iterator[Tuple[Tuple[int, str], Dict[str, Any]]]:
+    """Virtual occurrences of a series after its head, due in [start, end_ms); nothing is built until asked for."""
+    series_id = head.series_id
+    if head.due_at is None:
+        return
+    head_due = us_to_datetime(head.due_at)
+    if after is not None:
+        start = max(start, datetime.fromtimestamp(after[0] / 1000, tz=timezone.utc))
+    for steps, due in series_occurrences(head_due, head.repeat_type, start):
+        key = (to_epoch_ms(due), series_id)
+        if key[0] >= end_ms:
+            return
+        if after is not None and key <= after:
+            continue
+        yield key, {
+            "type": "occurrence",
+            "dueAt": due.isoformat(),
+            "seriesId": series_id,
+            "occurrence": int(head.get("occurrence") or 1) + steps,
+            "taskId": head.get("id"),
+            "content": head.get("content"),
+            "owners": head.get("owners"),
+            "requireConfirm": head.get("requireConfirm"),
+        }
+
+
+def api_agenda(household: Household, query: Dict[str, List[str]]) -> Response:
+    """GET /api/agenda?from=&to=&owner=&limit=&cursor=
+
+    Live tasks due in the window merged, in due order, with the upcoming
+    occurrences of every recurring series, expanded lazily from the series
+    head so a long window only ever builds one page of occurrences.
+    """
+    bounds = []
+    for name in ("from", "to"):
+        raw = (query.get(name) or [""])[0]
+        bound = parse_iso(raw) if raw else None
+        if raw and bound is None:
+            return json_response(400, {"error": f"{name} 不是有效时间"})
+        if bound is not None and bound.tzinfo is None:
+            bound = bound.replace(tzinfo=timezone.utc)
+        bounds.append(bound)
+    start = bounds[0] or datetime.now(timezone.utc)
+    end = bounds[1] or start + timedelta(days=AGENDA_DEFAULT_DAYS)
+    if end <= start:
+        return json_response(400, {"error": "to 必须晚于 from"})
+    paging = parse_paging(query)
+    if isinstance(paging, Response):
+        return paging
+    limit, after = paging
+    owner = (query.get("owner") or [""])[0]
+    start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+
+    store = household.store
+    with store._lock:
+        sources = [agenda_tasks(store, start_ms, end_ms, owner, after)]
+        for head_id in store.series_heads.values():
+            head = store.tasks_by_id[head_id]
+            if normalize_repeat(head.get("repeat"))["type"] == "none" or head.get("state") == "已完成":
+                continue
+            if owner and owner not in (head.get("owners") or []):
+                continue
+            sources.append(agenda_series(head, start, end_ms, after))
+        page: List[Tuple[Tuple[int, str], Dict[str, Any]]] = []
+        for entry in heapq.merge(*sources, key=lambda entry: entry[0]):
+            page.append(entry)
+            if len(page) > limit:
+                break
+        more = len(page) > limit
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1][0]) if more else None
+        return json_response(200, {"items": [item for _, item in page], "nextCursor": next_cursor})
+
+
+def api_search(household: Household, query: Dict[str, List[str]]) -> Response:
+    """GET /api/search?q=&state=&owner=&archived=&limit=&cursor=
+
+    archived=1 only searches archived tasks, archived=0 only live ones;
+    by default both are searched. Recycle-bin tasks are never returned.
+    Pages follow the ranking; pass nextCursor back as cursor= for the next one.
+    """
+    text = (query.get("q") or [""])[0].strip()
+    if not text:
+        return json_response(400, {"error": "q 不能为空"})
+    states = {v for raw in query.get("state", []) for v in raw.split(",") if v}
+    if "active" in states:
+        states = (states - {"active"}) | ACTIVE_STATES
+    archived = {"1": True, "true": True, "0": False, "false": False}.get((query.get("archived") or [""])[0].lower())
+    paging = parse_paging(query, decode_search_cursor)
+    if isinstance(paging, Response):
+        return paging
+    limit, after = paging
+    ids, total, last = household.search_index.search(text, states, (query.get("owner") or [""])[0], archived, limit, after)
+    store = household.store
+    tasks = [task for task in (store.get_task(task_id) or store.get_cold_task(task_id) for task_id in ids) if task]
+    with store._lock:
+        return json_response(200, {"tasks": tasks, "total": total, "nextCursor": encode_cursor(last) if last else None})
+
+
+def api_stats(household: Household, query: Dict[str, List[str]]) -> Response:
+    """GET /api/stats[?window=day|week|month]: completion KPIs over rolling windows, overall and per member and series.
+
+    Windows are read from the task stats counters, ``current`` from the state
+    index; neither scans tasks.
+    """
+    window = (query.get("window") or [""])[0]
+    if window and window not in STATS_WINDOWS:
+        return json_response(400, {"error": "window 只能是 day、week 或 month"})
+    now = datetime.now(timezone.utc)
+    store = household.store
+    with store._lock:
+        by_state = {state: len(ids) for state, ids in store.indexes["state"].items() if ids}
+        members = [(member.id, member.name) for member in store.state["members"]]
+        series = {series_id: store.tasks_by_id[task_id].content for series_id, task_id in store.series_heads.items()}
+    total = sum(by_state.values())
+    done = by_state.get("已完成", 0)
+    empty = [0] * len(STAT_FIELDS)
+    windows: Dict[str, Any] = {}
+    for name in [window] if window else STATS_WINDOWS:
+        first_hour = to_epoch_us(now) // HOUR_US - STATS_WINDOWS[name] + 1
+        totals = household.task_stats.totals(first_hour)
+        windows[name] = {
+            "since": us_to_iso(first_hour * HOUR_US),
+            **stat_kpis(totals.get(("", ""), empty)),
+            "members": [
+                {"memberId": member_id, "name": member_name, **stat_kpis(totals.get(("member", member_id), empty))}
+                for member_id, member_name in members
+            ],
+            "series": [
+                {"seriesId": key, "content": series.get(key), **stat_kpis(row)}
+                for (kind, key), row in totals.items()
+                if kind == "series"
+            ],
+        }
+    return json_response(
+        200,
+        {
+            "generatedAt": now.isoformat(),
+            "current": {"total": total, "completed": done, "completionRate": round(done / total, 4) if total else None, "byState": by_state},
+            "windows": windows,
+        },
+    )
+
+
+def api_create_member(household: Household, body: Dict[str, Any]) -> Response:
+    name = str(body.get("name") or "").strip()
+    if not name:
+        return json_response(400, {"error": "成员名不能为空"})
+    member = create_member(name)
+    store = household.store
+    with store._lock:
+        store.add_member(member)
+        seq = store.commit(put_member(member))
+        publish_change(household, "member_created", {"member": member})
+    store.wait(seq)
+    return json_response(200, member)
+
+
+def api_create_task(household: Household, body: Dict[str, Any]) -> Response:
+    store = household.store
+    content = str(body.get("content") or "").strip()
+    created_by = str(body.get("createdBy") or "").strip()
+    if not content or not created_by:
+        return json_response(400, {"error": "任务内容或创建者不能为空"})
+    owners = [str(x) for x in (body.get("owners") or []) if store.get_member(str(x))]
+    if not owners and store.get_member(created_by):
+        owners = [created_by]
+    due_at = body.get("dueAt")
+    due_at = parse_iso(due_at).isoformat() if due_at and parse_iso(due_at) else None
+    repeat = body.get("repeat")
+    repeat_obj = normalize_repeat(repeat)
+    if repeat_obj["type"] != "none" and not due_at:
+        return json_response(400, {"error": "设置重复任务时必须填写截止时间"})
+    require_confirm = bool(body.get("requireConfirm"))
+    task = create_task(content, owners, due_at, require_confirm, created_by, repeat_obj)
+    event = task_event(task, created_by, "create", None, task["createdAt"])
+    with store._lock:
+        store.add_task(task)
+        store.add_task_event(event)
+        seq = store.commit(put_task(task), put_task_event(event))
+        publish_change(household, "task_created", {"task": task})
+    store.wait(seq)
+    return json_response(200, task)
+
+
+def api_update_member(household: Household, member_id: str, body: Dict[str, Any]) -> Response:
+    store = household.store
+    member = store.get_member(member_id)
+    if not member:
+        return json_response(404, {"error": "成员不存在"})
+    with store._lock:
+        if body.get("name"):
+            store.rename_member(member, str(body.get("name") or "").strip() or member["name"])
+        prefs = body.get("reminderPrefs")
+        if isinstance(prefs, dict):
+            member["reminderPrefs"] = {
+                "enabled": bool(prefs.get("enabled")),
+                "remind24h": bool(prefs.get("remind24h")),
+                "remind2h": bool(prefs.get("remind2h")),
+                "overdue": bool(prefs.get("overdue")),
+                "quietHours": quiet_hours_of(prefs.get("quietHours")),
+            }
+        seq = store.commit(put_member(member))
+        publish_change(household, "member_updated", {"member": member})
+    store.wait(seq)
+    return json_response(200, member)
+
+
+class ActionError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class ActionOutcome:
+    spawned: Optional[Dict[str, Any]] = None
+    purged: bool = False
+    mentions: List[Tuple[str, Dict[str, Any]]] = field(default_factory=list)
+    events: List[TaskEvent] = field(default_factory=list)
+
+
+def apply_task_action(household: Household, task: Dict[str, Any], actor_id: str, action: str, body: Dict[str, Any]) -> ActionOutcome:
+    """Apply one PATCH action to a working copy of a task; raises ActionError if it is not allowed.
+
+    Nothing outside ``task`` is touched: spawned occurrences, purges, mention
+    notifications and task events are returned for the caller to apply once
+    every action succeeded.
+    """
+    store = household.store
+    outcome = ActionOutcome()
+    changed = False
+    previous_state = task.get("state")
+    if task.get("deletedAt") and action not in {"restore", "purge", "delete"}:
+        raise ActionError(400, "任务已在回收站，无法操作")
+    if action == "accept" and is_owner(task, actor_id) and task.get("state") == "已指派":
+        task["state"] = "已接受"
+        changed = True
+    if action == "start" and is_owner(task, actor_id) and task.get("state") == "已接受":
+        task["state"] = "进行中"
+        changed = True
+    if action == "complete" and is_owner(task, actor_id) and task.get("state") in {"已接受", "进行中"}:
+        task["state"] = "待确认" if task.get("requireConfirm") else "已完成"
+        changed = True
+    if action == "confirm" and is_creator(task, actor_id) and task.get("state") == "待确认":
+        task["state"] = "已完成"
+        changed = True
+    if action == "snooze" and is_owner(task, actor_id):
+        minutes = max(5, int(body.get("minutes") or 60))
+        task["reminders"]["snoozeUntil"] = (datetime.now(timezone.utc) + timedelta(minutes=minutes)).isoformat()
+        changed = True
+    if (
+        action == "archive"
+        and (is_creator(task, actor_id) or is_owner(task, actor_id))
+        and not task.get("archivedAt")
+        and task.get("state") == "已完成"
+    ):
+        task["archivedAt"] = now_iso()
+        changed = True
+    if action == "unarchive" and (is_creator(task, actor_id) or is_owner(task, actor_id)) and task.get("archivedAt"):
+        task["archivedAt"] = None
+        changed = True
+    if action == "restore" and (is_creator(task, actor_id) or is_owner(task, actor_id)) and task.get("deletedAt"):
+        task["deletedAt"] = None
+        changed = True
+    if action == "purge" and (is_creator(task, actor_id) or is_owner(task, actor_id)) and task.get("deletedAt"):
+        outcome.purged = True
+        return outcome
+    if action == "delete":
+        if not (is_creator(task, actor_id) or is_owner(task, actor_id)):
+            raise ActionError(403, "无删除权限")
+        if task.get("deletedAt"):
+            return outcome
+        task["deletedAt"] = now_iso()
+        changed = True
+    if action == "subtask_add" and (is_creator(task, actor_id) or is_owner(task, actor_id)):
+        content = str(body.get("content") or "").strip()
+        if not content:
+            raise ActionError(400, "子任务内容不能为空")
+        task.setdefault("subtasks", []).append(create_subtask(content))
+        changed = True
+    if action == "subtask_toggle" and (is_creator(task, actor_id) or is_owner(task, actor_id)):
+        subtask_id = str(body.get("subtaskId") or "").strip()
+        for st in task.get("subtasks") or []:
+            if st.get("id") == subtask_id:
+                st["done"] = not bool(st.get("done"))
+                st["doneAt"] = now_iso() if st["done"] else None
+                changed = True
+                break
+    if action == "subtask_delete" and (is_creator(task, actor_id) or is_owner(task, actor_id)):
+        subtask_id = str(body.get("subtaskId") or "").strip()
+        before = len(task.get("subtasks") or [])
+        task["subtasks"] = [st for st in (task.get("subtasks") or []) if st.get("id") != subtask_id]
+        changed = changed or (len(task["subtasks"]) != before)
+    if action == "comment" and (is_creator(task, actor_id) or is_owner(task, actor_id)):
+        content = str(body.get("content") or "").strip()
+        if not content:
+            raise ActionError(400, "评论内容不能为空")
+        mention_ids = extract_mentions(content, household.mentions.matcher())
+        comment = create_comment(actor_id, content, mention_ids)
+        task.setdefault("comments", []).append(comment)
+        for mid in mention_ids:
+            if mid != actor_id:
+                member = store.get_member(mid)
+                prefs = (member or {}).get("reminderPrefs") or {}
+                if not prefs.get("enabled", True):
+                    continue
+                outcome.mentions.append(
+                    (mid, {"taskId": task.get("id"), "commentId": comment["id"], "authorId": actor_id, "content": content})
+                )
+        changed = True
+    if action == "update" and (is_creator(task, actor_id) or is_owner(task, actor_id)):
+        if body.get("content"):
+            task["content"] = str(body.get("content") or "").strip()
+        if isinstance(body.get("owners"), list):
+            owners = [str(x) for x in body.get("owners") if store.get_member(str(x))]
+            if owners:
+                task["owners"] = owners
+        if "dueAt" in body:
+            due = parse_iso(body.get("dueAt"))
+            task["dueAt"] = due.isoformat() if due else None
+            task["reminders"]["remind24hSent"] = False
+            task["reminders"]["remind2hSent"] = False
+            task["reminders"]["lastOverdueAt"] = None
+            task["reminders"]["snoozeUntil"] = None
+        if "repeat" in body:
+            next_repeat = normalize_repeat(body.get("repeat"))
+            if next_repeat["type"] != "none" and not task.get("dueAt"):
+                raise ActionError(400, "设置重复任务时必须填写截止时间")
+            task["repeat"] = next_repeat
+            if next_repeat["type"] != "none" and not task.get("seriesId"):
+                task["seriesId"] = str(uuid4())
+                task["occurrence"] = 1
+        if "requireConfirm" in body:
+            task["requireConfirm"] = bool(body.get("requireConfirm"))
+        changed = True
+    if not changed:
+        raise ActionError(400, "动作不允许或无变化")
+    task["updatedAt"] = now_iso()
+    outcome.events.append(task_event(task, actor_id, action, previous_state, task["updatedAt"]))
+    if (
+        previous_state != "已完成"
+        and task.get("state") == "已完成"
+        and not task.get("archivedAt")
+        and not task.get("deletedAt")
+    ):
+        repeat_type = task.repeat_type
+        due = us_to_datetime(task.due_at) if task.due_at is not None else None
+        if repeat_type != "none" and due:
+            next_task = create_task(
+                content=task.get("content") or "",
+                owners=list(task.get("owners") or []),
+                due_at=next_due(due, repeat_type).isoformat(),
+                require_confirm=bool(task.get("requireConfirm")),
+                created_by=str(task.get("createdBy") or ""),
+                repeat=task.get("repeat"),
+                series_id=str(task.get("seriesId") or ""),
+                occurrence=int(task.get("occurrence") or 1) + 1,
+            )
+            if task.get("subtasks"):
+                next_task["subtasks"] = [create_subtask(str(st.get("content") or "")) for st in task.get("subtasks") or []]
+            outcome.spawned = next_task
+            outcome.events.append(task_event(next_task, actor_id, "create", None, next_task["createdAt"]))
+    return outcome
+
+
+def store_task_changes(
+    household: Household, changes: List[Tuple[Dict[str, Any], Dict[str, Any], ActionOutcome]]
+) -> Tuple[int, List[Dict[str, Any]], List[Dict[str, Any]], List[str]]:
+    """Copy applied drafts over the live tasks and commit them as one write; call with store._lock held.
+
+    Returns (seq, updated tasks, spawned tasks, purged task ids).
+    """
+    store = household.store
+    records: List[Dict[str, Any]] = []
+    updated: List[Dict[str, Any]] = []
+    spawned: List[Dict[str, Any]] = []
+    purged: List[str] = []
+    for task, draft, outcome in changes:
+        task_id = str(task.get("id"))
+        for event in outcome.events:
+            store.add_task_event(event)
+            records.append(put_task_event(event))
+        if outcome.purged:
+            store.remove_task(task_id)
+            records.append(delete_task(task_id))
+            purged.append(task_id)
+            continue
+        task.clear()
+        task.update(draft)
+        records.append(put_task(task))
+        updated.append(task)
+        if outcome.spawned:
+            store.add_task(outcome.spawned)
+            records.append(put_task(outcome.spawned))
+            spawned.append(outcome.spawned)
+    seq = store.commit(*records)
+    for _, _, outcome in changes:
+        for member_id, payload in outcome.mentions:
+            household.hub.send_to_member(member_id, "mention", payload)
+    return seq, updated, spawned, purged
+
+
+def lookup_task(store: Store, task_id: str) -> Optional[Dict[str, Any]]:
+    return store.get_task(task_id) or store.get_cold_task(task_id)
+
+
+def api_update_task(household: Household, task_id: str, body: Dict[str, Any]) -> Response:
+    store = household.store
+    task = lookup_task(store, task_id)
+    if not task:
+        return json_response(404, {"error": "任务不存在"})
+    actor_id = str(body.get("actorId") or "").strip()
+    action = str(body.get("action") or "").strip()
+    with store._lock:
+        if lookup_task(store, task_id) is not task:
+            return json_response(404, {"error": "任务不存在"})
+        draft = copy.deepcopy(task)
+        try:
+            outcome = apply_task_action(household, draft, actor_id, action, body)
+        except ActionError as exc:
+            return json_response(exc.status, {"error": exc.message})
+        seq, _, spawned, purged = store_task_changes(household, [(task, draft, outcome)])
+        if purged:
+            publish_change(household, "task_deleted", {"taskId": task_id})
+        else:
+            publish_change(household, "task_patched", {"task": task})
+            if spawned:
+                publish_change(household, "task_created", {"task": spawned[0]})
+    store.wait(seq)
+    if purged:
+        return json_response(200, {"ok": True})
+    return json_response(200, {"task": task, "spawned": spawned[0] if spawned else None})
+
+
+def api_delete_task(household: Household, task_id: str, body: Dict[str, Any]) -> Response:
+    store = household.store
+    task = lookup_task(store, task_id)
+    if not task:
+        return json_response(404, {"error": "任务不存在"})
+    actor_id = str(body.get("actorId") or "").strip()
+    with store._lock:
+        if lookup_task(store, task_id) is not task:
+            return json_response(404, {"error": "任务不存在"})
+        draft = copy.deepcopy(task)
+        try:
+            outcome = apply_task_action(household, draft, actor_id, "delete", body)
+        except ActionError as exc:
+            return json_response(exc.status, {"error": exc.message})
+        seq, _, _, _ = store_task_changes(household, [(task, draft, outcome)])
+        publish_change(household, "task_patched", {"task": task})
+    store.wait(seq)
+    return json_response(200, {"ok": True})
+
+
+BATCH_MAX_OPERATIONS = 500
+
+
+def api_batch(household: Household, body: Dict[str, Any]) -> Response:
+    """POST /api/batch {"actorId", "operations": [{"taskId", "action", ...}]}: all operations or none.
+
+    Each operation takes the same fields as PATCH /api/tasks/<id> (an operation may
+    override actorId). Later operations on the same task see the earlier ones.
+    """
+    operations = body.get("operations")
+    if not isinstance(operations, list) or not operations:
+        return json_response(400, {"error": "operations 不能为空"})
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        return json_response(400, {"error": f"单次最多 {BATCH_MAX_OPERATIONS} 个操作"})
+    default_actor = str(body.get("actorId") or "").strip()
+    store = household.store
+    for op in operations:
+        if isinstance(op, dict):
+            # Bring in the cold tier before taking the lock if any target lives there.
+            lookup_task(store, str(op.get("taskId") or ""))
+    with store._lock:
+        drafts: Dict[str, Tuple[Dict[str, Any], Dict[str, Any], ActionOutcome]] = {}
+        for index, op in enumerate(operations):
+            if not isinstance(op, dict):
+                return json_response(400, {"error": "操作格式错误", "index": index})
+            task_id = str(op.get("taskId") or "")
+            if task_id in drafts:
+                task, draft, outcome = drafts[task_id]
+            else:
+                task = lookup_task(store, task_id)
+                if not task:
+                    return json_response(404, {"error": "任务不存在", "index": index})
+                draft, outcome = copy.deepcopy(task), ActionOutcome()
+            if outcome.purged:
+                return json_response(404, {"error": "任务不存在", "index": index})
+            actor_id = str(op.get("actorId") or default_actor).strip()
+            try:
+                step = apply_task_action(household, draft, actor_id, str(op.get("action") or "").strip(), op)
+            except ActionError as exc:
+                return json_response(exc.status, {"error": exc.message, "index": index})
+            outcome.purged = step.purged
+            outcome.mentions.extend(step.mentions)
+            outcome.events.extend(step.events)
+            if step.spawned:
+                if outcome.spawned:
+                    # A second occurrence spawned from the same task in one batch would orphan the first.
+                    return json_response(400, {"error": "同一批次中重复任务只能完成一次", "index": index})
+                outcome.spawned = step.spawned
+            drafts[task_id] = (task, draft, outcome)
+        seq, updated, spawned, purged = store_task_changes(household, list(drafts.values()))
+        publish_change(household, "batch", {"tasks": updated + spawned, "deletedTaskIds": purged})
+    store.wait(seq)
+    return json_response(200, {"tasks": updated, "spawned": spawned, "deletedTaskIds": purged})
+
+
+class StaticAsset:
+    def __init__(self, file_path: Path) -> None:
+        stat = file_path.stat()
+        self.mtime = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.body = file_path.read_bytes()
+        self.content_type = CONTENT_TYPES.get(file_path.suffix, "text/plain; charset=utf-8")
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()[:16]}"'
+        self.hashed = bool(HASHED_ASSET_RE.search(file_path.name))
+        self.variants: Dict[str, bytes] = {}
+        if file_path.suffix in CONTENT_TYPES and len(self.body) >= 1024:
+            self.variants["gzip"] = gzip.compress(self.body, compresslevel=9)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(self.body)
+
+
+class StaticCache:
+    """public/ held in memory with precompressed variants, reloaded when a file's mtime or size changes."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._lock = threading.Lock()
+        self._assets: Dict[Path, StaticAsset] = {}
+
+    def preload(self) -> None:
+        for file_path in self.root.rglob("*"):
+            if file_path.is_file():
+                self.get(file_path)
+
+    def get(self, file_path: Path) -> Optional[StaticAsset]:
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return None
+        asset = self._assets.get(file_path)
+        if asset is not None and asset.mtime == stat.st_mtime_ns and asset.size == stat.st_size:
+            return asset
+        asset = StaticAsset(file_path)
+        with self._lock:
+            self._assets[file_path] = asset
+        return asset
+
+
+static_assets = StaticCache(PUBLIC_DIR)
+
+
+def serve_static(request_path: str, query: Dict[str, List[str]], headers: Any) -> Response:
+    if request_path in {"", "/"}:
+        request_path = "/index.html"
+    file_path = safe_path_join(PUBLIC_DIR, request_path)
+    if not file_path or not file_path.is_file():
+        return Response(404)
+    asset = static_assets.get(file_path)
+    if asset is None:
+        return Response(404)
+    encoding = ""
+    accepted = str(headers.get("Accept-Encoding") or "").lower()
+    for candidate in ("br", "gzip"):
+        if candidate in asset.variants and candidate in accepted:
+            encoding = candidate
+            break
+    etag = asset.etag if not encoding else f'{asset.etag[:-1]}-{encoding}"'
+    response_headers = {
+        "ETag": etag,
+        "Last-Modified": asset.last_modified,
+        "Cache-Control": "public, max-age=31536000, immutable" if asset.hashed or "v" in query else "no-cache",
+    }
+    if asset.variants:
+        response_headers["Vary"] = "Accept-Encoding"
+    if headers.get("If-None-Match"):
+        if etag_matches(headers, etag):
+            return Response(HTTPStatus.NOT_MODIFIED, headers=response_headers)
+    elif headers.get("If-Modified-Since"):
+        since = parse_http_date(headers.get("If-Modified-Since"))
+        if since is not None and int(asset.mtime // 1_000_000_000) <= since:
+            return Response(HTTPStatus.NOT_MODIFIED, headers=response_headers)
+    response_headers["Content-Type"] = asset.content_type
+    if encoding:
+        response_headers["Content-Encoding"] = encoding
+        return Response(200, asset.variants[encoding], response_headers)
+    return Response(200, asset.body, response_headers)
+
+
+def parse_http_date(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(parsedate_to_datetime(str(value)).timestamp())
+    except Exception:
+        return None
+
+
+def route_label(path: str) -> str:
+    for prefix in ("/api/tasks/", "/api/members/"):
+        if path.startswith(prefix):
+            return prefix + "{id}"
+    if path.startswith("/api/") or path == "/metrics":
+        return path
+    return "static"
+
+
+def dispatch(method: str, parsed: Any, headers: Any, body: Dict[str, Any]) -> Response:
+    """Route one request and record its latency; shared by the threaded and the asyncio server."""
+    started = time.perf_counter()
+    household_id, path = household_of(parsed.path)
+    with households.enter(household_id) as household:
+        if household is None:
+            response = json_response(404, {"error": "家庭不存在"})
+        elif method in ("POST", "PATCH", "DELETE") and household.store.failure is not None:
+            # Refuse before a handler touches in-memory state that could not be saved.
+            response = json_response(503, {"error": "数据保存失败，请稍后重试"})
+        else:
+            try:
+                response = route(household, method, parsed._replace(path=path), headers, body)
+            except StoreError as exc:
+                log.error("%s %s not saved: %s", method, path, exc)
+                response = json_response(503, {"error": "数据保存失败，请稍后重试"})
+    route_name = route_label(path)
+    action = str(body.get("action") or "") if method == "PATCH" else ""
+    metrics.observe("http_request_duration_seconds", time.perf_counter() - started, method=method, route=route_name, action=action)
+    metrics.inc("http_requests_total", method=method, route=route_name, status=str(int(response.status)))
+    return response
+
+
+def route(household: Household, method: str, parsed: Any, headers: Any, body: Dict[str, Any]) -> Response:
+    path = parsed.path
+    if method == "OPTIONS":
+        return Response(
+            HTTPStatus.NO_CONTENT,
+            headers={
+                "Access-Control-Allow-Origin": "*",
+                "Access-Control-Allow-Methods": "GET,POST,PATCH,DELETE,OPTIONS",
+                "Access-Control-Allow-Headers": "Content-Type",
+            },
+        )
+    if method == "GET":
+        if path == "/api/state":
+            return api_get_state(household, parse_qs(parsed.query or ""), headers)
+        if path == "/api/tasks":
+            return api_list_tasks(household, parse_qs(parsed.query or ""))
+        if path == "/api/agenda":
+            return api_agenda(household, parse_qs(parsed.query or ""))
+        if path == "/api/search":
+            return api_search(household, parse_qs(parsed.query or ""))
+        if path == "/api/stats":
+            return api_stats(household, parse_qs(parsed.query or ""))
+        if path == "/api/history":
+            return api_list_cold_tasks(household, parse_qs(parsed.query or ""), deleted=False)
+        if path == "/api/recycle-bin":
+            return api_list_cold_tasks(household, parse_qs(parsed.query or ""), deleted=True)
+        if path == "/metrics":
+            return Response(200, metrics.render().encode("utf-8"), {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+        return serve_static(path, parse_qs(parsed.query or ""), headers)
+    if method == "POST":
+        if path == "/api/members":
+            return api_create_member(household, body)
+        if path == "/api/tasks":
+            return api_create_task(household, body)
+        if path == "/api/batch":
+            return api_batch(household, body)
+    if method == "PATCH":
+        if path.startswith("/api/members/"):
+            return api_update_member(household, path.split("/")[-1], body)
+        if path.startswith("/api/tasks/"):
+            return api_update_task(household, path.split("/")[-1], body)
+    if method == "DELETE":
+        if path.startswith("/api/tasks/"):
+            return api_delete_task(household, path.split("/")[-1], body)
+    return json_response(404, {"error": "Not found"})
+
+
+def open_event_stream(household: Household, client: SSEClient, last_event_id: str = "") -> None:
+    """Attach a client; it gets the events it missed if last_event_id is still in the ring, else a full snapshot.
+
+    A whole-household stream only needs the hub lock: the published snapshot
+    is swapped before the event of the same version is sent, so one taken
+    under that lock is never older than the id it goes out with.
+    """
+    store, hub = household.store, household.hub
+    if client.scope == "all":
+        store.encoded_snapshot().text  # join it before taking the lock
+    with store._lock if client.scope == "mine" else hub._lock:
+        if hub.attach(client, last_event_id):
+            metrics.inc("sse_replays_total", outcome="replayed")
+            return
+        if last_event_id:
+            metrics.inc("sse_replays_total", outcome="snapshot")
+        snapshot = household.projections.snapshot(client.member_id) if client.scope == "mine" else store.encoded_snapshot()
+        hub.deliver([client], f"id: {hub.current_id()}\nevent: state_update\ndata: {snapshot.text}\n\n", is_state=True)
+
+
+def stream_scope_of(params: Dict[str, List[str]]) -> Optional[str]:
+    scope = (params.get("scope") or ["all"])[0]
+    return scope if scope in ("all", "mine") else None
+
+
+def last_event_id_of(params: Dict[str, List[str]], headers: Any) -> str:
+    """EventSource sends Last-Event-ID on its own reconnects; the app passes lastEventId= when it reconnects itself."""
+    return str(headers.get("Last-Event-ID") or (params.get("lastEventId") or [""])[0]).strip()
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "HomeTodo/0.1"
+    protocol_version = "HTTP/1.1"
+    timeout = KEEP_ALIVE_TIMEOUT
+
+    def do_OPTIONS(self) -> None:
+        self.respond("OPTIONS")
+
+    def do_GET(self) -> None:
+        parsed = urlparse(self.path)
+        household_id, path = household_of(parsed.path)
+        if path == "/events":
+            with households.enter(household_id) as household:
+                if household is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.handle_sse(household, parsed)
+            return
+        self.respond("GET")
+
+    def do_POST(self) -> None:
+        self.respond("POST")
+
+    def do_PATCH(self) -> None:
+        self.respond("PATCH")
+
+    def do_DELETE(self) -> None:
+        self.respond("DELETE")
+
+    def respond(self, method: str) -> None:
+        body = read_json_body(self) if method in {"POST", "PATCH", "DELETE"} else {}
+        response = dispatch(method, urlparse(self.path), self.headers, body)
+        self.send_response(response.status)
+        for key, value in response.headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(response.body)))
+        self.end_headers()
+        self.wfile.write(response.body)
+
+    def handle_sse(self, household: Household, parsed) -> None:
+        params = parse_qs(parsed.query or "")
+        member_id = (params.get("memberId") or [""])[0]
+        scope = stream_scope_of(params)
+        if not member_id or scope is None:
+            self.send_response(400)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.close_connection = True
+        self.send_response(200)
+        for key, value in SSE_HEADERS.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(b": connected\n\n")
+        self.wfile.flush()
+
+        client = SSEClient(member_id=member_id, q=ThreadEventQueue(), scope=scope)
+        open_event_stream(household, client, last_event_id_of(params, self.headers))
+        try:
+            while True:
+                msg = client.q.get(timeout=25)
+                if client.q.overflowed:
+                    break
+                self.wfile.write(msg.encode("utf-8") if msg is not None else b": ping\n\n")
+                self.wfile.flush()
+        except Exception:
+            pass
+        finally:
+            household.hub.remove(client)
+
+
+def encode_response(response: Response, keep_alive: bool) -> bytes:
+    try:
+        reason = HTTPStatus(response.status).phrase
+    except ValueError:
+        reason = ""
+    lines = [f"HTTP/1.1 {int(response.status)} {reason}", f"Server: {Handler.server_version}"]
+    lines.extend(f"{key}: {value}" for key, value in response.headers.items())
+    lines.append(f"Content-Length: {len(response.body)}")
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + response.body
+
+
+async def stream_events_async(
+    writer: asyncio.StreamWriter, household: Household, member_id: str, scope: str, last_event_id: str
+) -> None:
+    loop = asyncio.get_running_loop()
+    head = ["HTTP/1.1 200 OK", f"Server: {Handler.server_version}"]
+    head.extend(f"{key}: {value}" for key, value in SSE_HEADERS.items())
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + b": connected\n\n")
+    await writer.drain()
+    client = SSEClient(member_id=member_id, q=AsyncEventQueue(), loop=loop, scope=scope)
+    await loop.run_in_executor(None, open_event_stream, household, client, last_event_id)
+    try:
+        while True:
+            msg = await client.q.get(timeout=25)
+            if client.q.overflowed:
+                break
+            writer.write(msg.encode("utf-8") if msg is not None else b": ping\n\n")
+            await writer.drain()
+    except Exception:
+        pass
+    finally:
+        household.hub.remove(client)
+
+
+async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=KEEP_ALIVE_TIMEOUT)
+            if not request_line.strip():
+                break
+            method, target, version = request_line.decode("latin-1").split()
+            head = b""
+            while True:
+                line = await reader.readline()
+                if line in {b"\r\n", b"\n", b""}:
+                    break
+                head += line
+            headers = http.client.parse_headers(io.BytesIO(head))
+            length = int(headers.get("Content-Length") or 0)
+            raw = await reader.readexactly(length) if length > 0 else b""
+            connection = str(headers.get("Connection") or "").lower()
+            keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+            parsed = urlparse(target)
+            household_id, path = household_of(parsed.path)
+            if method == "GET" and path == "/events":
+                params = parse_qs(parsed.query or "")
+                member_id = (params.get("memberId") or [""])[0]
+                scope = stream_scope_of(params)
+                if not member_id or scope is None:
+                    writer.write(encode_response(Response(400), False))
+                    break
+                household = households.acquire(household_id)
+                if household is None:
+                    writer.write(encode_response(Response(404), False))
+                    break
+                try:
+                    await loop.run_in_executor(None, household.start)
+                    await stream_events_async(writer, household, member_id, scope, last_event_id_of(params, headers))
+                finally:
+                    households.release(household)
+                break
+            body = parse_json_body(raw) if method in {"POST", "PATCH", "DELETE"} else {}
+            response = await loop.run_in_executor(None, dispatch, method, parsed, headers, body)
+            writer.write(encode_response(response, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+        pass
+    except asyncio.CancelledError:
+        pass  # shutdown; ending normally keeps asyncio from reporting the cancellation as unhandled
+    finally:
+        writer.close()
+
+
+async def serve_async(port: int) -> None:
+    server = await asyncio.start_server(handle_connection, "0.0.0.0", port, backlog=1024, reuse_port=WORKER_ID is not None)
+    print(f"Server running on http://localhost:{port} (asyncio{'' if WORKER_ID is None else f', worker {WORKER_ID}'})")
+    async with server:
+        try:
+            await server.serve_forever()
+        finally:
+            # Ctrl-C cancels serve_forever: end the open connections, SSE streams included, before the loop closes.
+            connections = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in connections:
+                task.cancel()
+            await asyncio.gather(*connections, return_exceptions=True)
+
+
+class WorkerHTTPServer(ThreadingHTTPServer):
+    allow_reuse_port = True
+
+
+def run_cluster() -> None:
+    """Supervise WORKERS copies of this server on one port (SO_REUSEPORT), sharing households through a Broker.
+
+    A worker that exits is started again; its households reload from SQLite
+    and pick up the broker's counters, so clients only see their stream
+    reconnect.
+    """
+    if str(os.environ.get("STORE") or "json").lower() != "sqlite":
+        sys.exit("WORKERS > 1 needs STORE=sqlite: it is the only store several processes can read while the broker writes")
+    broker = Broker(BROKER_SOCKET)
+    broker.prepare(DEFAULT_HOUSEHOLD)
+    broker.start()
+    port = int(os.environ.get("PORT", "5173"))
+
+    def spawn(index: int) -> subprocess.Popen:
+        env = {**os.environ, "WORKER_ID": str(index), "BROKER_SOCKET": str(BROKER_SOCKET)}
+        return subprocess.Popen([sys.executable, str(Path(__file__).resolve())], env=env)
+
+    workers = [spawn(index) for index in range(WORKERS)]
+    print(f"Server running on http://localhost:{port} ({WORKERS} workers)", flush=True)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while True:
+            time.sleep(1)
+            for index, worker in enumerate(workers):
+                if worker.poll() is not None:
+                    log.warning("worker %d exited with %s; restarting", index, worker.returncode)
+                    workers[index] = spawn(index)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for worker in workers:
+            if worker.poll() is None:
+                worker.terminate()
+        for worker in workers:
+            try:
+                worker.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+        broker.close()
 
 
 def run() -> None:
-    store.load()
-    stop_event = threading.Event()
-    t = threading.Thread(target=reminder_loop, args=(stop_event,), daemon=True)
-    t.start()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    if WORKERS > 1 and WORKER_ID is None:
+        run_cluster()
+        return
+    if broker_link is not None:
+        # The supervisor stops workers with SIGTERM; BrokerLink sends it too when the broker goes away.
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(1 if broker_link.lost else 0))
+        broker_link.connect()
+    households.default.start()
+    static_assets.preload()
+    threading.Thread(target=run_retention, daemon=True).start()
+    threading.Thread(target=run_search_save, daemon=True).start()
+    threading.Thread(target=run_household_eviction, daemon=True).start()
+    if broker_link is not None:
+        threading.Thread(target=run_scheduler_leases, daemon=True).start()
+    if METRICS_LOG_SECONDS > 0:
+        threading.Thread(target=run_metrics_log, daemon=True).start()
     port = int(os.environ.get("PORT", "5173"))
-    httpd = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    if str(os.environ.get("SERVER_MODE") or "").lower() == "asyncio":
+        try:
+            asyncio.run(serve_async(port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            background_stop.set()
+            households.close()
+            if broker_link is not None:
+                broker_link.close()
+        return
+    httpd = (ThreadingHTTPServer if WORKER_ID is None else WorkerHTTPServer)(("0.0.0.0", port), Handler)
     try:
-        print(f"Server running on http://localhost:{port}")
+        print(f"Server running on http://localhost:{port}" + ("" if WORKER_ID is None else f" (worker {WORKER_ID})"))
         httpd.serve_forever()
     finally:
-        stop_event.set()
+        background_stop.set()
         httpd.server_close()
+        households.close()
+        if broker_link is not None:
+            broker_link.close()
 
 
 if __name__ == "__main__":
@@ -20,6 +20,10 @@ const writeAtomic = (filePath, payload) => {
   fs.renameSync(tempPath, filePath);
 };
 
+// Reads and rewrites data.json only. The Python server keeps its recent writes
+// in data.json.journal and archived/deleted tasks in data.json.cold, and folds
+// the journal back into data.json on a clean shutdown, so only point both
+// runtimes at the same DATA_FILE one at a time, never side by side.
 const createJsonStore = ({ createMember, defaultMembers }) => {
   const dataFile = resolveDataFile();
   const state = { members: [], tasks: [] };
@@ -63,6 +63,33 @@ const applyMigrations = (db) => {
     version = 6;
   }
 
+  if (version < 7) {
+    db.prepare("CREATE INDEX IF NOT EXISTS idx_tasks_archived_at ON tasks (archived_at)").run();
+    db.prepare("CREATE INDEX IF NOT EXISTS idx_tasks_deleted_at ON tasks (deleted_at)").run();
+    setVersion(7);
+    version = 7;
+  }
+
+  if (version < 8) {
+    try {
+      db.prepare("ALTER TABLE reminder_events ADD COLUMN queued_at TEXT").run();
+    } catch (error) {
+      db.prepare("SELECT queued_at FROM reminder_events LIMIT 1").get();
+    }
+    setVersion(8);
+    version = 8;
+  }
+
+  if (version < 9) {
+    try {
+      db.prepare("ALTER TABLE task_events ADD COLUMN detail TEXT").run();
+    } catch (error) {
+      db.prepare("SELECT detail FROM task_events LIMIT 1").get();
+    }
+    setVersion(9);
+    version = 9;
+  }
+
   return version;
 };
 
@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from urllib.parse import urlparse
+
+import pytest
+
+# server reads its file locations at import time; keep the default household off the repo's data.json.
+_scratch = Path(tempfile.mkdtemp(prefix="home-todo-tests-"))
+os.environ["DATA_FILE"] = str(_scratch / "data.json")
+os.environ["SQLITE_FILE"] = str(_scratch / "data.sqlite")
+os.environ["SNAPSHOT_FILE"] = str(_scratch / "data.snap")
+os.environ["HOUSEHOLDS_DIR"] = str(_scratch / "households")
+os.environ.pop("STORE", None)
+os.environ.pop("WORKERS", None)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+
+def call(household, method, path, body=None):
+    """Route one request straight to the handlers; returns (status, parsed JSON body)."""
+    response = server.route(household, method, urlparse(path), {}, body or {})
+    return int(response.status), json.loads(response.body) if response.body else None
+
+
+@pytest.fixture
+def make_household(tmp_path):
+    """Build and start a household on a fresh JSON or SQLite store under tmp_path; all are stopped afterwards."""
+    started = []
+
+    def make(backend="json", directory=None):
+        directory = directory or tmp_path
+        if backend == "sqlite":
+            store = server.SqliteStore(directory / "data.sqlite", directory / "data.json")
+        else:
+            store = server.JsonStore(directory / "data.json")
+        household = server.Household("test", store)
+        household.start()
+        started.append(household)
+        return household
+
+    yield make
+    for household in started:
+        household.stop()
+
+
+@pytest.fixture
+def household(make_household):
+    return make_household()
+
+
+@pytest.fixture
+def member_id(household):
+    return household.store.state["members"][0]["id"]
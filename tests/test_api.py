@@ -0,0 +1,149 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from conftest import call
+
+
+def create(household, member_id, content="任务", **fields):
+    status, task = call(household, "POST", "/api/tasks", dict(fields, content=content, createdBy=member_id))
+    assert status == 200
+    return task
+
+
+def test_batch_applies_every_operation(household, member_id):
+    first, second = create(household, member_id), create(household, member_id)
+    seq = household.store.seq
+    status, body = call(
+        household,
+        "POST",
+        "/api/batch",
+        {
+            "actorId": member_id,
+            "operations": [
+                {"taskId": first["id"], "action": "accept"},
+                {"taskId": first["id"], "action": "start"},
+                {"taskId": second["id"], "action": "accept"},
+            ],
+        },
+    )
+    assert status == 200
+    assert {task["id"]: task["state"] for task in body["tasks"]} == {first["id"]: "进行中", second["id"]: "已接受"}
+    assert household.store.seq > seq
+
+
+def test_batch_is_all_or_nothing(household, member_id):
+    first, second = create(household, member_id), create(household, member_id)
+    seq = household.store.seq
+    status, body = call(
+        household,
+        "POST",
+        "/api/batch",
+        {
+            "actorId": member_id,
+            "operations": [
+                {"taskId": first["id"], "action": "accept"},
+                {"taskId": "missing", "action": "accept"},
+                {"taskId": second["id"], "action": "accept"},
+            ],
+        },
+    )
+    assert status == 404
+    assert body["index"] == 1
+    assert household.store.seq == seq
+    for task in (first, second):
+        assert household.store.get_task(task["id"])["state"] == "已指派"
+
+
+def page_through(household, query, limit):
+    ids, cursor, pages = [], None, 0
+    while True:
+        path = f"/api/tasks?{query}&limit={limit}" + (f"&cursor={cursor}" if cursor else "")
+        status, body = call(household, "GET", path)
+        assert status == 200
+        assert len(body["tasks"]) <= limit
+        ids.extend(task["id"] for task in body["tasks"])
+        pages += 1
+        cursor = body["nextCursor"]
+        if not cursor:
+            return ids, pages
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_cursor_pages_cover_every_task_once(household, member_id, order):
+    start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    # Pairs of tasks share a due time so paging has to break ties on the id.
+    tasks = [create(household, member_id, f"任务{i}", dueAt=(start + timedelta(hours=i // 2)).isoformat()) for i in range(7)]
+    expected = [task["id"] for task in sorted(tasks, key=lambda task: (server.epoch_ms(task["dueAt"]), task["id"]))]
+    if order == "desc":
+        expected.reverse()
+
+    ids, pages = page_through(household, f"sort=dueAt&order={order}", 3)
+    assert ids == expected
+    assert pages == 3
+
+
+def test_cursor_pages_archived_tasks(household, member_id):
+    archived = []
+    for i in range(5):
+        task = create(household, member_id, f"任务{i}")
+        for action in ("accept", "complete", "archive"):
+            assert call(household, "PATCH", f"/api/tasks/{task['id']}", {"action": action, "actorId": member_id})[0] == 200
+        archived.append(task["id"])
+    create(household, member_id, "还没做")
+
+    ids, _ = page_through(household, "archived=true&sort=createdAt", 2)
+    assert sorted(ids) == sorted(archived)
+    live, _ = page_through(household, "sort=createdAt", 2)
+    assert not set(live) & set(archived)
+
+
+def test_invalid_cursor_is_rejected(household):
+    assert call(household, "GET", "/api/tasks?cursor=not-a-cursor")[0] == 400
+
+
+def drain(client):
+    messages = []
+    while True:
+        msg = client.q.pop()
+        if msg is None:
+            return messages
+        messages.append(msg)
+
+
+def event_of(msg):
+    fields = dict(line.split(": ", 1) for line in msg.strip().split("\n"))
+    return fields["id"], fields["event"], json.loads(fields["data"])
+
+
+def connect(household, last_event_id=""):
+    client = server.SSEClient(household.store.state["members"][0]["id"], server.ThreadEventQueue())
+    server.open_event_stream(household, client, last_event_id)
+    return client
+
+
+def test_sse_replays_events_after_last_event_id(household, member_id):
+    client = connect(household)
+    (first,) = drain(client)
+    last_id, event, _ = event_of(first)
+    assert event == "state_update"
+    household.hub.remove(client)
+
+    created = [create(household, member_id, f"任务{i}") for i in range(2)]
+    resumed = connect(household, last_id)
+    replayed = [event_of(msg) for msg in drain(resumed)]
+    assert [event for _, event, _ in replayed] == ["task_created", "task_created"]
+    assert [data["task"]["id"] for _, _, data in replayed] == [task["id"] for task in created]
+    assert replayed[-1][0] == household.hub.current_id()
+
+
+def test_sse_unknown_last_event_id_gets_snapshot(household, member_id):
+    create(household, member_id)
+    client = connect(household, "stale-1")
+    (msg,) = drain(client)
+    event_id, event, data = event_of(msg)
+    assert event == "state_update"
+    assert event_id == household.hub.current_id()
+    assert len(data["tasks"]) == 1
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+
+import server
+
+
+def task_due_in(store, member_id, delta):
+    task = server.create_task("任务", [member_id], (datetime.now(timezone.utc) + delta).isoformat(), False, member_id, server.normalize_repeat(None))
+    store.add_task(task)
+    return task
+
+
+def test_due_tasks_fire_in_time_order(household, member_id):
+    store = household.store
+    # Each is less than 24h out, so its 24h reminder is already due; they fire earliest first.
+    late = task_due_in(store, member_id, timedelta(hours=20))
+    early = task_due_in(store, member_id, timedelta(hours=1))
+    middle = task_due_in(store, member_id, timedelta(hours=10))
+    far = task_due_in(store, member_id, timedelta(days=3))
+
+    scheduler = server.ReminderScheduler(store, household.hub)
+    scheduler.reset([late, early, middle, far])
+    due_ids, due_members = scheduler._next_due()
+    assert due_ids == [early["id"], middle["id"], late["id"]]
+    assert due_members == []
+    assert scheduler._heap[0][1] == far["id"]
+
+
+def test_rescheduled_task_fires_once_at_new_time(household, member_id):
+    store = household.store
+    moved = task_due_in(store, member_id, timedelta(days=3))
+    other = task_due_in(store, member_id, timedelta(hours=5))
+    scheduler = server.ReminderScheduler(store, household.hub)
+    scheduler.reset([moved, other])
+
+    moved["dueAt"] = (datetime.now(timezone.utc) + timedelta(hours=2)).isoformat()
+    scheduler.schedule(moved)
+    due_ids, _ = scheduler._next_due()
+    assert due_ids == [moved["id"], other["id"]]
+    # The entry for the old due time is left in the heap but no longer fires.
+    assert all(task_id not in scheduler._fire_at for _, task_id in scheduler._heap)
+
+
+def test_finished_task_is_not_scheduled(household, member_id):
+    store = household.store
+    done = task_due_in(store, member_id, timedelta(hours=1))
+    done["state"] = "已完成"
+    scheduler = server.ReminderScheduler(store, household.hub)
+    scheduler.reset([done])
+    assert scheduler._heap == []
@@ -0,0 +1,135 @@
+import json
+import time
+
+import server
+from conftest import call
+
+
+def snapshot(store):
+    """Hot members and tasks as the JSON a client would see."""
+    with store._lock:
+        return json.loads(json.dumps({"members": store.state["members"], "tasks": store.state["tasks"]}, default=server.plain))
+
+
+def reopen(store):
+    """Load a second JsonStore on the same files, as a restart after a crash would."""
+    replayed = server.JsonStore(store.data_file)
+    replayed.load()
+    return replayed
+
+
+def add_tasks(household, member_id, count):
+    ids = []
+    for i in range(count):
+        status, task = call(household, "POST", "/api/tasks", {"content": f"任务{i}", "createdBy": member_id})
+        assert status == 200
+        ids.append(task["id"])
+    return ids
+
+
+def journal_seqs(store):
+    return [json.loads(line)["seq"] for line in store.journal_file.read_text("utf-8").splitlines()]
+
+
+def test_journal_replays_writes_missing_from_snapshot(household, member_id):
+    store = household.store
+    ids = add_tasks(household, member_id, 3)
+    assert call(household, "PATCH", f"/api/tasks/{ids[0]}", {"action": "accept", "actorId": member_id})[0] == 200
+    assert store.journal_file.stat().st_size > 0
+
+    replayed = reopen(store)
+    try:
+        assert snapshot(replayed) == snapshot(store)
+        assert replayed.seq == store.seq
+        assert replayed.get_task(ids[0])["state"] == "已接受"
+    finally:
+        replayed.close()
+
+
+def test_journal_drops_torn_tail(household, member_id):
+    store = household.store
+    add_tasks(household, member_id, 2)
+    size = store.journal_file.stat().st_size
+    with open(store.journal_file, "ab") as f:
+        f.write(b'{"op": "put_task", "seq": 999, "task": {"id": "x')
+
+    replayed = reopen(store)
+    try:
+        assert snapshot(replayed) == snapshot(store)
+        assert replayed.seq == store.seq
+        assert store.journal_file.stat().st_size == size
+    finally:
+        replayed.close()
+
+
+def test_save_folds_journal_into_snapshot(household, member_id):
+    store = household.store
+    add_tasks(household, member_id, 3)
+    store.save()
+    assert store.journal_file.stat().st_size == 0
+    assert json.loads(store.data_file.read_text("utf-8"))["journalSeq"] == store.seq
+
+    snapshot_seq = store.seq
+    (late,) = add_tasks(household, member_id, 1)
+    assert journal_seqs(store) and all(seq > snapshot_seq for seq in journal_seqs(store))
+
+    replayed = reopen(store)
+    try:
+        assert snapshot(replayed) == snapshot(store)
+        assert replayed.get_task(late) is not None
+    finally:
+        replayed.close()
+
+
+def test_journal_compacts_past_threshold(household, member_id, monkeypatch):
+    store = household.store
+    monkeypatch.setattr(server, "JOURNAL_COMPACT_BYTES", 1)
+    add_tasks(household, member_id, 1)
+    deadline = time.monotonic() + 5
+    while store.journal_file.stat().st_size and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.journal_file.stat().st_size == 0
+    assert json.loads(store.data_file.read_text("utf-8"))["journalSeq"] == store.seq
+
+
+def test_close_leaves_whole_state_in_snapshot(household, member_id):
+    store = household.store
+    ids = add_tasks(household, member_id, 2)
+    household.stop()
+    assert store.journal_file.stat().st_size == 0
+    assert {task["id"] for task in json.loads(store.data_file.read_text("utf-8"))["tasks"]} == set(ids)
+
+
+def test_sqlite_round_trip(make_household, tmp_path):
+    household = make_household("sqlite")
+    status, member = call(household, "POST", "/api/members", {"name": "小明"})
+    assert status == 200
+    status, task = call(
+        household,
+        "POST",
+        "/api/tasks",
+        {
+            "content": "买菜",
+            "createdBy": member["id"],
+            "owners": [member["id"]],
+            "dueAt": "2030-01-02T03:04:05+00:00",
+            "repeat": {"type": "weekly"},
+            "requireConfirm": True,
+        },
+    )
+    assert status == 200
+    for body in ({"action": "accept"}, {"action": "comment", "content": "记得带袋子"}):
+        assert call(household, "PATCH", f"/api/tasks/{task['id']}", dict(body, actorId=member["id"]))[0] == 200
+    before = snapshot(household.store)
+    household.stop()
+
+    reloaded = make_household("sqlite")
+    assert snapshot(reloaded.store) == before
+    assert reloaded.store.get_task(task["id"])["comments"][0]["content"] == "记得带袋子"
+
+
+def test_member_shape_matches_across_backends(make_household, tmp_path):
+    json_member = snapshot(make_household("json", tmp_path / "json").store)["members"][0]
+    sqlite_member = snapshot(make_household("sqlite", tmp_path / "sqlite").store)["members"][0]
+    assert set(json_member) == set(sqlite_member)
+    assert "wechatOpenId" in sqlite_member